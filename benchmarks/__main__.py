@@ -0,0 +1,39 @@
+"""
+Запуск бенчмарков со сохранением результатов и сравнением с прошлым прогоном.
+
+    python -m benchmarks                      # все бенчмарки
+    python -m benchmarks -k extract           # аргументы передаются pytest
+    BENCH_FAIL=mean:20% python -m benchmarks  # падать при замедлении больше порога
+
+Результаты лежат в benchmarks/.results/<машина>/NNNN_<commit>.json;
+сравнить любые два: pytest-benchmark compare --storage benchmarks/.results 0001 0002
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent
+STORAGE = ROOT / ".results"
+
+
+def main() -> int:
+    args = [
+        str(ROOT / "bench_pipeline.py"),
+        "-q",
+        f"--benchmark-storage=file://{STORAGE}",
+        "--benchmark-autosave",
+        "--benchmark-columns=min,median,mean,stddev,ops,rounds",
+        "--benchmark-sort=name",
+    ]
+    if any(STORAGE.glob("*/*.json")):
+        args.append("--benchmark-compare")
+        fail = os.getenv("BENCH_FAIL")
+        if fail:
+            args.append(f"--benchmark-compare-fail={fail}")
+    return pytest.main(args + sys.argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
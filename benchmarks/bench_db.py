@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи в DatabaseManager: поштучный add_listing против пакетного add_listings.
+
+    python -m benchmarks.bench_db
+    python -m benchmarks.bench_db --count 10000 --batch 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import logger
+from database.database_manager import DatabaseManager
+from database.models import Listing
+
+
+def make_listings(count: int, offset: int = 0):
+    """Синтетические объявления с уникальными URL"""
+    return [
+        Listing(
+            url=f"https://www.avito.ru/moskva/tovary_dlya_kompyutera/rtx_4090_{offset + i}",
+            title=f"RTX 4090 #{offset + i}",
+            price=str(100000 + i),
+            address="Москва",
+            description="Отличное состояние",
+            images=[f"https://10.img.avito.st/image/1/{offset + i}"],
+        )
+        for i in range(count)
+    ]
+
+
+def bench(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {elapsed:8.3f} с")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк записи в БД")
+    parser.add_argument("--count", type=int, default=10000, help="Число объявлений")
+    parser.add_argument("--batch", type=int, default=50, help="Размер пакета (объявлений на странице)")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    listings = make_listings(args.count)
+    batches = [listings[i:i + args.batch] for i in range(0, len(listings), args.batch)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single = DatabaseManager(os.path.join(tmp, "single.db"))
+        bench(f"add_listing x {args.count}", lambda: sum(single.add_listing(l) for l in listings))
+        bench(f"add_listing x {args.count} (все дубликаты)", lambda: sum(single.add_listing(l) for l in listings))
+        single.close()
+
+        batched = DatabaseManager(os.path.join(tmp, "batched.db"))
+        added = bench(f"add_listings по {args.batch}",
+                      lambda: sum(len(batched.add_listings(b)[0]) for b in batches))
+        duplicates = bench(f"add_listings по {args.batch} (все дубликаты)",
+                           lambda: sum(len(batched.add_listings(b)[1]) for b in batches))
+        bench(f"add_listings одним пакетом x {args.count}",
+              lambda: batched.add_listings(make_listings(args.count, offset=args.count)))
+        batched.close()
+
+    assert added == args.count and duplicates == args.count
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Сравнение движков извлечения AvitoProcessor: паритет результатов и скорость.
+
+DOM-движки (bs4, lxml) обязаны совпадать полностью. JSON-движок сверяется
+с DOM по ключевым полям: URL в состоянии страницы приходит без параметра
+context, а изображения - в максимальном размере.
+
+    python -m benchmarks.bench_extract
+    python -m benchmarks.bench_extract --pages trash --repeat 10
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import logger
+from services.avito_processor import AvitoProcessor
+from services.catalog_crawler import listing_key
+from benchmarks.corpus import synthetic_pages, load_saved_pages
+
+BASE_URL = "https://www.avito.ru"
+DOM_ENGINES = ("bs4", "lxml")
+
+
+def check_parity(pages, engines) -> bool:
+    """Все движки должны вернуть одинаковые объекты Listing"""
+    reference, *others = [AvitoProcessor(BASE_URL, engine=engine) for engine in engines]
+    ok = True
+    for name, html in pages:
+        expected = reference.process_html(html)
+        for processor in others:
+            actual = processor.process_html(html)
+            if actual != expected:
+                ok = False
+                logger.error(f"[Bench] {name}: {processor.engine} расходится с {reference.engine} "
+                             f"({len(actual)} vs {len(expected)} объявлений)")
+                for a, e in zip(actual, expected):
+                    if a != e:
+                        logger.error(f"[Bench]   {processor.engine}: {a}")
+                        logger.error(f"[Bench]   {reference.engine}: {e}")
+                        break
+    return ok
+
+
+def json_agreement(pages) -> float:
+    """Доля объявлений DOM-пути, которые JSON-путь вернул с теми же полями"""
+    dom = AvitoProcessor(BASE_URL, engine="lxml")
+    state = AvitoProcessor(BASE_URL, engine="json")
+
+    def key(listing):
+        return listing_key(listing.url), listing.title, listing.price, listing.address, listing.description
+
+    total = matched = 0
+    for _, html in pages:
+        expected = {key(listing) for listing in dom.process_html(html)}
+        actual = {key(listing) for listing in state.process_html(html)}
+        total += len(expected)
+        matched += len(expected & actual)
+    return matched / total if total else 1.0
+
+
+def measure(pages, engine: str, repeat: int):
+    """Время обработки всего корпуса: (секунд на проход, объявлений за проход)"""
+    processor = AvitoProcessor(BASE_URL, engine=engine)
+    best = float('inf')
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = sum(len(processor.process_html(html)) for _, html in pages)
+        best = min(best, time.perf_counter() - start)
+    return best, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк движков извлечения")
+    parser.add_argument("--pages", help="Папка с сохраненными страницами *.html")
+    parser.add_argument("--synthetic", type=int, default=10, help="Число синтетических страниц")
+    parser.add_argument("--items", type=int, default=50, help="Карточек на синтетической странице")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов (берется лучший)")
+    parser.add_argument("--engines", default=",".join(AvitoProcessor.ENGINES))
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    pages = synthetic_pages(args.synthetic, args.items)
+    if args.pages:
+        pages += load_saved_pages(args.pages)
+    engines = args.engines.split(",")
+
+    size_mb = sum(len(html) for _, html in pages) / 1024 / 1024
+    print(f"Корпус: {len(pages)} страниц, {size_mb:.1f} МБ")
+
+    dom_engines = [engine for engine in engines if engine in DOM_ENGINES]
+    if len(dom_engines) > 1 and not check_parity(pages, dom_engines):
+        print("ПАРИТЕТ НАРУШЕН")
+        sys.exit(1)
+    print("Паритет DOM-движков: OK")
+    if "json" in engines:
+        state = AvitoProcessor(BASE_URL, engine="json")
+        with_state = sum(1 for _, html in pages if state._find_state_items(html) is not None)
+        print(f"Страниц с JSON-состоянием: {with_state}/{len(pages)}")
+        print(f"Совпадение JSON-состояния с DOM: {json_agreement(pages):.1%}")
+
+    baseline = None
+    for engine in engines:
+        seconds, found = measure(pages, engine, args.repeat)
+        baseline = baseline or seconds
+        print(f"{engine:>6}: {seconds * 1000 / len(pages):8.2f} мс/стр | "
+              f"{len(pages) / seconds:7.1f} стр/с | {found} объявлений | x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
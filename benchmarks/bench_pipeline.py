@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки цепочки загрузка -> извлечение -> запись на pytest-benchmark.
+
+Страницы берутся из синтетического корпуса (benchmarks/corpus.py) и
+отдаются локальным сервером (benchmarks/stand_in.py), так что сеть и Avito
+не нужны. Файл не попадает в обычный прогон тестов (имя не test_*), его
+запускает python -m benchmarks: результаты сохраняются в benchmarks/.results
+и сравниваются с прошлым запуском.
+
+    python -m benchmarks
+    python -m pytest benchmarks/bench_pipeline.py -k extract
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import settings, logger
+from database.database_manager import DatabaseManager
+from services.avito_processor import AvitoProcessor
+from benchmarks.bench_db import make_listings
+from benchmarks.corpus import synthetic_pages
+from benchmarks.stand_in import serve_pages
+
+BASE_URL = "https://www.avito.ru"
+CATALOG_PATH = "/moskva/tovary_dlya_kompyutera/komplektuyuschie/videokarty"
+DB_LISTINGS = 5000
+
+
+@pytest.fixture(scope="module", autouse=True)
+def quiet_logs():
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return synthetic_pages(count=5, items=50)
+
+
+@pytest.fixture(scope="module")
+def stand_in(corpus):
+    # Замеряется загрузка, а не темп общего регулятора частоты запросов
+    rate_control, settings.rate_control = settings.rate_control, "off"
+    try:
+        with serve_pages(corpus) as base_url:
+            yield base_url + CATALOG_PATH
+    finally:
+        settings.rate_control = rate_control
+
+
+@pytest.fixture
+def filled_db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "bench.db"))
+    listings = make_listings(DB_LISTINGS)
+    for start in range(0, len(listings), 50):
+        db.upsert_listings(listings[start:start + 50])
+    yield db, listings
+    db.close()
+
+
+# === Извлечение ===
+@pytest.mark.parametrize("engine", AvitoProcessor.ENGINES)
+def test_extract(benchmark, corpus, engine):
+    benchmark.group = "extract"
+    processor = AvitoProcessor(BASE_URL, engine=engine)
+    found = benchmark(lambda: sum(len(processor.process_html(html)) for _, html in corpus))
+    benchmark.extra_info["pages"] = len(corpus)
+    benchmark.extra_info["listings"] = found
+    assert found
+
+
+# === База данных ===
+def test_db_upsert_new(benchmark, tmp_path):
+    benchmark.group = "db"
+    listings = make_listings(1000)
+    counter = iter(range(10 ** 6))
+
+    def setup():
+        return (DatabaseManager(str(tmp_path / f"bench_{next(counter)}.db")),), {}
+
+    def run(db):
+        for start in range(0, len(listings), 50):
+            db.upsert_listings(listings[start:start + 50])
+        db.close()
+
+    benchmark.pedantic(run, setup=setup, rounds=5)
+
+
+def test_db_upsert_unchanged(benchmark, filled_db):
+    benchmark.group = "db"
+    db, listings = filled_db
+    batch = listings[:50]
+    added, updated, unchanged = benchmark(db.upsert_listings, batch)
+    assert len(unchanged) == len(batch)
+
+
+def test_db_listings_page(benchmark, filled_db):
+    benchmark.group = "db"
+    db, _ = filled_db
+    middle = db.get_listings_page(page_size=DB_LISTINGS // 2)[-1]["id"]
+    rows = benchmark(db.get_listings_page, 5, f"a{middle}")
+    assert len(rows) == 5
+
+
+def test_db_listings_by_price(benchmark, filled_db):
+    benchmark.group = "db"
+    db, _ = filled_db
+    # make_listings без price_value: заполняем типизированную цену как миграция
+    connection = db._get_connection()
+    connection.execute("UPDATE listings SET price_value = CAST(price AS INTEGER) * 100, currency = 'RUB'")
+    connection.commit()
+    rows = benchmark(db.get_listings_by_price, 101000, 102000)
+    assert rows
+
+
+# === Загрузка со стенда ===
+def test_curl_latency(benchmark, stand_in):
+    from core.curl_parser import CurlParser
+
+    benchmark.group = "fetch"
+    parser = CurlParser()
+    html = benchmark(parser.parse, stand_in)
+    assert html and "catalog-serp" in html
+
+
+def test_playwright_latency(benchmark, stand_in):
+    from core.playwright_parser import PlaywrightParser
+    from core.browser_pool import shutdown_browser_pool
+
+    benchmark.group = "fetch"
+    parser = PlaywrightParser()
+    try:
+        if not parser.parse(stand_in):
+            pytest.skip("Браузер Playwright недоступен")
+        # Навигация включает имитацию поведения пользователя, поэтому раундов мало
+        html = benchmark.pedantic(parser.parse, args=(stand_in,), rounds=3)
+        assert html
+    finally:
+        shutdown_browser_pool()
+
+
+# === Полный цикл main.py ===
+@pytest.fixture
+def main_cycle(monkeypatch, tmp_path, stand_in):
+    import main
+    import database.database_manager as database_manager
+
+    monkeypatch.setattr(settings, "target_url", stand_in)
+    monkeypatch.setattr(settings, "parser_mode", "curl")
+    monkeypatch.setattr(settings, "use_local_html", False)
+    monkeypatch.setattr(settings, "crawl_enabled", True)
+    monkeypatch.setattr(settings, "crawl_rate", 0)
+    monkeypatch.setattr(settings, "archive_enabled", False)
+
+    def use_db(name):
+        db = DatabaseManager(str(tmp_path / name))
+        monkeypatch.setattr(main, "db_manager", db)
+        monkeypatch.setattr(database_manager, "db_manager", db)
+        return db
+
+    return main, use_db
+
+
+def test_main_cycle_cold(benchmark, main_cycle, monkeypatch):
+    """Пустая база, кэш страниц выключен: загрузка, разбор и запись всех страниц"""
+    main, use_db = main_cycle
+    monkeypatch.setattr(settings, "page_cache", False)
+    benchmark.group = "main"
+    counter = iter(range(10 ** 6))
+    benchmark.pedantic(main.main, setup=lambda: use_db(f"cold_{next(counter)}.db") and None, rounds=5)
+
+
+def test_main_cycle_warm(benchmark, main_cycle, monkeypatch):
+    """Повторный запуск по неизменной выдаче: 304 и пропуск разбора"""
+    main, use_db = main_cycle
+    monkeypatch.setattr(settings, "page_cache", True)
+    db = use_db("warm.db")
+    main.main()
+    benchmark.group = "main"
+    benchmark.pedantic(main.main, rounds=5)
+    assert db.get_page_state(settings.target_url)
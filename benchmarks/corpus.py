@@ -0,0 +1,156 @@
+"""
+Корпус страниц выдачи для проверки паритета движков извлечения и бенчмарков.
+
+Синтетические страницы повторяют разметку Avito (catalog-serp, item,
+item-title, itemprop=price, geo-root-, item-photo) и содержат пограничные
+случаи: рекламные карточки, карточки без цены/адреса/фото, стоп-слова,
+комментарии и вложенные теги в заголовке. Те же данные встраиваются в
+страницу как JSON-состояние (script data-mfe-state). К ним можно добавить
+реальные страницы, сохраненные через utils.file_manager.save_html.
+"""
+import glob
+import html as html_lib
+import json
+import os
+import random
+from typing import List, Tuple
+
+CITIES = ["moskva", "sankt-peterburg", "kazan", "orsk", "penza", "nizhniy_novgorod"]
+MODELS = ["RTX 4090 Palit GameRock", "RTX 4090 Gainward Phantom", "RTX 4080 Super MSI",
+          "RTX 4070 Ti ASUS TUF", "RX 7900 XTX Sapphire", "RTX 3090 Zotac"]
+ADDRESSES = ["Москва, м. Таганская", "Санкт-Петербург, Невский пр.", "Казань, р-н Вахитовский",
+             "Оренбургская обл., Орск", "Пенза, р-н Железнодорожный", None]
+
+
+def make_items(count: int, seed: int = 0, page: int = 1) -> List[dict]:
+    """Генерирует данные карточек (независимо от разметки)"""
+    rng = random.Random(seed * 1000 + page)
+    items = []
+    for i in range(count):
+        item_id = 7000000000 + seed * 100000 + page * 1000 + i
+        city = rng.choice(CITIES)
+        title = rng.choice(MODELS)
+        if rng.random() < 0.08:
+            title = f"Скупка видеокарт {title}"
+        slug = title.lower().replace(' ', '_')
+        items.append({
+            "id": item_id,
+            "title": title,
+            "urlPath": f"/{city}/tovary_dlya_kompyutera/{slug}_{item_id}",
+            "context": "H4sIAAAAAAAA_wE_AMD_YToyOntzOjEzOiJsb2NhbFByaW9yaXR5Ijt9",
+            "price": rng.choice([None] + [rng.randrange(60000, 250000, 100) for _ in range(9)]),
+            "description": rng.choice([None, f"{title}, отличное состояние, чек & гарантия. Торг."]),
+            "address": rng.choice(ADDRESSES),
+            "images": [
+                f"https://{rng.randint(10, 90)}.img.avito.st/image/1/1.{item_id}{n}"
+                for n in range(rng.choice([0, 1, 3, 5]))
+            ],
+            "promo": rng.random() < 0.04,
+            "srcset": rng.random() > 0.15,
+        })
+    return items
+
+
+def render_card(item: dict) -> str:
+    """Разметка одной карточки в стиле Avito"""
+    title = html_lib.escape(item["title"])
+    href = html_lib.escape(f'{item["urlPath"]}?context={item["context"]}')
+
+    # Заголовок с вложенным тегом, пробелами и комментарием, как в реальной выдаче
+    title_html = f'<h3 itemprop="name">\n  {title} <!-- t --><span></span>\n</h3>'
+
+    parts = [f'<div data-marker="item" data-item-id="{item["id"]}" class="iva-item-root-Kcj9I items-item-My3ih">']
+    if item["promo"]:
+        parts.append('<div data-marker="promo-item"><span>Реклама</span></div>')
+
+    if item["images"]:
+        parts.append('<div data-marker="item-photo" class="photo-slider-root-Exoie"><ul>')
+        for url in item["images"]:
+            if item["srcset"]:
+                parts.append(f'<li><img src="{url}_208" srcset="{url}_208 208w, {url}_472 472w, {url}_636 636w" alt=""></li>')
+            else:
+                parts.append(f'<li><img src="{url}_208" srcset="" alt=""></li>')
+        parts.append('</ul></div>')
+
+    parts.append('<div class="iva-item-body-KLUuy">')
+    parts.append(f'<a data-marker="item-title" href="{href}" itemprop="url" title="{title}">{title_html}</a>')
+    if item["price"] is not None:
+        parts.append('<p data-marker="item-price"><meta itemprop="priceCurrency" content="RUB">'
+                     f'<meta itemprop="price" content="{item["price"]}">'
+                     f'<span>{item["price"]:,} ₽</span></p>'.replace(',', ' '))
+    if item["description"]:
+        parts.append(f'<meta itemprop="description" content=" {html_lib.escape(item["description"])} ">')
+    if item["address"]:
+        parts.append(f'<div class="geo-root-zPwRk iva-item-geo"><p><span>{html_lib.escape(item["address"])}</span></p></div>')
+    parts.append('<div data-marker="item-date"><p>2 часа назад</p></div>')
+    parts.append('</div></div>')
+    return ''.join(parts)
+
+
+def state_item(item: dict) -> dict:
+    """Объявление в формате JSON-состояния страницы"""
+    city = item["urlPath"].split('/')[1]
+    return {
+        "id": item["id"],
+        "type": "item",
+        "title": item["title"],
+        "urlPath": item["urlPath"],
+        "priceDetailed": {"value": item["price"], "string": f"{item['price']} ₽"} if item["price"] is not None else {},
+        "description": item["description"],
+        "geo": {"formattedAddress": item["address"]} if item["address"] else {},
+        "location": {"name": city.replace('_', ' ').title()},
+        "images": [{"208x156": f"{url}_208", "472x354": f"{url}_472", "636x477": f"{url}_636"}
+                   for url in item["images"]],
+    }
+
+
+def render_state_script(items: List[dict]) -> str:
+    """Скрипт с состоянием каталога; рекламные карточки в состояние не попадают"""
+    state = {
+        "i18n": {"locale": "ru"},
+        "filters": {"items": [{"id": n, "title": f"Фильтр {n}"} for n in range(20)]},
+        "data": {"catalog": {"items": [state_item(item) for item in items if not item["promo"]],
+                             "pager": {"pages": 1}}},
+    }
+    payload = json.dumps(state, ensure_ascii=False).replace('</', '<\\/')
+    return f'<script type="mime/invalid" data-mfe-state="true">{payload}</script>'
+
+
+def render_catalog_page(items: List[dict], page: int = 1, last_page: int = 1, state: bool = True) -> str:
+    """Страница выдачи с карточками, шумом вокруг каталога, пагинацией и JSON-состоянием"""
+    cards = ''.join(render_card(item) for item in items)
+    noise = ''.join(f'<div class="filters-root-{n}"><label><input type="checkbox"> Фильтр {n}</label></div>'
+                    for n in range(200))
+    pages = ''.join(
+        f'<a href="/all/videokarty?q=rtx&amp;p={n}" data-marker="pagination-button/page({n})">{n}</a>'
+        for n in range(1, last_page + 1)
+    )
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8"><title>Видеокарты</title>'
+        '<script>window.__config__ = {"x": 1};</script><style>.a{color:red}</style></head><body>'
+        f'<div class="layout">{noise}'
+        f'<div data-marker="catalog-serp" class="items-items-pZX46">{cards}'
+        '<div class="items-extra"><div data-marker="item"><a data-marker="item-title" href="/nested">Вложенная</a></div></div>'
+        '</div>'
+        f'<nav data-marker="pagination-button">{pages}</nav>'
+        '</div>'
+        f'{render_state_script(items) if state else ""}'
+        '</body></html>'
+    )
+
+
+def synthetic_pages(count: int = 5, items: int = 50, seed: int = 0) -> List[Tuple[str, str]]:
+    """Набор синтетических страниц: (имя, html)"""
+    return [
+        (f"synthetic-{seed}-{page}", render_catalog_page(make_items(items, seed, page), page, count))
+        for page in range(1, count + 1)
+    ]
+
+
+def load_saved_pages(folder: str) -> List[Tuple[str, str]]:
+    """Сохраненные страницы (*.html) из папки, например trash/"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.html"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
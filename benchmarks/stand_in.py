@@ -0,0 +1,114 @@
+"""
+Локальная замена Avito для бенчмарков: HTTP-сервер с корпусом страниц выдачи.
+
+Любой путь отдает страницу выдачи с номером из параметра p (как у Avito),
+за последней страницей корпуса - 404. Ответы несут ETag и Last-Modified и
+поддерживают условные запросы (304), так что через сервер проверяется и
+кэш страниц. Сервер работает в фоновом потоке текущего процесса.
+
+    with serve_pages(synthetic_pages(5)) as base_url:
+        CurlParser().parse(base_url + "/moskva/videokarty")
+
+    python -m benchmarks.stand_in --port 8765 --pages trash
+"""
+import argparse
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Заполняются в make_server
+    pages: List[bytes] = []
+    etags: List[str] = []
+    last_modified = ""
+    latency = 0.0
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            number = int(query.get("p", ["1"])[0])
+        except ValueError:
+            number = 1
+        if not 1 <= number <= len(self.pages):
+            self.send_error(404)
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        etag = self.etags[number - 1]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = self.pages[number - 1]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(pages: List[Tuple[str, str]], host: str = "127.0.0.1", port: int = 0,
+                latency: float = 0.0) -> ThreadingHTTPServer:
+    """Сервер со страницами корпуса (имя, html); port=0 - свободный порт"""
+    bodies = [html.encode("utf-8") for _, html in pages]
+    handler = type("Handler", (StandInHandler,), {
+        "pages": bodies,
+        "etags": [f'"{hashlib.sha1(body).hexdigest()[:16]}"' for body in bodies],
+        "last_modified": formatdate(usegmt=True),
+        "latency": latency,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+@contextmanager
+def serve_pages(pages: List[Tuple[str, str]], latency: float = 0.0) -> Iterator[str]:
+    """Запускает сервер на время блока, возвращает базовый URL"""
+    server = make_server(pages, latency=latency)
+    thread = threading.Thread(target=server.serve_forever, name="stand-in", daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        yield f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    from benchmarks.corpus import synthetic_pages, load_saved_pages
+
+    parser = argparse.ArgumentParser(description="Локальный сервер со страницами выдачи")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", help="Папка с сохраненными страницами *.html (вместо синтетики)")
+    parser.add_argument("--synthetic", type=int, default=5, help="Число синтетических страниц")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, с")
+    args = parser.parse_args()
+
+    pages = load_saved_pages(args.pages) if args.pages else synthetic_pages(args.synthetic)
+    server = make_server(pages, port=args.port, latency=args.latency)
+    print(f"Страниц: {len(pages)}, http://127.0.0.1:{args.port}/moskva/videokarty?p=1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -13,17 +13,118 @@ class Settings:
     target_url: str = os.getenv("TARGET_URL", "")
     parser_mode: str = os.getenv("PARSER_MODE", "playwright")
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    log_dir: str = os.getenv("LOG_DIR", "logs")
+    db_path: str = os.getenv("DB_PATH", "database/avito_listings.db")
     
     # Заготовки для расширения
     use_antibot_tricks: bool = os.getenv("USE_ANTIBOT_TRICKS", "false").lower() == "true"
+    # HybridParser: adaptive - порядок бэкендов по статистике (services/backend_router.py),
+    # fixed - по USE_ANTIBOT_TRICKS (Playwright первым или разведка через curl)
+    hybrid_routing: str = os.getenv("HYBRID_ROUTING", "fixed")
+    router_window: int = int(os.getenv("ROUTER_WINDOW", "50"))  # исходов на связку раздел/бэкенд/профиль
+    router_max_age_hours: float = float(os.getenv("ROUTER_MAX_AGE_HOURS", "24"))
     use_local_html: bool = os.getenv("USE_LOCAL_HTML", "false").lower() == "true"
     local_html_path: str = os.getenv("LOCAL_HTML_PATH", "")
 
+    # Браузер Playwright
+    use_headless: bool = os.getenv("USE_HEADLESS", "false").lower() == "true"
+    browser_channel: str = os.getenv("BROWSER_CHANNEL", "chrome")
+
+    # Пул браузеров: число браузеров, контекстов в каждом и страниц до перезапуска
+    browser_pool_size: int = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+    browser_contexts_per_browser: int = int(os.getenv("BROWSER_CONTEXTS_PER_BROWSER", "3"))
+    browser_max_pages: int = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+    # Предел на одну задачу в браузере: зависший браузер заменяется новым
+    browser_task_timeout_sec: float = float(os.getenv("BROWSER_TASK_TIMEOUT_SEC", "120"))
+
+    # Пул прокси (services/proxy_pool.py): список через запятую и/или файл, по прокси в строке
+    proxies: str = os.getenv("PROXIES", "")
+    proxy_file: str = os.getenv("PROXY_FILE", "")
+    proxy_rate: float = float(os.getenv("PROXY_RATE", "1"))  # запросов в секунду через один прокси
+    proxy_cooldown_sec: float = float(os.getenv("PROXY_COOLDOWN_SEC", "30"))  # пауза после блокировки, удваивается
+    proxy_max_cooldown_sec: float = float(os.getenv("PROXY_MAX_COOLDOWN_SEC", "900"))
+
+    # Общее хранилище cookies curl и Playwright (services/session_store.py)
+    session_store_path: str = os.getenv("SESSION_STORE_PATH", "cookies/sessions.json")
+    session_ttl_hours: float = float(os.getenv("SESSION_TTL_HOURS", "24"))
+    session_flush_every: int = int(os.getenv("SESSION_FLUSH_EVERY", "20"))  # изменений до записи на диск
+    session_flush_sec: float = float(os.getenv("SESSION_FLUSH_SEC", "30"))
+
+    # Общий регулятор частоты запросов (services/rate_controller.py): shared - через БД для всех
+    # процессов, local - в пределах процесса, off - без ограничений. По умолчанию темп не выше
+    # прежнего лимита curl_async (2 запроса в секунду), регулятор только снижает его после 429
+    rate_control: str = os.getenv("RATE_CONTROL", "local")
+    fetch_rate_initial: float = float(os.getenv("FETCH_RATE_INITIAL", "2"))  # запросов в секунду к хосту с IP
+    fetch_rate_min: float = float(os.getenv("FETCH_RATE_MIN", "0.05"))
+    fetch_rate_max: float = float(os.getenv("FETCH_RATE_MAX", "2"))
+    fetch_rate_increase: float = float(os.getenv("FETCH_RATE_INCREASE", "0.05"))  # прибавка за успешный ответ
+    fetch_rate_decrease: float = float(os.getenv("FETCH_RATE_DECREASE", "0.5"))  # множитель после 429/блокировки
+    fetch_backoff_base: float = float(os.getenv("FETCH_BACKOFF_BASE", "5"))  # пауза после первой неудачи, удваивается
+    fetch_backoff_max: float = float(os.getenv("FETCH_BACKOFF_MAX", "600"))
+
+    # Асинхронный curl (PARSER_MODE=curl_async): одновременных запросов
+    curl_concurrency: int = int(os.getenv("CURL_CONCURRENCY", "8"))
+
+    # Число одновременно открытых вкладок в асинхронном Playwright
+    async_concurrency: int = int(os.getenv("ASYNC_CONCURRENCY", "3"))
+
+    # Движок извлечения объявлений: bs4, lxml (быстрый путь) или json (состояние страницы)
+    extract_engine: str = os.getenv("EXTRACT_ENGINE", "bs4")
+
+    # Профиль SQLite
+    sqlite_cache_mb: int = int(os.getenv("SQLITE_CACHE_MB", "64"))
+    sqlite_mmap_mb: int = int(os.getenv("SQLITE_MMAP_MB", "256"))
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # Обход нескольких страниц выдачи
+    crawl_enabled: bool = os.getenv("CRAWL_ENABLED", "false").lower() == "true"
+    crawl_max_pages: int = int(os.getenv("CRAWL_MAX_PAGES", "10"))
+    crawl_workers: int = int(os.getenv("CRAWL_WORKERS", "2"))
+    crawl_rate: float = float(os.getenv("CRAWL_RATE", "0.5"))  # запросов в секунду на домен, 0 - без потолка
+    # Условные запросы (ETag/Last-Modified) и пропуск страниц с прежним набором объявлений
+    page_cache: bool = os.getenv("PAGE_CACHE", "true").lower() == "true"
+
+    # Архив сырых страниц выдачи (utils/page_archive.py) для повторного извлечения без сети
+    archive_enabled: bool = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+    archive_dir: str = os.getenv("ARCHIVE_DIR", "archive")
+    archive_codec: str = os.getenv("ARCHIVE_CODEC", "zstd")  # zstd или gzip
+    archive_segment_mb: float = float(os.getenv("ARCHIVE_SEGMENT_MB", "256"))
+    # PARSER_MODE=replay: страницы из архива, последняя версия до этого момента (ISO, пусто - самая новая)
+    replay_at: str = os.getenv("REPLAY_AT", "")
+
+    # Эндпоинт метрик Prometheus в процессе бота (0 - выключен)
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))
+    metrics_host: str = os.getenv("METRICS_HOST", "0.0.0.0")
+
+    # Очередь заданий парсинга: число одновременно выполняемых заданий
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+
+    # Уведомления о новых объявлениях: окно и размер пачки, лимиты Telegram (сообщений в секунду)
+    notify_batch_sec: float = float(os.getenv("NOTIFY_BATCH_SEC", "3"))
+    notify_batch_size: int = int(os.getenv("NOTIFY_BATCH_SIZE", "10"))
+    notify_global_rate: float = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))
+    notify_chat_rate: float = float(os.getenv("NOTIFY_CHAT_RATE", "1"))
+    notify_media: bool = os.getenv("NOTIFY_MEDIA", "true").lower() == "true"
+
+    # Асинхронный бот (telegram_bot/async_bot.py): polling или webhook
+    bot_mode: str = os.getenv("BOT_MODE", "polling")
+    webhook_url: str = os.getenv("WEBHOOK_URL", "")  # публичный https-адрес, например https://bot.example.com
+    webhook_path: str = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+    webhook_host: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    webhook_port: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+    webhook_secret: str = os.getenv("WEBHOOK_SECRET", "")
+
+    # Автозапуск по расписанию (APScheduler, задания хранятся в SQLite)
+    autorun_interval_min: int = int(os.getenv("AUTORUN_INTERVAL_MIN", "30"))
+    autorun_jitter_sec: int = int(os.getenv("AUTORUN_JITTER_SEC", "120"))
+    autorun_max_concurrent: int = int(os.getenv("AUTORUN_MAX_CONCURRENT", "2"))
+    autorun_misfire_grace_sec: int = int(os.getenv("AUTORUN_MISFIRE_GRACE_SEC", "600"))
+
 settings = Settings()
 
 # Настройка логирования
 logger.remove()
 logger.add(sys.stdout, level=settings.log_level, 
            format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | {message}")
-logger.add("logs/app.log", level="DEBUG", rotation="10 MB", 
+logger.add(os.path.join(settings.log_dir, "app.log"), level="DEBUG", rotation="10 MB", 
            format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} | {message}")
@@ -0,0 +1,18 @@
+"""
+Общая настройка тестов: рабочие файлы (БД, логи, cookies, архив) уходят во
+временный каталог. Переменные окружения задаются до импорта config.settings,
+поэтому и глобальные экземпляры (db_manager, session_store, page_archive)
+не трогают database/avito_listings.db и каталоги рабочей копии.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="avito-tests-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+
+os.environ["DB_PATH"] = os.path.join(_workdir, "avito_listings.db")
+os.environ["LOG_DIR"] = os.path.join(_workdir, "logs")
+os.environ["SESSION_STORE_PATH"] = os.path.join(_workdir, "cookies", "sessions.json")
+os.environ["ARCHIVE_DIR"] = os.path.join(_workdir, "archive")
@@ -0,0 +1,291 @@
+"""
+Асинхронный curl-cffi: много страниц выдачи и объявлений за один проход.
+
+AsyncCurlEngine держит собственный цикл событий в фоновом потоке и по одной
+AsyncSession на профиль браузера (и прокси, если задан пул прокси). У каждой
+сессии свой пул соединений, и запросы одного профиля к хосту идут
+мультиплексированно по HTTP/2 (для http:// - обычный HTTP/1.1).
+Одновременных запросов не больше CURL_CONCURRENCY; темп к хосту с каждого
+IP и паузы после 429 задает общий регулятор (services/rate_controller.py),
+с прокси дополнительно действует лимит каждого прокси, PROXY_RATE. Движок
+общий для процесса (get_curl_engine), поэтому и потоки обхода выдачи,
+вызывающие parse(url), переиспользуют прогретые соединения.
+
+    parser = AsyncCurlParser()
+    html = parser.parse(url)
+    pages = parser.parse_many(urls)            # url -> HTML или None
+    results = await engine.fetch_many(urls)    # внутри цикла движка
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from curl_cffi import CurlHttpVersion
+from curl_cffi.requests import AsyncSession
+
+from core.base_parser import BaseParser, FetchResult, is_blocked
+from services.session_store import session_store, jar_key
+from services.proxy_pool import proxy_pool
+from services.rate_controller import RateController, rate_controller
+from config.settings import settings, logger
+from utils import metrics
+
+ATTEMPTS = 3
+
+
+class AsyncCurlEngine:
+    """Сессии AsyncSession по профилям в цикле событий фонового потока"""
+
+    def __init__(self, concurrency: int = None, controller: Optional[RateController] = None):
+        self.concurrency = max(1, concurrency or settings.curl_concurrency)
+        self.controller = controller or rate_controller
+        self._sessions: Dict[str, AsyncSession] = {}
+        # Версия cookies хранилища, уже переданная в сессию связки
+        self._cookie_versions: Dict[str, int] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # === Цикл событий ===
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Движок curl остановлен")
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="async-curl", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run(self, coro):
+        """Выполняет корутину в цикле движка и ждет результат (из любого потока, кроме самого цикла)"""
+        loop = self._ensure_loop()
+        done = concurrent.futures.Future()
+
+        def start():
+            task = loop.create_task(coro)
+            task.add_done_callback(lambda finished: _copy_outcome(finished, done))
+
+        # Задача создается в контексте вызывающего потока: замеры этапов попадают в его прогон
+        loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+        return done.result()
+
+    # === Загрузка ===
+    async def fetch_many(self, urls: Iterable[str],
+                         validators: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
+                         ) -> Dict[str, FetchResult]:
+        """
+        Загружает страницы конкурентно. validators: url -> (ETag, Last-Modified)
+        прошлого ответа для условных запросов. Возвращает url -> FetchResult.
+        """
+        urls = list(dict.fromkeys(urls))
+        validators = validators or {}
+        results = await asyncio.gather(*(self.fetch(url, *validators.get(url, (None, None))) for url in urls))
+
+        ok = sum(1 for result in results if result.html or result.not_modified)
+        if len(urls) > 1:
+            logger.success(f"[AsyncCurl] Загружено {ok}/{len(urls)} страниц")
+        return dict(zip(urls, results))
+
+    async def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                    profile: Optional[dict] = None) -> FetchResult:
+        """Одна страница с повторами при 429, блокировке и сетевых ошибках"""
+        from services.browser_profiles_2025 import get_random_profile
+        profile = profile or get_random_profile()
+
+        headers = profile["headers"].copy()
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        logger.debug(f"[AsyncCurl] {url} | профиль: {profile['name']}")
+        for attempt in range(ATTEMPTS):
+            last = attempt == ATTEMPTS - 1
+            proxy = await proxy_pool.acquire_async(profile['name'])
+            await self.controller.wait_async(url, proxy)
+            session = self._session(profile, proxy)
+
+            try:
+                async with self._limit():
+                    with metrics.stage("navigation", "curl_async"):
+                        response = await session.get(url, headers=headers, timeout=30, allow_redirects=True,
+                                                     proxy=proxy)
+            except Exception as e:
+                logger.error(f"[AsyncCurl] Ошибка {url} (попытка {attempt + 1}/{ATTEMPTS}): {e}")
+                metrics.count_fetch("curl_async", profile['name'], metrics.ERROR)
+                proxy_pool.report(proxy, metrics.ERROR)
+                if not last and not proxy:
+                    await asyncio.sleep(self.controller.backoff(attempt + 1))
+                continue
+
+            self._save_cookies(profile, session, proxy)
+            if response.status_code == 304:
+                logger.info(f"[AsyncCurl] HTTP 304 - страница не изменилась: {url}")
+                metrics.count_fetch("curl_async", profile['name'], metrics.NOT_MODIFIED)
+                proxy_pool.report(proxy, metrics.NOT_MODIFIED)
+                await self.controller.report_async(url, proxy, metrics.NOT_MODIFIED)
+                return FetchResult(None, 304, etag, last_modified)
+
+            if response.status_code in (404, 410):
+                logger.warning(f"[AsyncCurl] HTTP {response.status_code}: {url}")
+                metrics.count_fetch("curl_async", profile['name'], metrics.ERROR)
+                # Страницы нет, но прокси и темп тут ни при чем: сервер ответил, как CurlParser.fetch
+                proxy_pool.report(proxy, metrics.OK)
+                await self.controller.report_async(url, proxy, metrics.OK)
+                return FetchResult(None, response.status_code)
+
+            content = response.text
+            if response.status_code == 429:
+                logger.warning(f"[AsyncCurl] HTTP 429 - слишком много запросов: {url}")
+                metrics.count_fetch("curl_async", profile['name'], metrics.RATE_LIMITED)
+                proxy_pool.report(proxy, metrics.RATE_LIMITED)
+                await self.controller.report_async(url, proxy, metrics.RATE_LIMITED,
+                                                   response.headers.get("Retry-After"))
+                if not last:
+                    continue
+            elif is_blocked(content):
+                logger.warning(f"[AsyncCurl] Обнаружена блокировка {url} (попытка {attempt + 1}/{ATTEMPTS})")
+                outcome = metrics.CAPTCHA if content and "captcha" in content.lower() else metrics.BLOCKED
+                metrics.count_fetch("curl_async", profile['name'], outcome)
+                proxy_pool.report(proxy, outcome)
+                await self.controller.report_async(url, proxy, outcome)
+                if not last:
+                    continue
+            else:
+                metrics.count_fetch("curl_async", profile['name'], metrics.OK)
+                proxy_pool.report(proxy, metrics.OK)
+                await self.controller.report_async(url, proxy, metrics.OK)
+
+            logger.debug(f"[AsyncCurl] Получено {len(content):,} байт ({response.http_version}): {url}")
+            return FetchResult(content, response.status_code,
+                               response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+        return FetchResult(None, 0)
+
+    def _limit(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def _session(self, profile: dict, proxy: Optional[str] = None) -> AsyncSession:
+        """
+        Сессия связки профиль/прокси: пул соединений и отпечаток TLS/HTTP2 живут между запросами.
+        Cookies берутся из хранилища заново, если их с тех пор обновили браузер, curl или другой процесс.
+        """
+        key = jar_key(profile["name"], proxy)
+        session = self._sessions.get(key)
+        if session is None:
+            session = AsyncSession(
+                impersonate=profile["impersonate"],
+                http_version=CurlHttpVersion.V2TLS,
+                max_clients=self.concurrency,
+            )
+            self._sessions[key] = session
+            logger.debug(f"[AsyncCurl] Новая сессия {key}")
+
+        version = session_store.version(profile["name"], proxy)
+        if self._cookie_versions.get(key) != version:
+            session_store.apply_to_curl(profile["name"], session, proxy)
+            self._cookie_versions[key] = version
+        return session
+
+    def _save_cookies(self, profile: dict, session: AsyncSession, proxy: Optional[str] = None):
+        """Cookies ответа в хранилище; эта версия у сессии уже есть"""
+        session_store.update_from_curl(profile["name"], session, proxy)
+        self._cookie_versions[jar_key(profile["name"], proxy)] = session_store.version(profile["name"], proxy)
+
+    # === Остановка ===
+    async def _close_sessions(self):
+        for session in self._sessions.values():
+            try:
+                await session.close()
+            except Exception as e:
+                logger.debug(f"[AsyncCurl] Ошибка закрытия сессии: {e}")
+        self._sessions = {}
+
+    def shutdown(self, timeout: float = 10):
+        """Закрывает сессии и останавливает цикл событий"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop, thread = self._loop, self._thread
+        if loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_sessions(), loop).result(timeout)
+        except Exception as e:
+            logger.debug(f"[AsyncCurl] Ошибка остановки: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+        session_store.flush()
+        logger.debug("[AsyncCurl] Движок остановлен")
+
+
+def _copy_outcome(task: asyncio.Task, done: concurrent.futures.Future):
+    if task.cancelled():
+        done.cancel()
+    elif task.exception() is not None:
+        done.set_exception(task.exception())
+    else:
+        done.set_result(task.result())
+
+
+class AsyncCurlParser(BaseParser):
+    """Парсер поверх общего AsyncCurlEngine: одна страница или пачка URL"""
+
+    def __init__(self, engine: Optional[AsyncCurlEngine] = None):
+        # По умолчанию используется общий движок процесса
+        self._engine = engine
+
+    @property
+    def engine(self) -> AsyncCurlEngine:
+        return self._engine or get_curl_engine()
+
+    def parse(self, url: str, profile: Optional[dict] = None) -> Optional[str]:
+        """Загружает одну страницу (синхронная обертка)"""
+        return self.fetch(url, profile=profile).html
+
+    def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+              profile: Optional[dict] = None) -> FetchResult:
+        """Условный запрос одной страницы"""
+        engine = self.engine
+        return engine.run(engine.fetch(url, etag, last_modified, profile))
+
+    def parse_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Загружает страницы конкурентно, возвращает url -> HTML (None для неудачных)"""
+        engine = self.engine
+        return {url: result.html for url, result in engine.run(engine.fetch_many(urls)).items()}
+
+
+_engine: Optional[AsyncCurlEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_curl_engine() -> AsyncCurlEngine:
+    """Общий движок асинхронного curl для всего процесса"""
+    global _engine
+    with _engine_lock:
+        if _engine is None or _engine._closed:
+            _engine = AsyncCurlEngine()
+        return _engine
+
+
+def shutdown_curl_engine():
+    """Останавливает общий движок, если он был создан"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.shutdown()
+            _engine = None
+
+
+atexit.register(shutdown_curl_engine)
@@ -0,0 +1,184 @@
+from core.base_parser import BaseParser, is_blocked
+from core.browser_pool import BROWSER_ARGS, STEALTH_SCRIPT, context_options, launch_options
+from services.session_store import session_store, from_playwright, jar_key
+from services.proxy_pool import proxy_pool
+from services.rate_controller import rate_controller
+from utils import metrics
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from typing import Dict, Iterable, Optional
+from config.settings import settings, logger
+import asyncio
+import random
+
+class AsyncPlaywrightParser(BaseParser):
+    """Асинхронный Playwright: несколько вкладок одновременно в общих контекстах"""
+
+    def __init__(self, concurrency: int = None):
+        self.concurrency = max(1, concurrency or settings.async_concurrency)
+
+    def parse(self, url: str) -> Optional[str]:
+        """Загружает одну страницу (синхронная обертка над parse_many)"""
+        return asyncio.run(self.parse_many([url], concurrency=1)).get(url)
+
+    async def parse_many(self, urls: Iterable[str], concurrency: int = None) -> Dict[str, Optional[str]]:
+        """
+        Загружает страницы, держа открытыми не более concurrency вкладок.
+        Возвращает словарь url -> HTML (None для неудачных загрузок).
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+
+        limit = asyncio.Semaphore(max(1, concurrency or self.concurrency))
+        contexts = {}
+        contexts_lock = asyncio.Lock()
+
+        from services.browser_profiles_2025 import get_random_profile
+
+        try:
+            async with async_playwright() as p:
+                browser = await self._launch(p)
+
+                async def get_context(profile, proxy):
+                    # Контекст связки профиль/прокси создается один раз и делится между вкладками
+                    key = jar_key(profile["name"], proxy)
+                    async with contexts_lock:
+                        if key not in contexts:
+                            context = await browser.new_context(**context_options(profile, proxy))
+                            await context.add_init_script(STEALTH_SCRIPT)
+                            await self._load_cookies(context, profile["name"], proxy)
+                            contexts[key] = (context, profile["name"], proxy)
+                        return contexts[key][0]
+
+                async def fetch(url):
+                    async with limit:
+                        profile = get_random_profile()
+                        proxy = await proxy_pool.acquire_async(profile["name"])
+                        await rate_controller.wait_async(url, proxy)
+                        logger.info(f"[AsyncPlaywright] {url} | профиль: {profile['name']}")
+                        try:
+                            context = await get_context(profile, proxy)
+                            content = await self._fetch(context, url)
+                            if content is None:
+                                outcome = metrics.RATE_LIMITED
+                            else:
+                                outcome = metrics.BLOCKED if is_blocked(content) else metrics.OK
+                            proxy_pool.report(proxy, outcome)
+                            await rate_controller.report_async(url, proxy, outcome)
+                            return url, content
+                        except PlaywrightTimeoutError:
+                            logger.error(f"[AsyncPlaywright] Timeout загрузки: {url}")
+                        except Exception as e:
+                            logger.error(f"[AsyncPlaywright] Ошибка {url}: {e}")
+                        proxy_pool.report(proxy, metrics.ERROR)
+                        return url, None
+
+                try:
+                    results = await asyncio.gather(*(fetch(url) for url in urls))
+                    for context, profile_name, proxy in contexts.values():
+                        await self._save_cookies(context, profile_name, proxy)
+                finally:
+                    await browser.close()
+
+        except Exception as e:
+            logger.error(f"[AsyncPlaywright] Ошибка: {e}")
+            if "Executable not found" in str(e):
+                logger.error("Выполните: playwright install chromium")
+            return {url: None for url in urls}
+
+        ok = sum(1 for _, content in results if content)
+        logger.success(f"[AsyncPlaywright] Загружено {ok}/{len(urls)} страниц")
+        return dict(results)
+
+    async def _launch(self, p):
+        """Запуск Chrome с fallback на Chromium"""
+        if settings.browser_channel == "chrome" and not settings.use_headless:
+            try:
+                browser = await p.chromium.launch(headless=False, channel="chrome", args=BROWSER_ARGS,
+                                                  **launch_options())
+                logger.success("[AsyncPlaywright] Используется Google Chrome (не headless)")
+                return browser
+            except Exception as e:
+                logger.warning(f"[AsyncPlaywright] Chrome недоступен: {e}")
+
+        browser = await p.chromium.launch(headless=settings.use_headless, args=BROWSER_ARGS, **launch_options())
+        mode = "headless" if settings.use_headless else "headed"
+        logger.info(f"[AsyncPlaywright] Используется Chromium ({mode})")
+        return browser
+
+    async def _fetch(self, context, url: str) -> Optional[str]:
+        """Загружает одну страницу в отдельной вкладке"""
+        page = await context.new_page()
+        try:
+            await self._pre_navigation_behavior(page)
+
+            response = await page.goto(url, wait_until='domcontentloaded', timeout=60000)
+
+            if response and response.status == 429:
+                logger.error(f"[AsyncPlaywright] HTTP 429 - Rate limit: {url}")
+                return None
+
+            await self._post_navigation_behavior(page)
+
+            try:
+                await page.wait_for_selector("div[data-marker='catalog-serp']", timeout=15000)
+            except PlaywrightTimeoutError:
+                logger.warning(f"[AsyncPlaywright] Каталог не найден - возможна блокировка: {url}")
+
+            await asyncio.sleep(random.uniform(2.0, 4.0))
+
+            content = await page.content()
+            logger.debug(f"[AsyncPlaywright] Получено {len(content):,} байт: {url}")
+            return content
+        finally:
+            try:
+                await page.close()
+            except Exception as e:
+                logger.debug(f"[AsyncPlaywright] Ошибка закрытия вкладки: {e}")
+
+    async def _pre_navigation_behavior(self, page):
+        """Эмулирует поведение перед переходом"""
+        try:
+            await page.mouse.move(0, 0)
+            await asyncio.sleep(random.uniform(0.1, 0.3))
+            await page.mouse.move(
+                random.randint(400, 800),
+                random.randint(200, 400),
+                steps=random.randint(10, 20)
+            )
+        except Exception as e:
+            logger.debug(f"[AsyncPlaywright] Pre-navigation ошибка: {e}")
+
+    async def _post_navigation_behavior(self, page):
+        """Эмулирует поведение после загрузки; паузы не блокируют соседние вкладки"""
+        try:
+            await asyncio.sleep(random.uniform(1.5, 3.0))
+
+            for _ in range(random.randint(1, 3)):
+                scroll_y = random.randint(100, 300)
+                await page.evaluate(f"window.scrollBy(0, {scroll_y})")
+                await asyncio.sleep(random.uniform(0.5, 1.5))
+
+            await page.mouse.move(
+                random.randint(300, 700),
+                random.randint(200, 500),
+                steps=random.randint(5, 10)
+            )
+        except Exception as e:
+            logger.debug(f"[AsyncPlaywright] Post-navigation ошибка: {e}")
+
+    async def _load_cookies(self, context, profile_name: str, proxy: Optional[str] = None):
+        """Cookies связки профиль/прокси из общего хранилища"""
+        cookies = session_store.get(profile_name, proxy)
+        if cookies:
+            try:
+                await context.add_cookies(cookies)
+            except Exception as e:
+                logger.debug(f"[AsyncPlaywright] Ошибка загрузки cookies: {e}")
+
+    async def _save_cookies(self, context, profile_name: str, proxy: Optional[str] = None):
+        """Передает cookies контекста в общее хранилище"""
+        try:
+            session_store.update(profile_name, from_playwright(await context.cookies()), proxy)
+        except Exception as e:
+            logger.debug(f"[AsyncPlaywright] Ошибка сохранения cookies: {e}")
@@ -1,6 +1,37 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from typing import Optional
 
+
+@dataclass
+class FetchResult:
+    """Ответ на (условный) запрос страницы"""
+    html: Optional[str]
+    status: int = 200
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+BLOCK_KEYWORDS = [
+    "Проблема с IP",
+    "Доступ с Вашего IP временно ограничен",
+    "captcha",
+    "cloudflare"
+]
+
+
+def is_blocked(content: Optional[str]) -> bool:
+    """Пустой ответ или страница блокировки/капчи"""
+    if not content:
+        return True
+    content_lower = content.lower()
+    return any(keyword.lower() in content_lower for keyword in BLOCK_KEYWORDS)
+
+
 class BaseParser(ABC):
     """Базовый интерфейс для всех парсеров"""
     
@@ -9,17 +40,14 @@ class BaseParser(ABC):
         """Получает HTML со страницы"""
         pass
     
+    def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> FetchResult:
+        """
+        Загрузка с валидаторами прошлого ответа. Парсеры без HTTP-уровня
+        (браузер, локальный файл) игнорируют их и всегда возвращают страницу.
+        """
+        html = self.parse(url)
+        return FetchResult(html, 200 if html else 0)
+    
     def check_blocking(self, content: str) -> bool:
         """Проверка на блокировку"""
-        if not content:
-            return True
-        
-        block_keywords = [
-            "Проблема с IP",
-            "Доступ с Вашего IP временно ограничен",
-            "captcha",
-            "cloudflare"
-        ]
-        
-        content_lower = content.lower()
-        return any(keyword.lower() in content_lower for keyword in block_keywords)
+        return is_blocked(content)
@@ -0,0 +1,362 @@
+"""
+Пул долгоживущих браузеров Playwright.
+
+Каждый браузер живет в собственном потоке (sync API Playwright привязан к
+потоку, в котором был запущен), держит несколько переиспользуемых контекстов
+по имени профиля и перезапускается после заданного числа страниц. Задача,
+не уложившаяся в BROWSER_TASK_TIMEOUT_SEC, прерывается ожиданием: поток
+зависшего браузера выводится из пула и заменяется новым.
+"""
+import atexit
+import contextvars
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from playwright.sync_api import sync_playwright
+from services.session_store import session_store, jar_key
+from services.proxy_pool import playwright_proxy, proxy_pool
+from config.settings import settings, logger
+from utils import metrics
+
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+]
+
+STEALTH_SCRIPT = """
+// Убираем webdriver
+Object.defineProperty(navigator, 'webdriver', {
+    get: () => undefined
+});
+
+// Правильные плагины для Chrome
+Object.defineProperty(navigator, 'plugins', {
+    get: () => [
+        {0: {type: "application/x-google-chrome-pdf", suffixes: "pdf"}},
+        {0: {type: "application/pdf", suffixes: "pdf"}}
+    ]
+});
+
+// Правильный chrome объект
+window.chrome = {
+    runtime: {},
+    loadTimes: function() {},
+    csi: function() {}
+};
+
+// Исправляем permissions
+const originalQuery = window.navigator.permissions.query;
+window.navigator.permissions.query = (parameters) => (
+    parameters.name === 'notifications' ?
+        Promise.resolve({ state: Notification.permission }) :
+        originalQuery(parameters)
+);
+"""
+
+# Признаки того, что браузер упал и его нужно перезапустить
+BROWSER_CRASH_MARKERS = ("Target closed", "Browser has been closed", "Connection closed")
+
+
+def context_options(profile: dict, proxy: Optional[str] = None) -> dict:
+    """Параметры контекста браузера для профиля (и прокси контекста)"""
+    options = {
+        'user_agent': profile["headers"]["user-agent"],
+        'viewport': profile["viewport"],
+        'locale': 'ru-RU',
+        'timezone_id': 'Europe/Moscow',
+        # ВАЖНО: передаем только accept-language, остальное генерируется
+        'extra_http_headers': {
+            'accept-language': profile["headers"]["accept-language"]
+        },
+        # Дополнительные параметры для реалистичности
+        'device_scale_factor': 1.0,
+        'has_touch': False,
+        'is_mobile': False,
+    }
+    if proxy:
+        options['proxy'] = playwright_proxy(proxy)
+    return options
+
+
+def launch_options() -> dict:
+    """Chromium на части платформ принимает прокси контекста, только если при запуске задан прокси"""
+    return {'proxy': {'server': 'http://per-context'}} if proxy_pool.enabled else {}
+
+
+class _BrowserWorker(threading.Thread):
+    """Поток, владеющий одним браузером и его контекстами"""
+
+    def __init__(self, pool: "BrowserPool", index: int):
+        super().__init__(name=f"browser-pool-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.tasks: "queue.Queue" = queue.Queue()
+        self.pages_served = 0
+        self.launches = 0
+        # Выведен из пула после зависания: закрывает браузер, как только освободится
+        self.abandoned = False
+        self._playwright = None
+        self._browser = None
+        self._contexts: "OrderedDict[str, Any]" = OrderedDict()
+
+    def submit(self, profile: dict, fn: Callable, proxy: Optional[str] = None) -> Future:
+        future = Future()
+        # Контекст вызывающего потока (замер текущего прогона, см. utils/metrics.py)
+        self.tasks.put((profile, proxy, fn, future, contextvars.copy_context()))
+        return future
+
+    def run(self):
+        while not self.abandoned:
+            task = self.tasks.get()
+            if task is None:
+                break
+
+            profile, proxy, fn, future, caller_context = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                future.set_result(caller_context.run(lambda: fn(self._get_context(profile, proxy))))
+            except BaseException as e:
+                future.set_exception(e)
+                if any(marker in str(e) for marker in BROWSER_CRASH_MARKERS):
+                    logger.warning(f"[Pool] Браузер #{self.index} упал, перезапускаем")
+                    self._close_browser()
+            finally:
+                self.pages_served += 1
+                if self.pages_served >= self.pool.max_pages:
+                    logger.info(f"[Pool] Браузер #{self.index} обработал {self.pages_served} страниц, перезапуск")
+                    self._close_browser()
+
+        self._close_browser()
+        if self._playwright:
+            try:
+                self._playwright.stop()
+            except Exception as e:
+                logger.debug(f"[Pool] Ошибка остановки Playwright: {e}")
+            self._playwright = None
+
+    def _is_healthy(self) -> bool:
+        """Проверка, что браузер запущен и отвечает"""
+        try:
+            return self._browser is not None and self._browser.is_connected()
+        except Exception:
+            return False
+
+    def _ensure_browser(self):
+        if self._is_healthy():
+            return
+
+        if self._browser is not None:
+            logger.warning(f"[Pool] Браузер #{self.index} не отвечает, перезапускаем")
+            self._close_browser()
+
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+
+        with metrics.stage("browser_launch", "playwright"):
+            self._browser = self._launch()
+        self.launches += 1
+        self.pages_served = 0
+
+    def _launch(self):
+        """Запуск Chrome с fallback на Chromium"""
+        p = self._playwright
+
+        if settings.browser_channel == "chrome" and not settings.use_headless:
+            try:
+                # Используем установленный Google Chrome
+                browser = p.chromium.launch(headless=False, channel="chrome", args=BROWSER_ARGS,
+                                            **launch_options())
+                logger.success(f"[Pool] Браузер #{self.index}: Google Chrome (не headless)")
+                return browser
+            except Exception as e:
+                logger.warning(f"[Pool] Chrome недоступен: {e}")
+
+        # Fallback на Chromium
+        browser = p.chromium.launch(headless=settings.use_headless, args=BROWSER_ARGS, **launch_options())
+        mode = "headless" if settings.use_headless else "headed"
+        logger.info(f"[Pool] Браузер #{self.index}: Chromium ({mode})")
+        return browser
+
+    def _get_context(self, profile: dict, proxy: Optional[str] = None):
+        """Возвращает контекст связки профиль/прокси, создавая его при необходимости"""
+        self._ensure_browser()
+
+        key = jar_key(profile["name"], proxy)
+        context = self._contexts.get(key)
+        if context is not None:
+            self._contexts.move_to_end(key)
+            return context
+
+        # Вытесняем самый давно использованный контекст
+        while len(self._contexts) >= self.pool.contexts_per_browser:
+            _, old_context = self._contexts.popitem(last=False)
+            try:
+                old_context.close()
+            except Exception as e:
+                logger.debug(f"[Pool] Ошибка закрытия контекста: {e}")
+
+        context = self._browser.new_context(**context_options(profile, proxy))
+        context.add_init_script(STEALTH_SCRIPT)
+        self._load_cookies(context, profile["name"], proxy)
+
+        self._contexts[key] = context
+        logger.debug(f"[Pool] Браузер #{self.index}: создан контекст '{key}'")
+        return context
+
+    def _load_cookies(self, context, profile_name: str, proxy: Optional[str] = None):
+        """Cookies связки профиль/прокси из общего хранилища в новый контекст"""
+        cookies = session_store.get(profile_name, proxy)
+        if cookies:
+            try:
+                context.add_cookies(cookies)
+                logger.debug(f"[Pool] Cookies профиля '{profile_name}' загружены: {len(cookies)}")
+            except Exception as e:
+                logger.debug(f"[Pool] Ошибка загрузки cookies: {e}")
+
+    def _close_browser(self):
+        self._contexts.clear()
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception as e:
+                logger.debug(f"[Pool] Ошибка закрытия браузера: {e}")
+            self._browser = None
+
+
+class BrowserLease:
+    """Арендованный браузер пула; задачи выполняются в его потоке"""
+
+    def __init__(self, worker: _BrowserWorker):
+        self._worker = worker
+
+    def run(self, profile: dict, fn: Callable, timeout: Optional[float] = None,
+            proxy: Optional[str] = None) -> Any:
+        """
+        Выполняет fn(context) в контексте профиля (через прокси) и возвращает результат.
+        Если задача не уложилась в timeout, браузер считается зависшим и выводится из
+        пула (при возврате аренды его заменит новый), а вызывающий получает TimeoutError.
+        """
+        future = self._worker.submit(profile, fn, proxy)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._worker.abandoned = True
+            self._worker.tasks.put(None)
+            logger.error(f"[Pool] Браузер #{self._worker.index} не ответил за {timeout:.0f}с, заменяем")
+            raise TimeoutError(f"Браузер не ответил за {timeout:.0f}с")
+
+
+class BrowserPool:
+    """Пул из N прогретых браузеров с арендой, проверкой здоровья и перезапуском"""
+
+    def __init__(self, size: int = None, contexts_per_browser: int = None, max_pages: int = None):
+        self.size = max(1, size or settings.browser_pool_size)
+        self.contexts_per_browser = max(1, contexts_per_browser or settings.browser_contexts_per_browser)
+        self.max_pages = max(1, max_pages or settings.browser_max_pages)
+
+        self._workers = [_BrowserWorker(self, i) for i in range(self.size)]
+        self._next_index = self.size
+        self._workers_lock = threading.Lock()
+        self._idle: "queue.Queue[_BrowserWorker]" = queue.Queue()
+        for worker in self._workers:
+            worker.start()
+            self._idle.put(worker)
+
+        self._closed = False
+        logger.debug(f"[Pool] Пул браузеров создан: {self.size} шт.")
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """Арендует свободный браузер и возвращает его в пул после использования"""
+        if self._closed:
+            raise RuntimeError("Пул браузеров остановлен")
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Нет свободных браузеров в пуле")
+
+        try:
+            yield BrowserLease(worker)
+        finally:
+            self._idle.put(self._replace(worker) if worker.abandoned else worker)
+
+    def _replace(self, worker: _BrowserWorker) -> _BrowserWorker:
+        """Новый поток с браузером вместо зависшего; старый завершится сам, когда освободится"""
+        with self._workers_lock:
+            replacement = _BrowserWorker(self, self._next_index)
+            self._next_index += 1
+            self._workers[self._workers.index(worker)] = replacement
+        replacement.start()
+        return replacement
+
+    def run(self, profile: dict, fn: Callable, timeout: Optional[float] = None,
+            proxy: Optional[str] = None, task_timeout: Optional[float] = None) -> Any:
+        """
+        Арендует браузер, выполняет fn(context) и возвращает браузер в пул.
+        timeout - ожидание свободного браузера, task_timeout - предел на саму задачу
+        (по умолчанию BROWSER_TASK_TIMEOUT_SEC).
+        """
+        task_timeout = settings.browser_task_timeout_sec if task_timeout is None else task_timeout
+        with self.lease(timeout=timeout) as lease:
+            return lease.run(profile, fn, timeout=task_timeout or None, proxy=proxy)
+
+    def stats(self) -> list:
+        """Состояние браузеров пула"""
+        return [
+            {
+                'index': worker.index,
+                'alive': worker.is_alive(),
+                'launches': worker.launches,
+                'pages_served': worker.pages_served,
+            }
+            for worker in self._workers
+        ]
+
+    def shutdown(self, timeout: float = 10.0):
+        """Закрывает все браузеры и останавливает потоки пула"""
+        if self._closed:
+            return
+        self._closed = True
+
+        for worker in self._workers:
+            worker.tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+
+        logger.debug("[Pool] Пул браузеров остановлен")
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Общий пул браузеров для всего процесса"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = BrowserPool()
+        return _pool
+
+
+def shutdown_browser_pool():
+    """Останавливает общий пул, если он был создан"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown_browser_pool)
@@ -1,10 +1,12 @@
-from core.base_parser import BaseParser
+from core.base_parser import BaseParser, FetchResult
 from curl_cffi import requests
 from typing import Optional
 from services.antibot_toolkit import antibot_toolkit
+from services.session_store import session_store
+from services.proxy_pool import proxy_pool, redact
+from services.rate_controller import rate_controller
 from config.settings import settings, logger
-import json
-import os
+from utils import metrics
 import time
 
 class CurlParser(BaseParser):
@@ -12,86 +14,98 @@ class CurlParser(BaseParser):
     
     def __init__(self):
         self.session = requests.Session()
-        self.cookies_file = "cookies/curl_cookies.json"
-        self._load_cookies()
     
-    def _load_cookies(self):
-        """Загрузка сохраненных cookies"""
-        if os.path.exists(self.cookies_file):
-            try:
-                with open(self.cookies_file, 'r') as f:
-                    cookies = json.load(f)
-                    for cookie in cookies:
-                        self.session.cookies.set(**cookie)
-                logger.debug("[curl] Cookies загружены")
-            except Exception as e:
-                logger.warning(f"[curl] Ошибка загрузки cookies: {e}")
-    
-    def _save_cookies(self):
-        """Сохранение cookies"""
-        os.makedirs("cookies", exist_ok=True)
-        cookies = []
-        try:
-            for cookie in self.session.cookies:
-                cookies.append({
-                    'name': cookie.name,
-                    'value': cookie.value,
-                    'domain': cookie.domain,
-                    'path': cookie.path
-                })
-            with open(self.cookies_file, 'w') as f:
-                json.dump(cookies, f)
-        except Exception as e:
-            logger.debug(f"[curl] Ошибка сохранения cookies: {e}")
-    
-    def parse(self, url: str) -> Optional[str]:
+    def parse(self, url: str, profile: Optional[dict] = None) -> Optional[str]:
         """Загрузка через curl-cffi с актуальными профилями"""
+        return self.fetch(url, profile=profile).html
+    
+    def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+              profile: Optional[dict] = None) -> FetchResult:
+        """Условный запрос: при неизменной странице сервер отвечает 304 без тела"""
         
-        # Используем новые профили 2025 года
+        # Используем новые профили 2025 года (конкретный профиль выбирает HybridParser)
         from services.browser_profiles_2025 import get_random_profile
-        profile = get_random_profile()
+        profile = profile or get_random_profile()
         
         headers = profile["headers"].copy()
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
         impersonate = profile["impersonate"]  # Теперь это алиас: chrome/firefox/safari
         
         logger.info(f"[curl] Используем профиль: {profile['name']}")
         logger.debug(f"[curl] Impersonate: {impersonate}")
         
         for attempt in range(3):
+            # Прокси закреплен за профилем; после блокировки он на паузе и берется другой.
+            # Темп и паузу после 429 для связки хост/IP задает общий регулятор
+            proxy = proxy_pool.acquire(profile['name'])
+            if proxy:
+                logger.debug(f"[curl] Прокси: {redact(proxy)}")
+            rate_controller.wait(url, proxy)
+            # Cookies связки профиль/прокси из общего хранилища (их мог получить и браузер)
+            session_store.apply_to_curl(profile['name'], self.session, proxy)
             try:
                 # КРИТИЧНО: используем правильный impersonate
-                response = self.session.get(
-                    url,
-                    headers=headers,
-                    impersonate=impersonate,  # curl-cffi сам выберет актуальную версию
-                    timeout=30,
-                    allow_redirects=True,
-                    verify=True  # Проверка SSL важна
-                )
+                with metrics.stage("navigation", "curl"):
+                    response = self.session.get(
+                        url,
+                        headers=headers,
+                        impersonate=impersonate,  # curl-cffi сам выберет актуальную версию
+                        timeout=30,
+                        allow_redirects=True,
+                        verify=True,  # Проверка SSL важна
+                        proxy=proxy
+                    )
+                
+                session_store.update_from_curl(profile['name'], self.session, proxy)
+                
+                if response.status_code == 304:
+                    logger.info("[curl] HTTP 304 - страница не изменилась")
+                    metrics.count_fetch("curl", profile['name'], metrics.NOT_MODIFIED)
+                    proxy_pool.report(proxy, metrics.NOT_MODIFIED)
+                    rate_controller.report(url, proxy, metrics.NOT_MODIFIED)
+                    return FetchResult(None, 304, etag, last_modified)
                 
-                self._save_cookies()
                 content = response.text
                 
                 if response.status_code == 429:
                     logger.warning(f"[curl] HTTP 429 - слишком много запросов")
+                    metrics.count_fetch("curl", profile['name'], metrics.RATE_LIMITED)
+                    proxy_pool.report(proxy, metrics.RATE_LIMITED)
+                    rate_controller.report(url, proxy, metrics.RATE_LIMITED, response.headers.get("Retry-After"))
                     if attempt < 2:
-                        wait_time = (attempt + 1) * 5
-                        logger.info(f"[curl] Ждем {wait_time} секунд...")
-                        time.sleep(wait_time)
                         continue
                 
-                if self.check_blocking(content):
+                blocked = self.check_blocking(content)
+                if blocked:
                     logger.warning(f"[curl] Обнаружена блокировка (попытка {attempt + 1}/3)")
+                    outcome = metrics.CAPTCHA if content and "captcha" in content.lower() else metrics.BLOCKED
+                    metrics.count_fetch("curl", profile['name'], outcome)
+                    if response.status_code != 429:
+                        proxy_pool.report(proxy, outcome)
+                        rate_controller.report(url, proxy, outcome)
                     if attempt < 2:
-                        time.sleep(random.uniform(3, 7))
                         continue
                 
                 logger.success(f"[curl] Получено {len(content):,} байт")
-                return content
+                if not blocked and response.status_code != 429:
+                    metrics.count_fetch("curl", profile['name'], metrics.OK)
+                    proxy_pool.report(proxy, metrics.OK)
+                    rate_controller.report(url, proxy, metrics.OK)
+                return FetchResult(
+                    content,
+                    response.status_code,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified")
+                )
                 
             except Exception as e:
                 logger.error(f"[curl] Ошибка (попытка {attempt + 1}/3): {e}")
-                if attempt < 2:
-                    time.sleep(3)
+                metrics.count_fetch("curl", profile['name'], metrics.ERROR)
+                proxy_pool.report(proxy, metrics.ERROR)
+                if attempt < 2 and not proxy:
+                    time.sleep(rate_controller.backoff(attempt + 1))
         
-        return None
+        return FetchResult(None, 0)
@@ -8,9 +8,10 @@ import time
 class HybridParser(BaseParser):
     """Гибридный парсер с умным переключением"""
     
-    def __init__(self):
+    def __init__(self, router=None):
         self.curl_parser = CurlParser()
         self._playwright_parser = None  # Ленивая инициализация
+        self._router = router
         self.stats = {
             'curl_success': 0,
             'curl_fail': 0,
@@ -20,16 +21,26 @@ class HybridParser(BaseParser):
     
     @property
     def playwright_parser(self):
-        """Ленивая загрузка Playwright"""
+        """Ленивая загрузка Playwright (браузеры из общего пула процесса)"""
         if self._playwright_parser is None:
             self._playwright_parser = PlaywrightParser()
         return self._playwright_parser
     
+    @property
+    def router(self):
+        """Роутер бэкендов (по умолчанию общий для процесса)"""
+        if self._router is None:
+            from services.backend_router import backend_router
+            self._router = backend_router
+        return self._router
+    
     def parse(self, url: str) -> Optional[str]:
         """Умное переключение между парсерами"""
         
         logger.info("[Hybrid] Начинаем гибридный парсинг")
         
+        if settings.hybrid_routing == "adaptive":
+            return self._adaptive_mode(url)
         if not settings.use_antibot_tricks:
             # Стандартный режим - Playwright первый (для Avito)
             return self._standard_mode(url)
@@ -37,6 +48,32 @@ class HybridParser(BaseParser):
             # Режим обхода - анализ через curl, работа через Playwright
             return self._antibot_mode(url)
     
+    def _adaptive_mode(self, url: str) -> Optional[str]:
+        """Порядок бэкендов и профили выбирает роутер по статистике прошлых загрузок"""
+        from services.browser_profiles_2025 import get_profile_by_name
+        
+        content = None
+        for backend, profile_name in self.router.plan(url):
+            parser = self.curl_parser if backend == "curl" else self.playwright_parser
+            logger.info(f"[Hybrid] Пробуем {backend} ({profile_name})")
+            
+            start = time.time()
+            html = parser.parse(url, profile=get_profile_by_name(profile_name))
+            elapsed = time.time() - start
+            
+            content = html or content
+            success = bool(html) and self._is_valid_content(html)
+            self.router.record(url, backend, profile_name, success, elapsed)
+            self.stats[f'{backend}_success' if success else f'{backend}_fail'] += 1
+            if success:
+                logger.success(f"[Hybrid] {backend} справился ({elapsed:.1f}с)")
+                self._show_stats()
+                return content
+        
+        # Ни один бэкенд не отдал выдачу: возвращаем что есть, блокировку разберет вызывающий
+        self._show_stats()
+        return content
+    
     def _standard_mode(self, url: str) -> Optional[str]:
         """Стандартный режим: Playwright → curl"""
         
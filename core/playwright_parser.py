@@ -1,172 +1,129 @@
 from core.base_parser import BaseParser
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from core.browser_pool import BrowserPool, get_browser_pool
+from services.session_store import session_store, from_playwright
+from services.proxy_pool import proxy_pool, redact
+from services.rate_controller import rate_controller
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from typing import Optional
 from loguru import logger
+from utils import metrics
 import random
 import time
-import os
 
 class PlaywrightParser(BaseParser):
     """Парсер с использованием настоящего Chrome и улучшенной маскировкой"""
     
-    def parse(self, url: str) -> Optional[str]:
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        # По умолчанию используется общий пул браузеров процесса
+        self._pool = pool
+    
+    @property
+    def pool(self) -> BrowserPool:
+        return self._pool or get_browser_pool()
+    
+    def parse(self, url: str, profile: Optional[dict] = None) -> Optional[str]:
         """Загружает страницу с эмуляцией реального пользователя"""
         
-        # Используем новые профили
+        # Используем новые профили (конкретный профиль выбирает HybridParser)
         from services.browser_profiles_2025 import get_random_profile
-        profile = get_random_profile()
+        profile = profile or get_random_profile()
         
         logger.info(f"[Playwright] Используем профиль: {profile['name']}")
-        
-        # Определяем режим браузера из .env
-        use_headless = os.getenv("USE_HEADLESS", "false").lower() == "true"
-        browser_channel = os.getenv("BROWSER_CHANNEL", "chrome")
+        # Прокси закреплен за профилем; у каждой связки профиль/прокси свой контекст
+        proxy = proxy_pool.acquire(profile['name'])
+        if proxy:
+            logger.info(f"[Playwright] Прокси: {redact(proxy)}")
+        rate_controller.wait(url, proxy)
         
         try:
-            with sync_playwright() as p:
-                # КРИТИЧНО: Пробуем настоящий Chrome
-                browser = None
-                browser_args = [
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox',
-                    f'--user-agent={profile["headers"]["user-agent"]}'
-                ]
-                
-                if browser_channel == "chrome" and not use_headless:
-                    try:
-                        # Используем установленный Google Chrome
-                        browser = p.chromium.launch(
-                            headless=False,
-                            channel="chrome",
-                            args=browser_args
-                        )
-                        logger.success("[Playwright] Используется Google Chrome (не headless)")
-                    except Exception as e:
-                        logger.warning(f"[Playwright] Chrome недоступен: {e}")
-                
-                if not browser:
-                    # Fallback на Chromium
-                    browser = p.chromium.launch(
-                        headless=use_headless,
-                        args=browser_args
-                    )
-                    mode = "headless" if use_headless else "headed"
-                    logger.info(f"[Playwright] Используется Chromium ({mode})")
-                
-                # Создаем контекст с минимумом заголовков
-                context = browser.new_context(
-                    user_agent=profile["headers"]["user-agent"],
-                    viewport=profile["viewport"],
-                    locale='ru-RU',
-                    timezone_id='Europe/Moscow',
-                    # ВАЖНО: передаем только accept-language, остальное генерируется
-                    extra_http_headers={
-                        'accept-language': profile["headers"]["accept-language"]
-                    },
-                    # Дополнительные параметры для реалистичности
-                    device_scale_factor=1.0,
-                    has_touch=False,
-                    is_mobile=False
-                )
-                
-                # Добавляем cookies если есть
-                self._load_cookies(context)
-                
-                page = context.new_page()
-                
-                # Применяем улучшенный stealth перед навигацией
-                self._apply_stealth(page)
+            # Браузер и контекст профиля берутся из пула прогретыми
+            content = self.pool.run(profile, lambda context: self._fetch(context, url, profile['name'], proxy),
+                                    proxy=proxy)
+            if content:
+                logger.success(f"[Playwright] Получено {len(content):,} байт")
+            return content
                 
-                # Эмулируем поведение до перехода
+        except (PlaywrightTimeoutError, TimeoutError) as e:
+            # TimeoutError - браузер пула завис и заменен (BROWSER_TASK_TIMEOUT_SEC)
+            logger.error(f"[Playwright] Timeout загрузки: {e}")
+            metrics.count_fetch("playwright", profile['name'], metrics.ERROR)
+            proxy_pool.report(proxy, metrics.ERROR)
+            return None
+        except Exception as e:
+            logger.error(f"[Playwright] Ошибка: {e}")
+            metrics.count_fetch("playwright", profile['name'], metrics.ERROR)
+            proxy_pool.report(proxy, metrics.ERROR)
+            if "Executable not found" in str(e):
+                logger.error("Выполните: playwright install chromium")
+            return None
+    
+    def _fetch(self, context, url: str, profile_name: str = None, proxy: Optional[str] = None) -> Optional[str]:
+        """Загружает одну страницу во вкладке контекста (выполняется в потоке пула)"""
+        # Контекст живет долго: подтягиваем cookies, которые профиль получил через curl
+        self._load_cookies(context, profile_name, proxy)
+        page = context.new_page()
+        try:
+            # Эмулируем поведение до перехода
+            with metrics.stage("humanize", "playwright"):
                 self._pre_navigation_behavior(page)
-                
-                logger.info(f"[Playwright] Переход на {url}")
-                
-                # Навигация с реалистичным ожиданием
+            
+            logger.info(f"[Playwright] Переход на {url}")
+            
+            # Навигация с реалистичным ожиданием
+            with metrics.stage("navigation", "playwright"):
                 response = page.goto(
                     url,
                     wait_until='domcontentloaded',  # Не ждем networkidle - слишком долго
                     timeout=60000
                 )
-                
-                if response and response.status == 429:
-                    logger.error("[Playwright] HTTP 429 - Rate limit")
-                    browser.close()
-                    return None
-                
-                # Эмулируем поведение после загрузки
+            
+            if response and response.status == 429:
+                logger.error("[Playwright] HTTP 429 - Rate limit")
+                metrics.count_fetch("playwright", profile_name, metrics.RATE_LIMITED)
+                proxy_pool.report(proxy, metrics.RATE_LIMITED)
+                rate_controller.report(url, proxy, metrics.RATE_LIMITED, response.headers.get("retry-after"))
+                return None
+            
+            # Эмулируем поведение после загрузки
+            with metrics.stage("humanize", "playwright"):
                 self._post_navigation_behavior(page)
-                
-                # Проверяем наличие каталога
-                try:
+            
+            # Проверяем наличие каталога
+            outcome = metrics.OK
+            try:
+                with metrics.stage("catalog_wait", "playwright"):
                     page.wait_for_selector("div[data-marker='catalog-serp']", timeout=15000)
-                    logger.success("[Playwright] Каталог найден")
-                except PlaywrightTimeoutError:
-                    logger.warning("[Playwright] Каталог не найден - возможна блокировка")
-                    # Проверяем на капчу
-                    if page.query_selector("iframe[src*='hcaptcha']"):
-                        logger.warning("[Playwright] Обнаружена hCaptcha")
-                    elif page.query_selector("div.geetest_captcha"):
-                        logger.warning("[Playwright] Обнаружена GeeTest Captcha")
-                
-                # Дополнительное ожидание
+                logger.success("[Playwright] Каталог найден")
+            except PlaywrightTimeoutError:
+                logger.warning("[Playwright] Каталог не найден - возможна блокировка")
+                outcome = metrics.BLOCKED
+                # Проверяем на капчу
+                if page.query_selector("iframe[src*='hcaptcha']"):
+                    logger.warning("[Playwright] Обнаружена hCaptcha")
+                    outcome = metrics.CAPTCHA
+                elif page.query_selector("div.geetest_captcha"):
+                    logger.warning("[Playwright] Обнаружена GeeTest Captcha")
+                    outcome = metrics.CAPTCHA
+            metrics.count_fetch("playwright", profile_name, outcome)
+            proxy_pool.report(proxy, outcome)
+            rate_controller.report(url, proxy, outcome)
+            
+            # Дополнительное ожидание
+            with metrics.stage("humanize", "playwright"):
                 page.wait_for_timeout(random.randint(2000, 4000))
-                
+            
+            with metrics.stage("page_content", "playwright"):
                 content = page.content()
-                
-                # Сохраняем cookies
-                self._save_cookies(context)
-                
-                browser.close()
-                
-                logger.success(f"[Playwright] Получено {len(content):,} байт")
-                return content
-                
-        except PlaywrightTimeoutError:
-            logger.error("[Playwright] Timeout загрузки")
-            return None
-        except Exception as e:
-            logger.error(f"[Playwright] Ошибка: {e}")
-            if "Executable not found" in str(e):
-                logger.error("Выполните: playwright install chromium")
-            return None
-    
-    def _apply_stealth(self, page):
-        """Применяет продвинутые техники маскировки"""
-        stealth_js = """
-        // Убираем webdriver
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined
-        });
-        
-        // Правильные плагины для Chrome
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [
-                {0: {type: "application/x-google-chrome-pdf", suffixes: "pdf"}},
-                {0: {type: "application/pdf", suffixes: "pdf"}}
-            ]
-        });
-        
-        // Правильный chrome объект
-        window.chrome = {
-            runtime: {},
-            loadTimes: function() {},
-            csi: function() {}
-        };
-        
-        // Исправляем permissions
-        const originalQuery = window.navigator.permissions.query;
-        window.navigator.permissions.query = (parameters) => (
-            parameters.name === 'notifications' ?
-                Promise.resolve({ state: Notification.permission }) :
-                originalQuery(parameters)
-        );
-        """
-        
-        page.add_init_script(stealth_js)
-        logger.debug("[Playwright] Stealth скрипт применен")
+            
+            # Сохраняем cookies
+            self._save_cookies(context, profile_name, proxy)
+            
+            return content
+        finally:
+            try:
+                page.close()
+            except Exception as e:
+                logger.debug(f"[Playwright] Ошибка закрытия вкладки: {e}")
     
     def _pre_navigation_behavior(self, page):
         """Эмулирует поведение перед переходом"""
@@ -206,27 +163,23 @@ class PlaywrightParser(BaseParser):
         except Exception as e:
             logger.debug(f"[Playwright] Post-navigation ошибка: {e}")
     
-    def _load_cookies(self, context):
-        """Загружает сохраненные cookies"""
-        cookies_file = "cookies/playwright_cookies.json"
-        if os.path.exists(cookies_file):
-            try:
-                import json
-                with open(cookies_file, 'r') as f:
-                    cookies = json.load(f)
-                    context.add_cookies(cookies)
-                    logger.debug("[Playwright] Cookies загружены")
-            except Exception as e:
-                logger.debug(f"[Playwright] Ошибка загрузки cookies: {e}")
+    def _load_cookies(self, context, profile_name: str, proxy: Optional[str] = None):
+        """Cookies связки профиль/прокси из общего хранилища"""
+        if not profile_name:
+            return
+        try:
+            cookies = session_store.get(profile_name, proxy)
+            if cookies:
+                context.add_cookies(cookies)
+        except Exception as e:
+            logger.debug(f"[Playwright] Ошибка загрузки cookies: {e}")
     
-    def _save_cookies(self, context):
-        """Сохраняет cookies"""
+    def _save_cookies(self, context, profile_name: str, proxy: Optional[str] = None):
+        """Передает cookies контекста в общее хранилище (на диск оно пишет пачками)"""
+        if not profile_name:
+            return
         try:
-            import json
-            os.makedirs("cookies", exist_ok=True)
-            cookies = context.cookies()
-            with open("cookies/playwright_cookies.json", 'w') as f:
-                json.dump(cookies, f)
+            session_store.update(profile_name, from_playwright(context.cookies()), proxy)
             logger.debug("[Playwright] Cookies сохранены")
         except Exception as e:
             logger.debug(f"[Playwright] Ошибка сохранения cookies: {e}")
\ No newline at end of file
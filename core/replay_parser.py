@@ -0,0 +1,21 @@
+from core.base_parser import BaseParser
+from typing import Optional
+from config.settings import settings, logger
+from utils.page_archive import PageArchive, page_archive
+
+
+class ReplayParser(BaseParser):
+    """Парсер без сети: отдает страницы из архива (последнюю версию до REPLAY_AT)"""
+    
+    def __init__(self, archive: PageArchive = None, at: Optional[str] = None):
+        self.archive = archive or page_archive
+        self.at = at if at is not None else settings.replay_at
+    
+    def parse(self, url: str) -> Optional[str]:
+        page = self.archive.latest(url, before=self.at or None)
+        if not page:
+            logger.warning(f"[Replay] Страницы нет в архиве: {url}")
+            return None
+        
+        logger.info(f"[Replay] {url} из архива от {page.fetched_at}")
+        return self.archive.read(page)
@@ -1,91 +1,201 @@
 import sqlite3
-from typing import Optional
-from config.settings import logger
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config.settings import settings, logger
 from database.models import Listing
+from database.migrations import migrate
+from utils import metrics
 import json
 import os
 
+# Колонки listings, заполняемые при вставке (порядок совпадает с _listing_row)
+LISTING_COLUMNS = ("url, title, price, price_value, currency, address, description, images, bail, tax, services, "
+                   "content_hash")
+LISTING_PLACEHOLDERS = ", ".join("?" * len(LISTING_COLUMNS.split(",")))
+
 class DatabaseManager:
     """Управляет операциями с базой данных SQLite."""
     
-    def __init__(self, db_path: str = "database/avito_listings.db"):
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    def __init__(self, db_path: str = None):
+        db_path = db_path or settings.db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
         self.db_path = db_path
-        self._connection: Optional[sqlite3.Connection] = None
-        self._connect()
+        # Пул соединений: по одному на поток (бот читает из своих потоков, парсер пишет из своего)
+        self._local = threading.local()
+        self._connections: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._connections_lock = threading.Lock()
         self._create_table()
 
-    def _connect(self):
-        """Устанавливает соединение с БД."""
+    @property
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Соединение текущего потока (None, если подключиться не удалось)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+        return connection
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Открывает и настраивает соединение для текущего потока."""
         try:
-            self._connection = sqlite3.connect(self.db_path)
-            logger.debug(f"Успешное подключение к БД: {self.db_path}")
+            connection = sqlite3.connect(
+                self.db_path,
+                timeout=settings.sqlite_busy_timeout_ms / 1000,
+                # Закрывать соединения других потоков разрешено только в close()
+                check_same_thread=False
+            )
+            connection.row_factory = sqlite3.Row
+            self._apply_pragmas(connection)
         except sqlite3.Error as e:
             logger.error(f"Ошибка подключения к БД: {e}")
-            self._connection = None
+            return None
+
+        self._local.connection = connection
+        with self._connections_lock:
+            # Закрываем соединения завершившихся потоков
+            for thread in [t for t in self._connections if not t.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = connection
+
+        logger.debug(f"Успешное подключение к БД: {self.db_path} ({threading.current_thread().name})")
+        return connection
+
+    @staticmethod
+    def _apply_pragmas(connection: sqlite3.Connection):
+        """Профиль настроек SQLite: WAL, мягкий fsync, кэш и mmap"""
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_mb * 1024}")
+        connection.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_mb * 1024 * 1024}")
+        connection.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        connection.execute("PRAGMA temp_store=MEMORY")
 
     def _create_table(self):
-        """Создает таблицу для объявлений, если она не существует."""
+        """Создает и обновляет схему БД через версионированные миграции."""
         if not self._connection:
             return
         
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS listings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT UNIQUE NOT NULL,
-            title TEXT,
-            price TEXT,
-            address TEXT,
-            description TEXT,
-            images TEXT, -- Сохраняем как JSON-строку
-            bail TEXT,
-            tax TEXT,
-            services TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
         try:
-            cursor = self._connection.cursor()
-            cursor.execute(create_table_query)
-            self._connection.commit()
-            logger.debug("Таблица 'listings' готова к работе.")
+            version = migrate(self._connection)
+            logger.debug(f"Схема БД готова к работе (версия {version}).")
         except sqlite3.Error as e:
-            logger.error(f"Ошибка создания таблицы: {e}")
+            logger.error(f"Ошибка миграции БД: {e}")
 
     def add_listing(self, listing: Listing) -> bool:
-        """Добавляет объявление в БД, избегая дубликатов по URL."""
+        """Добавляет или обновляет объявление. True - только для нового объявления."""
+        added, _ = self.add_listings([listing])
+        if added:
+            logger.debug(f"Добавлено новое объявление: {listing.title}")
+        return bool(added)
+
+    def add_listings(self, listings: Iterable[Listing]) -> Tuple[List[str], List[str]]:
+        """
+        Сохраняет пачку объявлений одной транзакцией (см. upsert_listings).
+        Возвращает (URL новых объявлений, URL уже известных - обновленных и без изменений).
+        """
+        added, updated, unchanged = self.upsert_listings(listings)
+        return added, updated + unchanged
+
+    def upsert_listings(self, listings: Iterable[Listing]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Добавляет новые объявления и обновляет изменившиеся (по хэшу содержимого).
+        Изменения цены и заголовка пишутся в listing_history.
+        Возвращает (URL новых, URL обновленных, URL без изменений).
+        Ошибка записи пробрасывается после отката: иначе кэш страниц
+        (services/page_cache.py) запомнил бы страницу, объявления которой не сохранены.
+        """
         if not self._connection:
             logger.error("Нет подключения к БД.")
-            return False
-            
-        # Проверка на дубликат
-        if self._listing_exists(listing.url):
-            logger.debug(f"Объявление уже существует: {listing.url}")
-            return False
+            return [], [], []
 
-        insert_query = """
-        INSERT INTO listings (url, title, price, address, description, images, bail, tax, services)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
-        """
-        images_json = json.dumps(listing.images)
-        data = (
-            listing.url, listing.title, listing.price, listing.address,
-            listing.description, images_json, listing.bail, listing.tax, listing.services
-        )
+        batch = {}
+        unchanged = []
+        for listing in listings:
+            if listing.url in batch:
+                unchanged.append(listing.url)
+            else:
+                batch[listing.url] = listing
+        if not batch:
+            return [], [], unchanged
 
+        insert_query = f"""
+        INSERT INTO listings ({LISTING_COLUMNS})
+        VALUES ({LISTING_PLACEHOLDERS})
+        ON CONFLICT(url) DO NOTHING;
+        """
+        update_query = """
+        UPDATE listings
+        SET title = ?, price = ?, price_value = ?, currency = ?, address = ?, description = ?,
+            images = ?, bail = ?, tax = ?, services = ?, content_hash = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?;
+        """
+        history_query = """
+        INSERT INTO listing_history
+            (listing_id, old_title, new_title, old_price, new_price, old_price_value, new_price_value, currency)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+        """
         try:
+            write_started = time.perf_counter()
             cursor = self._connection.cursor()
-            cursor.execute(insert_query, data)
+            # IMMEDIATE: блокировка записи берется до проверки, так список новых URL точен
+            cursor.execute("BEGIN IMMEDIATE")
+            existing = self._existing_listings(cursor, list(batch))
+
+            added, updated, updates, history = [], [], [], []
+            for url, listing in batch.items():
+                row = existing.get(url)
+                if row is None:
+                    added.append(url)
+                    continue
+
+                content_hash = listing.content_hash()
+                if row["content_hash"] == content_hash:
+                    unchanged.append(url)
+                    continue
+
+                updated.append(url)
+                updates.append(self._listing_row(listing)[1:] + (row["id"],))
+                if row["title"] != listing.title or row["price_value"] != listing.price_value:
+                    history.append((
+                        row["id"], row["title"], listing.title, row["price"], listing.price,
+                        row["price_value"], listing.price_value, listing.currency or row["currency"]
+                    ))
+
+            cursor.executemany(insert_query, [self._listing_row(batch[url]) for url in added])
+            cursor.executemany(update_query, updates)
+            cursor.executemany(history_query, history)
             self._connection.commit()
-            logger.debug(f"Добавлено новое объявление: {listing.title}")
-            return True
-        except sqlite3.IntegrityError:
-            # На случай, если проверка _listing_exists не сработала
-            logger.warning(f"Объявление уже существует (UNIQUE constraint): {listing.url}")
-            return False
+            metrics.observe("db_write", time.perf_counter() - write_started, "sqlite")
         except sqlite3.Error as e:
-            logger.error(f"Ошибка добавления объявления: {e}")
-            return False
+            self._connection.rollback()
+            logger.error(f"Ошибка пакетного сохранения объявлений: {e}")
+            raise
+
+        logger.debug(f"Пакет объявлений: добавлено {len(added)}, обновлено {len(updated)} "
+                     f"(изменений цены/заголовка {len(history)}), без изменений {len(unchanged)}")
+        return added, updated, unchanged
+
+    def _existing_listings(self, cursor: sqlite3.Cursor, urls: List[str]) -> Dict[str, sqlite3.Row]:
+        """Уже сохраненные объявления из списка URL: url -> (id, хэш, заголовок, цена). Запросы пачками по 500."""
+        existing = {}
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT id, url, content_hash, title, price, price_value, currency "
+                f"FROM listings WHERE url IN ({placeholders})",
+                chunk
+            )
+            existing.update((row["url"], row) for row in cursor.fetchall())
+        return existing
+
+    @staticmethod
+    def _listing_row(listing: Listing) -> tuple:
+        return (
+            listing.url, listing.title, listing.price, listing.price_value, listing.currency, listing.address,
+            listing.description, json.dumps(listing.images), listing.bail, listing.tax, listing.services,
+            listing.content_hash()
+        )
 
     def _listing_exists(self, url: str) -> bool:
         """Проверяет наличие объявления по URL."""
@@ -102,69 +212,436 @@ class DatabaseManager:
             return False
             
     def close(self):
-        """Закрывает соединение с БД."""
-        if self._connection:
-            self._connection.close()
+        """Закрывает все соединения пула."""
+        with self._connections_lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+        if connections:
             logger.debug("Соединение с БД закрыто.")
 
     # === Дополнительные методы для Telegram-бота ===
     def get_listings_count(self) -> int:
-        """Возвращает количество объектов в базе"""
+        """Возвращает количество объектов в базе (счетчик поддерживается триггерами)"""
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM listings")
-            count = cursor.fetchone()[0]
-            conn.close()
-            return count
+            cursor.execute("SELECT value FROM listings_stats WHERE key = 'count'")
+            row = cursor.fetchone()
+            return row[0] if row else 0
         except Exception as e:
             logger.error(f"Ошибка подсчета объектов: {e}")
             return 0
 
-    def get_listings_page(self, page: int = 1, page_size: int = 5) -> list:
-        """Возвращает страницу объектов"""
-        offset = (page - 1) * page_size
+    def get_listings_page(self, page_size: int = 5, cursor: Optional[str] = None) -> list:
+        """
+        Возвращает страницу объектов от новых к старым (keyset-пагинация).
+        cursor: None - первая страница, "a<id>" - объекты старше id, "b<id>" - новее id.
+        """
+        columns = "id, url, title, price, address, description"
+        try:
+            conn = self._get_connection()
+            db_cursor = conn.cursor()
+
+            if cursor and cursor[0] == "b":
+                db_cursor.execute(
+                    f"""
+                SELECT * FROM (
+                    SELECT {columns}, created_at FROM listings
+                    WHERE (created_at, id) > (SELECT created_at, id FROM listings WHERE id = ?)
+                    ORDER BY created_at ASC, id ASC
+                    LIMIT ?
+                ) ORDER BY created_at DESC, id DESC
+                """,
+                    (int(cursor[1:]), page_size),
+                )
+            elif cursor and cursor[0] == "a":
+                db_cursor.execute(
+                    f"""
+                SELECT {columns} FROM listings
+                WHERE (created_at, id) < (SELECT created_at, id FROM listings WHERE id = ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                    (int(cursor[1:]), page_size),
+                )
+            else:
+                db_cursor.execute(
+                    f"""
+                SELECT {columns} FROM listings
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                    (page_size,),
+                )
+
+            return [
+                {key: row[key] for key in ("id", "url", "title", "price", "address", "description")}
+                for row in db_cursor.fetchall()
+            ]
+        except Exception as e:
+            logger.error(f"Ошибка получения страницы: {e}")
+            return []
+
+    def get_listings_by_price(self, min_price: Optional[int] = None, max_price: Optional[int] = None,
+                              currency: str = "RUB", limit: int = 50) -> list:
+        """
+        Объекты в диапазоне цен (в рублях/единицах валюты, границы включительно), от дешевых к дорогим.
+        Фильтр выполняется в SQLite по индексу idx_listings_price_value.
+        """
+        conditions = ["currency = ?", "price_value IS NOT NULL"]
+        params = [currency]
+        if min_price is not None:
+            conditions.append("price_value >= ?")
+            params.append(min_price * 100)
+        if max_price is not None:
+            conditions.append("price_value <= ?")
+            params.append(max_price * 100)
+        params.append(limit)
+
         try:
             conn = self._get_connection()
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute(
-                """
-            SELECT id, url, title, price, address, description
+                f"""
+            SELECT id, url, title, price, price_value, currency, address, description
             FROM listings
-            ORDER BY created_at DESC
-            LIMIT ? OFFSET ?
+            WHERE {" AND ".join(conditions)}
+            ORDER BY price_value ASC
+            LIMIT ?
             """,
-                (page_size, offset),
+                params,
             )
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка выборки по цене: {e}")
+            return []
 
-            rows = cursor.fetchall()
-            conn.close()
-            return [dict(row) for row in rows]
+    def get_listing_history(self, listing_id: int) -> list:
+        """История изменений цены и заголовка объекта, от старых к новым"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+            SELECT old_title, new_title, old_price, new_price, old_price_value, new_price_value, currency, changed_at
+            FROM listing_history
+            WHERE listing_id = ?
+            ORDER BY changed_at ASC, id ASC
+            """,
+                (listing_id,),
+            )
+            return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
-            logger.error(f"Ошибка получения страницы: {e}")
+            logger.error(f"Ошибка получения истории объекта {listing_id}: {e}")
+            return []
+
+    def get_price_changes(self, since: Optional[str] = None, limit: int = 50) -> list:
+        """
+        Последние изменения цены по всем объектам, от новых к старым.
+        since: нижняя граница changed_at в формате SQLite ("2024-05-01 00:00:00").
+        """
+        conditions = ["h.old_price_value IS NOT h.new_price_value"]
+        params = []
+        if since:
+            conditions.append("h.changed_at >= ?")
+            params.append(since)
+        params.append(limit)
+
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+            SELECT l.id, l.url, l.title, h.old_price, h.new_price, h.old_price_value, h.new_price_value,
+                   h.currency, h.changed_at
+            FROM listing_history h
+            JOIN listings l ON l.id = h.listing_id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY h.changed_at DESC, h.id DESC
+            LIMIT ?
+            """,
+                params,
+            )
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения изменений цен: {e}")
             return []
 
     def get_listing_by_id(self, listing_id: int) -> dict:
         """Возвращает объект по ID"""
         try:
             conn = self._get_connection()
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute(
                 "SELECT * FROM listings WHERE id = ?",
                 (listing_id,),
             )
             row = cursor.fetchone()
-            conn.close()
             return dict(row) if row else None
         except Exception as e:
             logger.error(f"Ошибка получения объекта {listing_id}: {e}")
             return None
 
-    # Вспомогательный метод для кратковременных подключений
+    def get_listings_by_urls(self, urls: List[str]) -> list:
+        """Объекты по списку URL (например, новые объявления прогона), в порядке списка"""
+        rows = {}
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(
+                    f"""
+                SELECT id, url, title, price, price_value, currency, address, description, images
+                FROM listings WHERE url IN ({placeholders})
+                """,
+                    chunk,
+                )
+                rows.update(
+                    (row["url"], {**dict(row), "images": json.loads(row["images"]) if row["images"] else []})
+                    for row in cursor.fetchall()
+                )
+        except Exception as e:
+            logger.error(f"Ошибка получения объектов по URL: {e}")
+        return [rows[url] for url in urls if url in rows]
+
+    # === Сохраненные поиски ===
+    def add_search(self, chat_id: int, url: str, filters: Optional[dict] = None,
+                   interval_min: Optional[int] = None) -> Optional[int]:
+        """Сохраняет поиск чата (повторное добавление URL обновляет фильтры). Возвращает ID поиска."""
+        try:
+            conn = self._get_connection()
+            conn.execute(
+                """
+            INSERT INTO saved_searches (chat_id, url, filters, interval_min)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(chat_id, url) DO UPDATE SET
+                filters = excluded.filters, interval_min = COALESCE(excluded.interval_min, interval_min)
+            """,
+                (chat_id, url, json.dumps(filters or {}), interval_min),
+            )
+            conn.commit()
+            row = conn.execute(
+                "SELECT id FROM saved_searches WHERE chat_id = ? AND url = ?", (chat_id, url)
+            ).fetchone()
+            return row["id"]
+        except Exception as e:
+            logger.error(f"Ошибка сохранения поиска: {e}")
+            return None
+
+    def delete_search(self, chat_id: int, search_id: int) -> Optional[str]:
+        """Удаляет поиск чата, возвращает его URL (None - поиск не найден)"""
+        try:
+            conn = self._get_connection()
+            row = conn.execute(
+                "SELECT url FROM saved_searches WHERE id = ? AND chat_id = ?", (search_id, chat_id)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute("DELETE FROM saved_searches WHERE id = ?", (search_id,))
+            conn.commit()
+            return row["url"]
+        except Exception as e:
+            logger.error(f"Ошибка удаления поиска {search_id}: {e}")
+            return None
+
+    def set_searches_interval(self, chat_id: int, interval_min: Optional[int]) -> List[str]:
+        """Интервал автозапуска для всех поисков чата (None - выключить). Возвращает их URL."""
+        try:
+            conn = self._get_connection()
+            conn.execute("UPDATE saved_searches SET interval_min = ? WHERE chat_id = ?", (interval_min, chat_id))
+            conn.commit()
+            return [search["url"] for search in self.get_searches(chat_id)]
+        except Exception as e:
+            logger.error(f"Ошибка изменения интервала поисков чата {chat_id}: {e}")
+            return []
+
+    def get_searches(self, chat_id: int) -> list:
+        """Поиски чата в порядке добавления"""
+        return self._select_searches("WHERE chat_id = ? ORDER BY id", (chat_id,))
+
+    def get_search_subscribers(self, url: Optional[str] = None) -> Dict[str, list]:
+        """Поиски, сгруппированные по URL: url -> [поиски всех чатов]. url - только для одного URL."""
+        searches = self._select_searches("WHERE url = ? ORDER BY id", (url,)) if url \
+            else self._select_searches("ORDER BY url, id")
+        grouped: Dict[str, list] = {}
+        for search in searches:
+            grouped.setdefault(search["url"], []).append(search)
+        return grouped
+
+    def _select_searches(self, where: str, params: tuple = ()) -> list:
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, chat_id, url, filters, interval_min FROM saved_searches {where}", params)
+            return [
+                {**dict(row), "filters": json.loads(row["filters"]) if row["filters"] else {}}
+                for row in cursor.fetchall()
+            ]
+        except Exception as e:
+            logger.error(f"Ошибка получения сохраненных поисков: {e}")
+            return []
+
+    # === Очередь заданий парсинга ===
+    def save_job(self, job_id: str, url: str, chat_id: Optional[int], status: str,
+                 progress: Optional[str] = None, result: Optional[dict] = None):
+        """Сохраняет состояние задания (вставка или обновление)"""
+        try:
+            conn = self._get_connection()
+            conn.execute(
+                """
+            INSERT INTO parse_jobs (id, url, chat_id, status, progress, result)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                status = excluded.status, progress = excluded.progress, result = excluded.result,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+                (job_id, url, chat_id, status, progress, json.dumps(result) if result is not None else None),
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения задания {job_id}: {e}")
+
+    def get_unfinished_jobs(self) -> list:
+        """Задания в очереди или прерванные перезапуском, в порядке постановки"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+            SELECT id, url, chat_id, status FROM parse_jobs
+            WHERE status IN ('queued', 'running')
+            ORDER BY created_at ASC
+            """
+            )
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения незавершенных заданий: {e}")
+            return []
+
+    # === Кэш страниц выдачи (условные запросы) ===
+    def get_page_state(self, url: str) -> Optional[dict]:
+        """ETag, Last-Modified и сигнатура последней обработанной версии страницы"""
+        try:
+            conn = self._get_connection()
+            row = conn.execute(
+                "SELECT url, etag, last_modified, signature, checked_at, changed_at FROM page_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка получения состояния страницы {url}: {e}")
+            return None
+
+    def save_page_state(self, url: str, etag: Optional[str], last_modified: Optional[str],
+                        signature: Optional[str], changed: bool = True):
+        """Запоминает валидаторы страницы; changed_at обновляется только при изменении содержимого"""
+        try:
+            conn = self._get_connection()
+            conn.execute(
+                """
+            INSERT INTO page_cache (url, etag, last_modified, signature)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag, last_modified = excluded.last_modified,
+                signature = excluded.signature, checked_at = CURRENT_TIMESTAMP,
+                changed_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE changed_at END
+            """,
+                (url, etag, last_modified, signature, int(changed)),
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения состояния страницы {url}: {e}")
+
+    # === Исходы загрузок по бэкендам (services/backend_router.py) ===
+    def add_backend_outcome(self, url_class: str, backend: str, profile: str, success: bool, latency: float):
+        try:
+            conn = self._get_connection()
+            conn.execute(
+                "INSERT INTO backend_outcomes (url_class, backend, profile, success, latency) VALUES (?, ?, ?, ?, ?)",
+                (url_class, backend, profile, int(success), latency),
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Ошибка сохранения исхода загрузки {backend}/{profile}: {e}")
+
+    def get_backend_outcomes(self, window: int, max_age_hours: float) -> list:
+        """
+        Последние window исходов каждой связки (раздел, бэкенд, профиль) не старше
+        max_age_hours, от старых к новым. Более старые строки удаляются.
+        """
+        try:
+            conn = self._get_connection()
+            conn.execute(
+                """
+            DELETE FROM backend_outcomes WHERE created_at < datetime('now', ?) OR id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY url_class, backend, profile ORDER BY id DESC) AS position
+                    FROM backend_outcomes
+                ) WHERE position > ?
+            )
+            """,
+                (f"-{max_age_hours} hours", window),
+            )
+            conn.commit()
+            rows = conn.execute(
+                "SELECT url_class, backend, profile, success, latency FROM backend_outcomes ORDER BY id"
+            ).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Ошибка получения исходов загрузок: {e}")
+            return []
+
+    # === Лимиты частоты запросов (services/rate_controller.py) ===
+    def update_rate_limit(self, host: str, identity: str, update: Callable[[Optional[dict]], dict]) -> dict:
+        """
+        Читает и заменяет состояние лимита в одной транзакции BEGIN IMMEDIATE:
+        блокировка записи общая для всех процессов, работающих с этой БД.
+        update получает текущую строку (None, если ее нет) и возвращает новую.
+        """
+        conn = self._get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT rate, next_slot, blocked_until, failures FROM rate_limits WHERE host = ? AND identity = ?",
+                (host, identity),
+            ).fetchone()
+            state = update(dict(row) if row else None)
+            conn.execute(
+                """
+            INSERT OR REPLACE INTO rate_limits (host, identity, rate, next_slot, blocked_until, failures, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                (host, identity, state["rate"], state["next_slot"], state["blocked_until"], state["failures"],
+                 time.time()),
+            )
+            conn.commit()
+            return state
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_rate_limits(self) -> list:
+        try:
+            rows = self._get_connection().execute(
+                "SELECT host, identity, rate, next_slot, blocked_until, failures FROM rate_limits ORDER BY host, identity"
+            ).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Ошибка получения лимитов запросов: {e}")
+            return []
+
+    # Соединение текущего потока из пула (не закрывается после запроса)
     def _get_connection(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+        connection = self._connection
+        if connection is None:
+            raise sqlite3.OperationalError(f"Нет подключения к БД: {self.db_path}")
+        return connection
 
 # Создаем единый экземпляр для всего приложения
 db_manager = DatabaseManager()
@@ -0,0 +1,220 @@
+"""
+Версионированные миграции схемы БД.
+
+Текущая версия хранится в PRAGMA user_version. Каждая миграция применяется
+в отдельной транзакции (BEGIN IMMEDIATE), поэтому несколько процессов,
+стартующих одновременно, не применят ее дважды. Шаг миграции - SQL-строка
+или функция, принимающая соединение (для переноса данных).
+"""
+import json
+import sqlite3
+from typing import Callable, List, Tuple, Union
+from config.settings import logger
+from database.models import Listing
+from utils.price import parse_price_kopecks
+
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+def _backfill_price_value(connection: sqlite3.Connection):
+    """Разовый перенос текстовых цен в числовую колонку (в копейках)"""
+    rows = connection.execute(
+        "SELECT id, price FROM listings WHERE price IS NOT NULL AND price_value IS NULL"
+    ).fetchall()
+    updates = []
+    for listing_id, price in rows:
+        price_value = parse_price_kopecks(price)
+        if price_value is not None:
+            updates.append((price_value, listing_id))
+    connection.executemany(
+        "UPDATE listings SET price_value = ?, currency = COALESCE(currency, 'RUB') WHERE id = ?", updates
+    )
+    logger.info(f"Заполнена числовая цена для {len(updates)} объявлений")
+
+
+def _backfill_content_hash(connection: sqlite3.Connection):
+    """Хэши содержимого для уже сохраненных объявлений"""
+    rows = connection.execute(
+        "SELECT id, url, title, price, price_value, currency, address, description, images, bail, tax, services "
+        "FROM listings WHERE content_hash IS NULL"
+    ).fetchall()
+    updates = []
+    for listing_id, url, title, price, price_value, currency, address, description, images, bail, tax, services in rows:
+        listing = Listing(
+            url=url, title=title, price=price, price_value=price_value, currency=currency, address=address,
+            description=description, images=json.loads(images) if images else [], bail=bail, tax=tax,
+            services=services
+        )
+        updates.append((listing.content_hash(), listing_id))
+    connection.executemany("UPDATE listings SET content_hash = ? WHERE id = ?", updates)
+    logger.info(f"Посчитан хэш содержимого для {len(updates)} объявлений")
+
+
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "Таблица объявлений", [
+        """
+        CREATE TABLE IF NOT EXISTS listings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT UNIQUE NOT NULL,
+            title TEXT,
+            price TEXT,
+            address TEXT,
+            description TEXT,
+            images TEXT, -- Сохраняем как JSON-строку
+            bail TEXT,
+            tax TEXT,
+            services TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (2, "Индекс по дате для журнала и счетчик объявлений", [
+        "CREATE INDEX IF NOT EXISTS idx_listings_created_at ON listings(created_at, id)",
+        """
+        CREATE TABLE IF NOT EXISTS listings_stats (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR REPLACE INTO listings_stats (key, value) VALUES ('count', (SELECT COUNT(*) FROM listings))",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_listings_count_insert AFTER INSERT ON listings
+        BEGIN
+            UPDATE listings_stats SET value = value + 1 WHERE key = 'count';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_listings_count_delete AFTER DELETE ON listings
+        BEGIN
+            UPDATE listings_stats SET value = value - 1 WHERE key = 'count';
+        END
+        """,
+    ]),
+    (3, "Числовая цена в копейках и валюта", [
+        "ALTER TABLE listings ADD COLUMN price_value INTEGER",
+        "ALTER TABLE listings ADD COLUMN currency TEXT",
+        _backfill_price_value,
+        "CREATE INDEX IF NOT EXISTS idx_listings_price_value ON listings(currency, price_value)",
+    ]),
+    (4, "Хэш содержимого и история изменений цены/заголовка", [
+        "ALTER TABLE listings ADD COLUMN content_hash TEXT",
+        "ALTER TABLE listings ADD COLUMN updated_at TIMESTAMP",
+        _backfill_content_hash,
+        """
+        CREATE TABLE IF NOT EXISTS listing_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            listing_id INTEGER NOT NULL REFERENCES listings(id) ON DELETE CASCADE,
+            old_title TEXT,
+            new_title TEXT,
+            old_price TEXT,
+            new_price TEXT,
+            old_price_value INTEGER,
+            new_price_value INTEGER,
+            currency TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_listing_history_listing ON listing_history(listing_id, changed_at)",
+    ]),
+    (5, "Очередь заданий парсинга", [
+        """
+        CREATE TABLE IF NOT EXISTS parse_jobs (
+            id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            chat_id INTEGER,
+            status TEXT NOT NULL,  -- queued, running, done, failed, cancelled
+            progress TEXT,
+            result TEXT,           -- JSON с итогами прогона
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_parse_jobs_status ON parse_jobs(status, created_at)",
+    ]),
+    (6, "Сохраненные поиски чатов", [
+        """
+        CREATE TABLE IF NOT EXISTS saved_searches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            filters TEXT,          -- JSON: {"min_price": ..., "max_price": ...} в рублях
+            interval_min INTEGER,  -- интервал автозапуска, NULL - выключен
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(chat_id, url)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_saved_searches_url ON saved_searches(url)",
+    ]),
+    (7, "Валидаторы и сигнатуры страниц выдачи", [
+        """
+        CREATE TABLE IF NOT EXISTS page_cache (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            signature TEXT,        -- sha1 набора ID и цен объявлений на странице
+            checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (8, "Исходы загрузок для выбора бэкенда", [
+        """
+        CREATE TABLE IF NOT EXISTS backend_outcomes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url_class TEXT NOT NULL,   -- домен и раздел выдачи, например www.avito.ru/avtomobili
+            backend TEXT NOT NULL,     -- curl или playwright
+            profile TEXT NOT NULL,     -- имя профиля браузера
+            success INTEGER NOT NULL,
+            latency REAL NOT NULL,     -- секунды
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_backend_outcomes_arm ON backend_outcomes(url_class, backend, profile, id)",
+    ]),
+    (9, "Общие лимиты частоты запросов по хосту и IP", [
+        """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            host TEXT NOT NULL,
+            identity TEXT NOT NULL,        -- прокси или direct
+            rate REAL NOT NULL,            -- запросов в секунду (AIMD)
+            next_slot REAL NOT NULL,       -- unix-время ближайшего свободного запроса
+            blocked_until REAL NOT NULL,   -- пауза после 429/блокировки
+            failures INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (host, identity)
+        )
+        """,
+    ]),
+]
+
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """Применяет недостающие миграции, возвращает итоговую версию схемы"""
+    for version, description, steps in MIGRATIONS:
+        if schema_version(connection) >= version:
+            continue
+
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # Другой процесс мог применить миграцию, пока мы ждали блокировку
+            if schema_version(connection) >= version:
+                connection.rollback()
+                continue
+
+            for step in steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.execute(step)
+            connection.execute(f"PRAGMA user_version = {version}")
+            connection.commit()
+            logger.info(f"Миграция БД {version}: {description}")
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+
+    return schema_version(connection)
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from dataclasses import dataclass, field
 from typing import Optional, List
 
@@ -7,6 +9,8 @@ class Listing:
     url: str
     title: str
     price: Optional[str] = None
+    price_value: Optional[int] = None  # Цена в копейках (для фильтров и сортировки в SQLite)
+    currency: Optional[str] = None     # Код валюты: RUB, USD, EUR
     address: Optional[str] = None
     description: Optional[str] = None
     images: List[str] = field(default_factory=list)
@@ -15,3 +19,12 @@ class Listing:
     bail: Optional[str] = None      # Залог
     tax: Optional[str] = None       # Комиссия
     services: Optional[str] = None  # ЖКУ
+
+    def content_hash(self) -> str:
+        """Хэш содержимого объявления: меняется при изменении любого поля, кроме URL"""
+        payload = json.dumps(
+            [self.title, self.price, self.price_value, self.currency, self.address,
+             self.description, self.images, self.bail, self.tax, self.services],
+            ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
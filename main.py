@@ -1,11 +1,19 @@
 import sys
 from config.settings import settings, logger
 from core.playwright_parser import PlaywrightParser
+from core.async_playwright_parser import AsyncPlaywrightParser
+from core.browser_pool import shutdown_browser_pool
 from core.curl_parser import CurlParser
+from core.async_curl_parser import AsyncCurlParser, shutdown_curl_engine
 from core.hybrid_parser import HybridParser
 from core.local_parser import LocalParser
+from core.replay_parser import ReplayParser
 from services.avito_processor import AvitoProcessor
+from services.catalog_crawler import CatalogCrawler
+from services.page_cache import PageCache
+from services.session_store import session_store
 from database.database_manager import db_manager
+from utils import metrics
 
 def get_parser(mode: str):
     """Фабрика парсеров (полная версия)"""
@@ -15,14 +23,71 @@ def get_parser(mode: str):
     
     if mode == "playwright":
         return PlaywrightParser()
+    elif mode == "playwright_async":
+        return AsyncPlaywrightParser()
     elif mode == "curl":
         return CurlParser()
+    elif mode == "curl_async":
+        return AsyncCurlParser()
     elif mode == "hybrid":
         return HybridParser()
+    elif mode == "replay":
+        return ReplayParser()
     else:
         logger.warning(f"Неизвестный режим {mode}, используем playwright")
         return PlaywrightParser()
 
+def run_crawl(url: str, page_cache: PageCache = None):
+    """Обход нескольких страниц выдачи: каждая страница сохраняется в БД сразу после загрузки"""
+    processor = AvitoProcessor(base_url=url)
+    crawler = CatalogCrawler(lambda: get_parser(settings.parser_mode), processor, page_cache=page_cache)
+    
+    pages_count = found_count = added_count = updated_count = 0
+    for page in crawler.crawl(url):
+        if not page.html:
+            continue
+        
+        added, updated, _ = db_manager.upsert_listings(page.listings)
+        
+        pages_count += 1
+        found_count += len(page.listings)
+        added_count += len(added)
+        updated_count += len(updated)
+        logger.info(f"Страница {page.number}: найдено {len(page.listings)}, новых в БД {len(added)}, "
+                    f"обновлено {len(updated)}")
+    
+    return pages_count, found_count, added_count, updated_count
+
+def run_single(parser, url, page_cache: PageCache = None):
+    """Одна страница выдачи (или локальный HTML при url=None)"""
+    page_cache = page_cache or PageCache(enabled=False)
+    cached = page_cache.fetch(parser, url)
+    if cached.unchanged:
+        return 0, 0, 0, 0
+    
+    html = cached.html
+    if not html:
+        logger.error(f"Не удалось получить HTML: {url}")
+        return 0, 0, 0, 0
+    
+    logger.info("Начало обработки HTML...")
+    processor = AvitoProcessor(base_url=url or settings.target_url)
+    listings = processor.process_html(html)
+    
+    if not listings:
+        logger.warning("Не удалось извлечь ни одного объявления. Проверьте селекторы в avito_processor.py")
+        return 1, 0, 0, 0
+    
+    added, updated, _ = db_manager.upsert_listings(listings)
+    page_cache.commit(cached)
+    return 1, len(listings), len(added), len(updated)
+
+def search_urls():
+    """TARGET_URL и уникальные URL сохраненных поисков бота: каждый URL парсится один раз"""
+    urls = [settings.target_url] if settings.target_url else []
+    urls += [url for url in db_manager.get_search_subscribers() if url not in urls]
+    return urls
+
 def main():
     logger.info("=== Avito Parser v3.0 (Data & Docker) ===")
     
@@ -31,45 +96,53 @@ def main():
     else:
         logger.info("✅ Стандартный режим")
     
-    if not settings.use_local_html and not settings.target_url:
-        logger.error("Не задан TARGET_URL в .env")
+    urls = [None] if settings.use_local_html else search_urls()
+    if not urls:
+        logger.error("Не задан TARGET_URL в .env и нет сохраненных поисков")
         sys.exit(1)
     
-    # 1. ПОЛУЧЕНИЕ HTML
-    parser = get_parser(settings.parser_mode)
+    crawl = settings.crawl_enabled and not settings.use_local_html
+    if crawl:
+        logger.info(f"Режим обхода выдачи: до {settings.crawl_max_pages} страниц, потоков: {settings.crawl_workers}")
+    
     try:
-        url = None if settings.use_local_html else settings.target_url
-        html = parser.parse(url)
+        parser = None if crawl else get_parser(settings.parser_mode)
+        page_cache = PageCache()
+        pages_count = found_count = added_count = updated_count = 0
+        with metrics.run_timer("main") as timings:
+            for url in urls:
+                if url:
+                    logger.info(f"Поиск: {url}")
+                pages, found, added, updated = run_crawl(url, page_cache) if crawl else run_single(parser, url, page_cache)
+                pages_count += pages
+                found_count += found
+                added_count += added
+                updated_count += updated
+        metrics.count_listings(found_count, added_count, updated_count)
         
-        if not html:
+        if not pages_count and not page_cache.hits:
             logger.error("Не удалось получить HTML. Завершение работы.")
             sys.exit(1)
-            
-        # 2. ОБРАБОТКА HTML И ИЗВЛЕЧЕНИЕ ДАННЫХ
-        logger.info("Начало обработки HTML...")
-        processor = AvitoProcessor(base_url=settings.target_url)
-        listings = processor.process_html(html)
-        
-        if not listings:
-            logger.warning("Не удалось извлечь ни одного объявления. Проверьте селекторы в avito_processor.py")
-            sys.exit(0)
-            
-        # 3. СОХРАНЕНИЕ В БАЗУ ДАННЫХ
-        added_count = 0
-        for listing in listings:
-            if db_manager.add_listing(listing):
-                added_count += 1
         
         logger.success("="*50)
         logger.success(f"         ОБРАБОТКА ЗАВЕРШЕНА")
-        logger.success(f"  Всего найдено на странице: {len(listings)}")
+        logger.success(f"  Поисков: {len(urls)}, страниц: {pages_count}")
+        logger.success(f"  Всего найдено: {found_count}")
         logger.success(f"  Новых добавлено в БД: {added_count}")
+        logger.success(f"  Обновлено (изменилось содержимое): {updated_count}")
+        logger.success(f"  Кэш страниц: попаданий {page_cache.hits} "
+                       f"(304: {page_cache.stats['not_modified']}, тот же набор: {page_cache.stats['unchanged']}), "
+                       f"промахов {page_cache.misses}")
+        logger.success(f"  Время по этапам: {timings.summary()}")
         logger.success("="*50)
         
     except Exception as e:
         logger.exception(f"Критическая ошибка в главном цикле: {e}")
         sys.exit(1)
     finally:
+        shutdown_browser_pool()
+        shutdown_curl_engine()
+        session_store.flush()
         db_manager.close()
 
 if __name__ == "__main__":
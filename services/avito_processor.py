@@ -1,14 +1,75 @@
 from bs4 import BeautifulSoup
-from typing import List
+from lxml import etree
+import lxml.html
+import json
+import re
+from typing import List, Optional
 from database.models import Listing
-from config.settings import logger
-from urllib.parse import urljoin
+from config.settings import settings, logger
+from utils.price import parse_price_kopecks, detect_currency
+from utils import metrics
+from urllib.parse import urljoin, unquote
+
+# Предкомпилированные XPath-выражения для быстрого движка (lxml).
+# Повторяют семантику find/select_one из BeautifulSoup-движка.
+XP_CATALOG = etree.XPath("(//div[@data-marker='catalog-serp'])[1]")
+XP_ITEMS = etree.XPath("div[@data-marker='item']")
+XP_PROMO = etree.XPath("boolean(.//div[@data-marker='promo-item'])")
+XP_TITLE_LINK = etree.XPath("(.//a[@data-marker='item-title'])[1]")
+XP_PRICE = etree.XPath("(.//meta[@itemprop='price'])[1]")
+XP_PRICE_CURRENCY = etree.XPath("(.//meta[@itemprop='priceCurrency'])[1]")
+XP_DESCRIPTION = etree.XPath("(.//meta[@itemprop='description'])[1]")
+XP_GEO = etree.XPath("(.//div[contains(@class, 'geo-root-')])[1]")
+XP_GALLERY_IMAGES = etree.XPath("(.//div[@data-marker='item-photo'])[1]//img")
+# Текст как у get_text(strip=True): без комментариев и содержимого script/style/template
+XP_TEXT = etree.XPath("descendant-or-self::text()[not(parent::script or parent::style or parent::template)]")
+
+
+# Состояние страницы: <script data-mfe-state="true">{...}</script>
+# или window.__initialData__ = "<urlencoded json>" в старой разметке
+STATE_SCRIPT_RE = re.compile(r'<script[^>]*\bdata-mfe-state=["\']true["\'][^>]*>', re.IGNORECASE)
+INITIAL_DATA_RE = re.compile(r'window\.__initialData__\s*=\s*"')
+ITEMS_KEY_RE = re.compile(r'"items"\s*:\s*\[')
+ITEMS_KEY_ENCODED = '%22items%22'
+JSON_DECODER = json.JSONDecoder()
+
+
+def _decode_items_array(text: str, start: int, end: int) -> Optional[list]:
+    """
+    Декодирует только массив "items" каталога, не разбирая остальное состояние.
+    Берется первый массив, элементы которого похожи на объявления.
+    """
+    for match in ITEMS_KEY_RE.finditer(text, start, end):
+        try:
+            items, _ = JSON_DECODER.raw_decode(text, match.end() - 1)
+        except ValueError:
+            continue
+        if any(isinstance(item, dict) and item.get('urlPath') for item in items):
+            return items
+    return None
+
+
+def _lxml_text(element) -> str:
+    return ''.join(text.strip() for text in XP_TEXT(element))
+
+
+def _first(nodes):
+    return nodes[0] if nodes else None
+
 
 class AvitoProcessor:
     """Извлекает структурированные данные из HTML-кода страницы Avito."""
 
-    def __init__(self, base_url: str):
+    ENGINES = ("bs4", "lxml", "json")
+
+    def __init__(self, base_url: str, engine: Optional[str] = None):
         self.base_url = base_url
+        # Движок извлечения: bs4 (BeautifulSoup), lxml (быстрый путь на XPath)
+        # или json (состояние страницы, с откатом на lxml)
+        self.engine = engine or settings.extract_engine
+        if self.engine not in self.ENGINES:
+            logger.warning(f"Неизвестный движок извлечения {self.engine}, используем bs4")
+            self.engine = "bs4"
         # Список стоп-слов для фильтрации объявлений об услугах
         self.stop_words = ['скупка', 'выкуп', 'обмен', 'trade-in', 'трейдин', 'ремонт', 'продажа']
 
@@ -17,7 +78,29 @@ class AvitoProcessor:
         Основной метод для парсинга HTML.
         Находит все объявления на странице и извлекает из них данные.
         """
-        soup = BeautifulSoup(html, 'lxml')
+        if self.engine == "json":
+            return self._process_html_json(html)
+        if self.engine == "lxml":
+            return self._process_html_lxml(html)
+        return self._process_html_bs4(html)
+
+    def _accept(self, listing: Listing) -> bool:
+        """Проверяет обязательные поля и фильтрует объявления по стоп-словам"""
+        if not listing or not listing.url or not listing.title:
+            return False
+
+        # НОВАЯ ЛОГИКА: Фильтрация по стоп-словам в заголовке
+        title_lower = listing.title.lower()
+        if any(word in title_lower for word in self.stop_words):
+            logger.debug(f"Отфильтровано объявление по стоп-слову: '{listing.title}'")
+            return False
+
+        return True
+
+    def _process_html_bs4(self, html: str) -> List[Listing]:
+        """Извлечение через BeautifulSoup"""
+        with metrics.stage("html_parse", "bs4"):
+            soup = BeautifulSoup(html, 'lxml')
         listings = []
         
         items_container = soup.find("div", {"data-marker": "catalog-serp"})
@@ -34,23 +117,130 @@ class AvitoProcessor:
                 if item_soup.find("div", {"data-marker": "promo-item"}):
                     continue
                 
-                listing = self._parse_item(item_soup)
-                if not listing or not listing.url or not listing.title:
-                    continue
+                with metrics.stage("card_extract", "bs4"):
+                    listing = self._parse_item(item_soup)
+                if self._accept(listing):
+                    listings.append(listing)
+
+            except Exception as e:
+                logger.error(f"Ошибка при обработке карточки объявления: {e}")
+        
+        return listings
+
+    def _process_html_json(self, html: str) -> List[Listing]:
+        """Извлечение из встроенного JSON-состояния; при его отсутствии - разбор DOM"""
+        with metrics.stage("html_parse", "json"):
+            items = self._find_state_items(html)
+        if items is None:
+            logger.debug("Состояние каталога в странице не найдено, разбираем DOM")
+            return self._process_html_lxml(html)
+
+        logger.info(f"Найдено {len(items)} объявлений в состоянии страницы.")
+        listings = []
+        for item in items:
+            try:
+                with metrics.stage("card_extract", "json"):
+                    listing = self._parse_state_item(item)
+                if self._accept(listing):
+                    listings.append(listing)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке объявления из состояния: {e}")
+
+        return listings
+
+    def _find_state_items(self, html: str) -> Optional[list]:
+        """Находит массив объявлений в состоянии страницы регулярными выражениями, без DOM"""
+        for match in STATE_SCRIPT_RE.finditer(html):
+            end = html.find('</script>', match.end())
+            items = _decode_items_array(html, match.end(), end if end != -1 else len(html))
+            if items is not None:
+                return items
+
+        match = INITIAL_DATA_RE.search(html)
+        if match:
+            # Значение закодировано целиком, поэтому раскодируем только хвост с массивом
+            end = html.find('"', match.end())
+            pos = html.find(ITEMS_KEY_ENCODED, match.end(), end)
+            if pos != -1:
+                tail = unquote(html[pos:end])
+                return _decode_items_array(tail, 0, len(tail))
+
+        return None
+
+    def _parse_state_item(self, item: dict) -> Optional[Listing]:
+        """Преобразует объявление из состояния страницы в Listing"""
+        if not isinstance(item, dict) or not item.get('urlPath') or not item.get('title'):
+            return None
+
+        url_path = item['urlPath']
+        price_detailed = item.get('priceDetailed') or {}
+        price_value = price_detailed.get('value')
+        description = (item.get('description') or '').strip() or None
+
+        geo = item.get('geo') or {}
+        address = geo.get('formattedAddress') or (item.get('location') or {}).get('name')
+        if not address:
+            # Как и в DOM-разборе, берем город из URL
+            url_parts = url_path.split('/')
+            if len(url_parts) > 1 and url_parts[1] and url_parts[1] not in ['all', 'www']:
+                address = url_parts[1].replace('_', ' ').title()
+
+        images = []
+        for sizes in (item.get('images') or [])[:3]:
+            if not isinstance(sizes, dict) or not sizes:
+                continue
+            # Ключи вида "636x477": берем самое большое изображение
+            largest = max(sizes, key=lambda size: [int(n) for n in size.split('x') if n.isdigit()] or [0])
+            images.append(sizes[largest])
+
+        return Listing(
+            url=urljoin(self.base_url, url_path),
+            title=item['title'].strip(),
+            price=str(price_value) if price_value is not None else None,
+            address=address,
+            description=description,
+            images=images,
+            **self._typed_price(price_value, price_detailed.get('currency') or price_detailed.get('string'))
+        )
+
+    def _process_html_lxml(self, html: str) -> List[Listing]:
+        """Быстрое извлечение через lxml и предкомпилированные XPath"""
+        listings = []
+
+        with metrics.stage("html_parse", "lxml"):
+            tree = lxml.html.document_fromstring(html)
+        items_container = _first(XP_CATALOG(tree))
+        if items_container is None:
+            logger.warning("Основной контейнер с объявлениями ('catalog-serp') не найден.")
+            return []
 
-                # НОВАЯ ЛОГИКА: Фильтрация по стоп-словам в заголовке
-                title_lower = listing.title.lower()
-                if any(word in title_lower for word in self.stop_words):
-                    logger.debug(f"Отфильтровано объявление по стоп-слову: '{listing.title}'")
+        items = XP_ITEMS(items_container)
+        logger.info(f"Найдено {len(items)} карточек объявлений на странице.")
+
+        for item in items:
+            try:
+                # Пропускаем рекламные блоки, если они попали в выборку
+                if XP_PROMO(item):
                     continue
-                
-                listings.append(listing)
+
+                with metrics.stage("card_extract", "lxml"):
+                    listing = self._parse_item_lxml(item)
+                if self._accept(listing):
+                    listings.append(listing)
 
             except Exception as e:
                 logger.error(f"Ошибка при обработке карточки объявления: {e}")
-        
+
         return listings
 
+    @staticmethod
+    def _typed_price(price, currency_hint) -> dict:
+        """Цена в копейках и код валюты (по умолчанию рубли, как на Avito)"""
+        price_value = parse_price_kopecks(price)
+        if price_value is None:
+            return {'price_value': None, 'currency': None}
+        return {'price_value': price_value, 'currency': detect_currency(currency_hint) or 'RUB'}
+
     def _get_text(self, soup: BeautifulSoup, tag: str, attrs: dict) -> str:
         """Безопасно извлекает текст из тега."""
         element = soup.find(tag, attrs)
@@ -103,6 +293,7 @@ class AvitoProcessor:
         # Заголовок извлекаем из ссылки (рабочий вариант)
         title = link_tag.get_text(strip=True) if link_tag else None
         price = self._get_text(item_soup, "meta", {"itemprop": "price"})
+        currency = self._get_text(item_soup, "meta", {"itemprop": "priceCurrency"})
         
         # Ищем описание в meta теге
         description_meta = item_soup.find("meta", {"itemprop": "description"})
@@ -129,5 +320,56 @@ class AvitoProcessor:
             price=price,
             address=address,
             description=description,
-            images=images
+            images=images,
+            **self._typed_price(price, currency)
+        )
+
+    def _parse_item_lxml(self, item) -> Optional[Listing]:
+        """Извлекает данные из одной карточки (lxml-движок, та же логика, что _parse_item)."""
+        link_tag = _first(XP_TITLE_LINK(item))
+        if link_tag is None or 'href' not in link_tag.attrib:
+            return None
+
+        relative_url = link_tag.get('href')
+        absolute_url = urljoin(self.base_url, relative_url)
+        title = _lxml_text(link_tag)
+
+        price_meta = _first(XP_PRICE(item))
+        price = price_meta.get('content', '').strip() if price_meta is not None else None
+        currency_meta = _first(XP_PRICE_CURRENCY(item))
+        currency = currency_meta.get('content', '').strip() if currency_meta is not None else None
+
+        description_meta = _first(XP_DESCRIPTION(item))
+        description = description_meta.get('content', '').strip() if description_meta is not None else None
+
+        address_div = _first(XP_GEO(item))
+        address = _lxml_text(address_div) if address_div is not None else None
+
+        # Если адрес не найден через geo-root, пробуем извлечь из URL
+        if not address:
+            url_parts = relative_url.split('/')
+            if len(url_parts) > 1:
+                city_from_url = url_parts[1]
+                if city_from_url and city_from_url not in ['all', 'www']:
+                    address = city_from_url.replace('_', ' ').title()
+
+        images = []
+        for img in XP_GALLERY_IMAGES(item)[:3]:
+            srcset = img.get('srcset')
+            if srcset:
+                # Берем последний (самый большой) вариант из srcset
+                parts = srcset.split(',')
+                if parts:
+                    images.append(parts[-1].strip().split(' ')[0])
+            elif 'src' in img.attrib:
+                images.append(img.get('src'))
+
+        return Listing(
+            url=absolute_url,
+            title=title,
+            price=price,
+            address=address,
+            description=description,
+            images=images,
+            **self._typed_price(price, currency)
         )
@@ -0,0 +1,144 @@
+"""
+Выбор бэкенда загрузки (curl или Playwright) по живой статистике.
+
+Для каждой связки (раздел выдачи, бэкенд, профиль браузера) и для бэкенда
+в разделе целиком хранятся скользящие окна последних исходов: успех и время
+загрузки. Перед запросом роутер упорядочивает бэкенды по ожидаемой цене -
+среднее время, деленное на вероятность успеха, - и для каждого выбирает
+профиль так же по окну профиля. Вероятность берется выборкой из
+Beta(успехи + 1, неудачи + 1) (Thompson sampling): связки с малым числом
+наблюдений иногда получают шанс, а curl за ~0.5 с идет первым, пока он
+отдает выдачу, и браузер запускается только когда нужен. Блокировка обычно
+касается IP, а не профиля, поэтому порядок бэкендов решает общее окно.
+
+Исходы пишутся в SQLite (таблица backend_outcomes) и подхватываются
+следующим запуском. Записи старше ROUTER_MAX_AGE_HOURS забываются, чтобы
+бэкенд, заблокированный вчера, снова пробовался сегодня.
+"""
+import random
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config.settings import settings, logger
+
+BACKENDS = ("curl", "playwright")
+
+# Время загрузки до первых наблюдений, секунды
+PRIOR_LATENCY = {"curl": 1.0, "playwright": 12.0}
+
+# (раздел, бэкенд, профиль); профиль "*" - окно бэкенда по всем профилям
+Arm = Tuple[str, str, str]
+ANY_PROFILE = "*"
+
+
+def url_class(url: str) -> str:
+    """Домен и первый раздел пути после города: www.avito.ru/avtomobili"""
+    parsed = urlparse(url)
+    parts = [part for part in parsed.path.split("/") if part]
+    section = parts[1] if len(parts) > 1 else (parts[0] if parts else "")
+    return f"{parsed.netloc}/{section}"
+
+
+def _profile_names() -> List[str]:
+    from services.browser_profiles_2025 import BROWSER_PROFILES
+    return [profile["name"] for profile in BROWSER_PROFILES]
+
+
+class BackendRouter:
+    """Скользящие окна исходов по связкам и выбор порядка бэкендов для запроса"""
+
+    def __init__(self, db=None, window: int = None, max_age_hours: float = None,
+                 profiles: Optional[List[str]] = None, persist: bool = True):
+        self._db = db
+        self.window = max(1, window or settings.router_window)
+        self.max_age_hours = settings.router_max_age_hours if max_age_hours is None else max_age_hours
+        self.profiles = profiles or _profile_names()
+        self.persist = persist
+        self._arms: Dict[Arm, Deque[Tuple[bool, float]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self._db is None:
+            from database.database_manager import db_manager
+            self._db = db_manager
+        return self._db
+
+    def _load(self):
+        """Окна из прошлых запусков (один раз за время жизни роутера)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.persist:
+            return
+        rows = self.db.get_backend_outcomes(self.window, self.max_age_hours)
+        for row in rows:
+            self._append((row["url_class"], row["backend"], row["profile"]), bool(row["success"]), row["latency"])
+        if rows:
+            logger.debug(f"[Router] Загружено исходов: {len(rows)}")
+
+    def _append(self, arm: Arm, success: bool, latency: float):
+        section, backend, _ = arm
+        for key in (arm, (section, backend, ANY_PROFILE)):
+            window = self._arms.get(key)
+            if window is None:
+                window = self._arms[key] = deque(maxlen=self.window)
+            window.append((success, latency))
+
+    def _sample_cost(self, arm: Arm) -> float:
+        outcomes = self._arms.get(arm, ())
+        successes = sum(1 for success, _ in outcomes if success)
+        failures = len(outcomes) - successes
+        chance = random.betavariate(successes + 1, failures + 1)
+        # Априорное время считается одним наблюдением, чтобы единичный выброс не решал
+        latency = (PRIOR_LATENCY[arm[1]] + sum(latency for _, latency in outcomes)) / (len(outcomes) + 1)
+        return latency / max(chance, 1e-6)
+
+    def plan(self, url: str, backends=BACKENDS) -> List[Tuple[str, str]]:
+        """Порядок попыток [(бэкенд, профиль), ...]: по одной на бэкенд, сначала самая дешевая"""
+        section = url_class(url)
+        with self._lock:
+            self._load()
+            choices = []
+            for backend in backends:
+                _, profile = min((self._sample_cost((section, backend, profile)), profile)
+                                 for profile in self.profiles)
+                choices.append((self._sample_cost((section, backend, ANY_PROFILE)), backend, profile))
+        choices.sort()
+        logger.debug("[Router] " + section + ": " +
+                     " → ".join(f"{backend}/{profile} ~{cost:.1f}с" for cost, backend, profile in choices))
+        return [(backend, profile) for _, backend, profile in choices]
+
+    def record(self, url: str, backend: str, profile: str, success: bool, latency: float):
+        arm = (url_class(url), backend, profile)
+        with self._lock:
+            self._load()
+            self._append(arm, success, latency)
+        if self.persist:
+            self.db.add_backend_outcome(*arm, success, round(latency, 3))
+
+    def snapshot(self) -> List[dict]:
+        """Сводка окон: доля успехов и среднее время по каждой связке (профиль "*" - бэкенд целиком)"""
+        with self._lock:
+            self._load()
+            result = []
+            for (section, backend, profile), outcomes in sorted(self._arms.items()):
+                if not outcomes:
+                    continue
+                successes = sum(1 for success, _ in outcomes if success)
+                result.append({
+                    "url_class": section,
+                    "backend": backend,
+                    "profile": profile,
+                    "attempts": len(outcomes),
+                    "success_rate": round(successes / len(outcomes), 2),
+                    "latency": round(sum(latency for _, latency in outcomes) / len(outcomes), 2),
+                })
+            return result
+
+
+# Глобальный экземпляр: общий для потоков обхода и всех HybridParser процесса
+backend_router = BackendRouter()
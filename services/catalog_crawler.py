@@ -0,0 +1,215 @@
+"""
+Обход многостраничной выдачи Avito.
+
+Первая страница загружается отдельно, чтобы найти пагинацию, остальные
+распределяются между потоками-загрузчиками с ограничением частоты запросов
+к домену. Обход останавливается, когда страница не дала новых объявлений
+или не изменилась с прошлого запуска (см. services/page_cache.py).
+"""
+import contextvars
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+
+from core.base_parser import BaseParser
+from database.models import Listing
+from services.avito_processor import AvitoProcessor
+from services.page_cache import PageCache, CachedPage
+from config.settings import settings, logger
+
+
+# Номера страниц в блоке пагинации: data-marker="page(7)" или ссылки вида ?p=7
+PAGE_MARKER_RE = re.compile(r'data-marker="[^"]*page\((\d+)\)"')
+PAGE_PARAM_RE = re.compile(r'[?&](?:amp;)?p=(\d+)')
+
+
+def build_page_url(url: str, page: int) -> str:
+    """Возвращает URL страницы выдачи с параметром p=N"""
+    parts = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'p']
+    if page > 1:
+        query.append(('p', str(page)))
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+def find_last_page(html: str) -> Optional[int]:
+    """Ищет номер последней страницы в блоке пагинации (без построения DOM)"""
+    start = html.find('data-marker="pagination')
+    if start == -1:
+        return None
+
+    block = html[start:start + 30000]
+    numbers = [int(n) for n in PAGE_MARKER_RE.findall(block)]
+    numbers += [int(n) for n in PAGE_PARAM_RE.findall(block)]
+    return max(numbers) if numbers else None
+
+
+def listing_key(url: str) -> str:
+    """URL объявления без query-параметров (context, slocation меняются между загрузками)"""
+    return url.split('?', 1)[0]
+
+
+class DomainRateLimiter:
+    """Не чаще rate запросов в секунду к одному домену (общий для всех потоков)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url: str) -> float:
+        """Занимает ближайший слот домена и возвращает, сколько секунд до него ждать"""
+        if not self.interval:
+            return 0.0
+
+        domain = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, now))
+            self._next_slot[domain] = slot + self.interval
+        return slot - now
+
+    def wait(self, url: str):
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class CrawlPage:
+    """Результат обработки одной страницы выдачи"""
+    number: int
+    url: str
+    html: Optional[str]
+    listings: List[Listing] = field(default_factory=list)
+    new_count: int = 0
+    # Страница та же, что при прошлом запуске: не разбиралась, писать в БД нечего
+    unchanged: bool = False
+    cached: Optional[CachedPage] = None
+
+
+class CatalogCrawler:
+    """Параллельный обход страниц выдачи с ранней остановкой"""
+
+    def __init__(self, parser_factory: Callable[[], BaseParser], processor: AvitoProcessor,
+                 max_pages: int = None, workers: int = None, rate: float = None,
+                 page_cache: Optional[PageCache] = None):
+        self.parser_factory = parser_factory
+        self.processor = processor
+        self.page_cache = page_cache or PageCache(enabled=False)
+        self.max_pages = max(1, max_pages or settings.crawl_max_pages)
+        self.workers = max(1, workers or settings.crawl_workers)
+        self.rate_limiter = DomainRateLimiter(rate if rate is not None else settings.crawl_rate)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def crawl(self, start_url: str) -> Iterator[CrawlPage]:
+        """
+        Генератор страниц по мере их готовности.
+        Запись в БД остается на вызывающем потоке; состояние страницы в кэше
+        сохраняется, когда потребитель запросил следующую (значит, записал эту).
+        """
+        self._seen = set()
+        self._next_page = 1
+        self._last_page = self.max_pages
+        self._stopped = False
+
+        first = self._fetch_page(1, start_url)
+        yield first
+        self._commit(first)
+        if not first.html or not first.listings:
+            return
+
+        last_page = find_last_page(first.html)
+        with self._lock:
+            if last_page:
+                self._last_page = min(self._last_page, last_page)
+            self._next_page = 2
+        logger.info(f"[Crawler] Страниц к обходу: до {self._last_page} (найдено в пагинации: {last_page or '?'})")
+
+        if self._last_page < 2:
+            return
+
+        results: "queue.Queue" = queue.Queue()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crawler") as pool:
+            for _ in range(self.workers):
+                # Замеры этапов в потоках относятся к текущему прогону (utils/metrics.py)
+                pool.submit(contextvars.copy_context().run, self._worker, start_url, results)
+
+            try:
+                finished = 0
+                while finished < self.workers:
+                    page = results.get()
+                    if page is None:
+                        finished += 1
+                        continue
+                    yield page
+                    self._commit(page)
+            finally:
+                # Если потребитель прервал обход, не запускаем новые страницы
+                self._stop_at(self._last_page)
+
+    def _worker(self, start_url: str, results: "queue.Queue"):
+        try:
+            while True:
+                with self._lock:
+                    if self._stopped or self._next_page > self._last_page:
+                        return
+                    number = self._next_page
+                    self._next_page += 1
+
+                results.put(self._fetch_page(number, build_page_url(start_url, number)))
+        except Exception as e:
+            logger.error(f"[Crawler] Ошибка потока обхода: {e}")
+            self._stop_at(self._last_page)
+        finally:
+            results.put(None)
+
+    def _fetch_page(self, number: int, url: str) -> CrawlPage:
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = self.parser_factory()
+
+        self.rate_limiter.wait(url)
+        logger.info(f"[Crawler] Страница {number}: {url}")
+        cached = self.page_cache.fetch(parser, url)
+        html = cached.html
+        page = CrawlPage(number=number, url=url, html=html, unchanged=cached.unchanged, cached=cached)
+
+        if cached.unchanged:
+            logger.info(f"[Crawler] Страница {number} не изменилась, останавливаем обход")
+            self._stop_at(number)
+            return page
+
+        if not html:
+            logger.warning(f"[Crawler] Страница {number} не загружена, останавливаем обход")
+            self._stop_at(number)
+            return page
+
+        page.listings = self.processor.process_html(html)
+        with self._lock:
+            keys = {listing_key(listing.url) for listing in page.listings}
+            new_keys = keys - self._seen
+            self._seen |= new_keys
+            page.new_count = len(new_keys)
+
+        if not new_keys:
+            logger.info(f"[Crawler] На странице {number} нет новых объявлений, останавливаем обход")
+            self._stop_at(number)
+
+        return page
+
+    def _commit(self, page: CrawlPage):
+        if page.cached:
+            self.page_cache.commit(page.cached)
+
+    def _stop_at(self, number: int):
+        with self._lock:
+            self._stopped = True
+            self._last_page = min(self._last_page, number)
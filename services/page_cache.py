@@ -0,0 +1,139 @@
+"""
+Пропуск неизменившихся страниц выдачи.
+
+Для каждого URL хранятся валидаторы последнего ответа (ETag, Last-Modified)
+и сигнатура страницы - хэш отсортированного набора ID объявлений с ценами.
+Повторная загрузка идет условным запросом; если сервер ответил 304 или
+сигнатура совпала с прошлой, страница не разбирается AvitoProcessor и не
+пишется в БД. Сигнатура считается регулярными выражениями по сырому HTML,
+без построения DOM. Новые версии страниц с карточками попадают в архив
+(utils/page_archive.py).
+"""
+import hashlib
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from core.base_parser import BaseParser, FetchResult
+from config.settings import settings, logger
+from utils import metrics
+
+
+ITEM_ID_RE = re.compile(r'data-marker="item"[^>]*?\bdata-item-id="(\d+)"')
+ITEM_PRICE_RE = re.compile(r'itemprop="price"\s+content="([^"]*)"')
+
+
+def page_signature(html: str) -> Optional[str]:
+    """
+    Хэш набора (ID, цена) карточек страницы. Порядок карточек не важен:
+    поднятие объявления в выдаче не считается изменением. None - карточек нет
+    (блокировка, пустая выдача), такую страницу нельзя считать неизменной.
+    """
+    matches = list(ITEM_ID_RE.finditer(html))
+    if not matches:
+        return None
+
+    entries = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(html)
+        price = ITEM_PRICE_RE.search(html, match.end(), end)
+        entries.append(f"{match.group(1)}:{price.group(1) if price else ''}")
+
+    return hashlib.sha1("\n".join(sorted(entries)).encode()).hexdigest()
+
+
+@dataclass
+class CachedPage:
+    """Загруженная страница и ее новое состояние для кэша"""
+    url: str
+    result: FetchResult
+    signature: Optional[str] = None
+    unchanged: bool = False
+
+    @property
+    def html(self) -> Optional[str]:
+        return None if self.unchanged else self.result.html
+
+
+class PageCache:
+    """
+    Условная загрузка страниц со статистикой попаданий.
+    Состояние новой версии страницы сохраняется через commit() - после того,
+    как ее объявления записаны в БД, иначе сбой записи потерял бы изменения.
+    """
+
+    def __init__(self, db=None, enabled: bool = None, archive=None):
+        if db is None:
+            from database.database_manager import db_manager
+            db = db_manager
+        if archive is None and settings.archive_enabled:
+            from utils.page_archive import page_archive
+            archive = page_archive
+        self.db = db
+        self.enabled = settings.page_cache if enabled is None else enabled
+        self.archive = archive
+        self.stats = {"not_modified": 0, "unchanged": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return self.stats["not_modified"] + self.stats["unchanged"]
+
+    @property
+    def misses(self) -> int:
+        return self.stats["misses"]
+
+    def fetch(self, parser: BaseParser, url: Optional[str]) -> CachedPage:
+        backend = type(parser).__name__.replace("Parser", "").lower()
+        if not self.enabled or not url:
+            with metrics.stage("fetch", backend):
+                page = CachedPage(url, FetchResult(parser.parse(url)))
+            self._archive(page)
+            return page
+
+        state = self.db.get_page_state(url) or {}
+        with metrics.stage("fetch", backend):
+            result = parser.fetch(url, state.get("etag"), state.get("last_modified"))
+
+        if result.not_modified and state.get("signature"):
+            logger.info(f"[PageCache] 304, страница не изменилась: {url}")
+            self._count("not_modified")
+            self.db.save_page_state(url, result.etag, result.last_modified, state["signature"], changed=False)
+            return CachedPage(url, result, state["signature"], unchanged=True)
+
+        if not result.html:
+            return CachedPage(url, result)
+
+        signature = page_signature(result.html)
+        if signature and signature == state.get("signature"):
+            logger.info(f"[PageCache] Набор объявлений прежний, обработка пропущена: {url}")
+            self._count("unchanged")
+            self.db.save_page_state(url, result.etag, result.last_modified, signature, changed=False)
+            return CachedPage(url, result, signature, unchanged=True)
+
+        self._count("misses")
+        page = CachedPage(url, result, signature)
+        self._archive(page)
+        return page
+
+    def commit(self, page: CachedPage):
+        """Запоминает новую версию страницы; вызывать только после успешной записи ее объявлений"""
+        if self.enabled and page.url and page.signature and not page.unchanged:
+            self.db.save_page_state(page.url, page.result.etag, page.result.last_modified, page.signature)
+
+    def _archive(self, page: CachedPage):
+        """Сохраняет сырую страницу; страницы без карточек (блокировка, капча) не архивируются"""
+        if not self.archive or not page.url or not page.result.html:
+            return
+        if (page.signature or page_signature(page.result.html)) is None:
+            return
+        try:
+            self.archive.append(page.url, page.result.html)
+        except Exception as e:
+            logger.error(f"[PageCache] Не удалось сохранить страницу в архив: {e}")
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+        metrics.count_page_cache(key)
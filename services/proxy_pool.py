@@ -0,0 +1,190 @@
+"""
+Пул прокси для curl и Playwright.
+
+У каждого прокси своя корзина токенов (PROXY_RATE запросов в секунду) и
+оценка здоровья - скользящее среднее исходов загрузок. Блокировка, капча,
+429 или сетевая ошибка снижают оценку и отправляют прокси на паузу, которая
+удваивается с каждой неудачей подряд (от PROXY_COOLDOWN_SEC до
+PROXY_MAX_COOLDOWN_SEC); успешная загрузка ее сбрасывает. Прокси
+закрепляется за ключом - профилем браузера или сессией, - чтобы cookies и
+отпечаток не прыгали между IP. Закрепление переносится на лучший свободный
+прокси, только когда свой ушел на паузу.
+
+Без PROXIES/PROXY_FILE пул пуст и acquire() возвращает None - загрузка
+идет напрямую, как раньше.
+
+    proxy = proxy_pool.acquire(profile["name"])
+    ...
+    proxy_pool.report(proxy, metrics.OK)
+"""
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config.settings import settings, logger
+from utils import metrics
+from utils.rate_limit import TokenBucket
+
+# Исходы utils/metrics.py, которые считаются успехом прокси
+GOOD_OUTCOMES = (metrics.OK, metrics.NOT_MODIFIED)
+
+SCORE_DECAY = 0.8
+
+
+@dataclass
+class ProxyState:
+    url: str
+    bucket: TokenBucket
+    score: float = 1.0
+    failures: int = 0          # неудач подряд
+    cooldown_until: float = 0.0
+    requests: int = 0
+    errors: int = 0
+
+    def cooling(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+
+def load_proxies(spec: str = None, path: str = None) -> List[str]:
+    """Прокси из PROXIES (через запятую) и PROXY_FILE (по одному в строке, # - комментарий)"""
+    spec = settings.proxies if spec is None else spec
+    path = settings.proxy_file if path is None else path
+
+    proxies = [item.strip() for item in spec.split(",") if item.strip()]
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            proxies += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [proxy if "://" in proxy else f"http://{proxy}" for proxy in dict.fromkeys(proxies)]
+
+
+def playwright_proxy(proxy: str) -> dict:
+    """Прокси в формате Playwright: server без учетных данных и отдельно логин/пароль"""
+    parsed = urlparse(proxy)
+    result = {"server": f"{parsed.scheme}://{parsed.hostname}:{parsed.port}"}
+    if parsed.username:
+        result["username"] = parsed.username
+        result["password"] = parsed.password or ""
+    return result
+
+
+def redact(proxy: Optional[str]) -> str:
+    """Прокси для логов и метрик: без учетных данных"""
+    if not proxy:
+        return "-"
+    parsed = urlparse(proxy)
+    return f"{parsed.hostname}:{parsed.port}"
+
+
+class ProxyPool:
+    """Прокси с корзинами токенов, оценкой здоровья, паузами и закреплением за ключом"""
+
+    def __init__(self, proxies: Optional[List[str]] = None, rate: float = None,
+                 cooldown: float = None, max_cooldown: float = None):
+        proxies = load_proxies() if proxies is None else proxies
+        rate = settings.proxy_rate if rate is None else rate
+        self.cooldown = settings.proxy_cooldown_sec if cooldown is None else cooldown
+        self.max_cooldown = settings.proxy_max_cooldown_sec if max_cooldown is None else max_cooldown
+
+        self._proxies: Dict[str, ProxyState] = {
+            proxy: ProxyState(proxy, TokenBucket(rate, capacity=1)) for proxy in proxies
+        }
+        self._sticky: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if proxies:
+            logger.info(f"[Proxy] Прокси в пуле: {len(proxies)}")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._proxies)
+
+    # === Выбор ===
+    def try_acquire(self, key: str) -> Tuple[Optional[str], float]:
+        """
+        Прокси для ключа и сколько ждать до его токена (0 - токен взят).
+        При ненулевом ожидании токен не списан: повторите вызов после паузы.
+        """
+        if not self._proxies:
+            return None, 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            state = self._proxies.get(self._sticky.get(key))
+            if state is None or state.cooling(now):
+                state = self._pick(now)
+                if self._sticky.get(key) != state.url:
+                    logger.debug(f"[Proxy] {key} → {redact(state.url)}")
+                self._sticky[key] = state.url
+
+            if state.cooling(now):
+                return state.url, state.cooldown_until - now
+            delay = state.bucket.try_acquire()
+            if not delay:
+                state.requests += 1
+            return state.url, delay
+
+    def acquire(self, key: str) -> Optional[str]:
+        """Прокси для ключа; ждет токен его корзины (или конец паузы, если на паузе все)"""
+        while True:
+            proxy, delay = self.try_acquire(key)
+            if not delay:
+                return proxy
+            time.sleep(delay)
+
+    async def acquire_async(self, key: str) -> Optional[str]:
+        """acquire() для цикла событий: ожидание не блокирует соседние задачи"""
+        while True:
+            proxy, delay = self.try_acquire(key)
+            if not delay:
+                return proxy
+            await asyncio.sleep(delay)
+
+    def _pick(self, now: float) -> ProxyState:
+        """Лучший прокси не на паузе (меньше закреплений при равной оценке); если пауза у всех - ближайший"""
+        ready = [state for state in self._proxies.values() if not state.cooling(now)]
+        if not ready:
+            return min(self._proxies.values(), key=lambda state: state.cooldown_until)
+        load = {}
+        for proxy in self._sticky.values():
+            load[proxy] = load.get(proxy, 0) + 1
+        return max(ready, key=lambda state: (round(state.score, 2), -load.get(state.url, 0)))
+
+    # === Исходы ===
+    def report(self, proxy: Optional[str], outcome: str):
+        """Исход загрузки через прокси (константы utils/metrics.py)"""
+        state = self._proxies.get(proxy)
+        if state is None:
+            return
+
+        with self._lock:
+            if outcome in GOOD_OUTCOMES:
+                state.score = state.score * SCORE_DECAY + (1 - SCORE_DECAY)
+                state.failures = 0
+                return
+
+            state.score *= SCORE_DECAY
+            state.failures += 1
+            state.errors += 1
+            pause = min(self.max_cooldown, self.cooldown * 2 ** (state.failures - 1))
+            state.cooldown_until = time.monotonic() + pause
+        logger.warning(f"[Proxy] {redact(proxy)}: {outcome}, пауза {pause:.0f}с "
+                       f"(оценка {state.score:.2f}, неудач подряд {state.failures})")
+
+    def stats(self) -> List[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "proxy": redact(state.url),
+                "score": round(state.score, 2),
+                "requests": state.requests,
+                "errors": state.errors,
+                "cooldown": round(max(0.0, state.cooldown_until - now), 1),
+                "sticky": sum(1 for proxy in self._sticky.values() if proxy == state.url),
+            } for state in self._proxies.values()]
+
+
+# Глобальный экземпляр
+proxy_pool = ProxyPool()
@@ -0,0 +1,183 @@
+"""
+Общий регулятор частоты запросов к Avito для всех путей загрузки.
+
+Частота подбирается отдельно для каждой пары хост + IP (прокси или direct)
+по схеме AIMD: каждый успешный ответ прибавляет FETCH_RATE_INCREASE
+запросов в секунду (до FETCH_RATE_MAX), а 429, блокировка или капча
+умножают частоту на FETCH_RATE_DECREASE (не ниже FETCH_RATE_MIN). Кроме
+того, пара уходит на паузу: Retry-After из ответа, если он есть, но не
+меньше экспоненциальной задержки с разбросом (FETCH_BACKOFF_BASE * 2^n, до
+FETCH_BACKOFF_MAX).
+
+Перед каждым запросом вызывается wait() (или await wait_async()): он
+занимает ближайший слот пары и ждет его. При RATE_CONTROL=shared состояние
+лежит в таблице rate_limits и меняется в транзакциях BEGIN IMMEDIATE, так
+что бот, main.py и пулы процессов делят один темп и одну паузу. local -
+состояние только в памяти процесса, off - без ограничений. В цикле событий
+вместо wait()/report() используются wait_async()/report_async(): транзакция
+может ждать блокировку записи другого процесса, поэтому идет в потоке.
+
+    rate_controller.wait(url, proxy)
+    response = ...
+    rate_controller.report(url, proxy, metrics.RATE_LIMITED, response.headers.get("Retry-After"))
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from config.settings import settings, logger
+from utils import metrics
+
+DIRECT = "direct"
+
+# Исходы, после которых частота снижается и пара уходит на паузу
+THROTTLE_OUTCOMES = (metrics.RATE_LIMITED, metrics.BLOCKED, metrics.CAPTCHA)
+SUCCESS_OUTCOMES = (metrics.OK, metrics.NOT_MODIFIED)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateController:
+    """AIMD-темп и паузы по парам хост/IP, общие для процессов через SQLite"""
+
+    def __init__(self, db=None, mode: str = None, initial_rate: float = None, min_rate: float = None,
+                 max_rate: float = None, increase: float = None, decrease: float = None,
+                 backoff_base: float = None, backoff_max: float = None):
+        self._db = db
+        self._mode = mode
+        self.initial_rate = settings.fetch_rate_initial if initial_rate is None else initial_rate
+        self.min_rate = settings.fetch_rate_min if min_rate is None else min_rate
+        self.max_rate = settings.fetch_rate_max if max_rate is None else max_rate
+        self.increase = settings.fetch_rate_increase if increase is None else increase
+        self.decrease = settings.fetch_rate_decrease if decrease is None else decrease
+        self.backoff_base = settings.fetch_backoff_base if backoff_base is None else backoff_base
+        self.backoff_max = settings.fetch_backoff_max if backoff_max is None else backoff_max
+
+        self._states: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        return self._mode or settings.rate_control
+
+    @property
+    def db(self):
+        if self._db is None:
+            from database.database_manager import db_manager
+            self._db = db_manager
+        return self._db
+
+    # === Состояние пары ===
+    def _update(self, url: str, identity: Optional[str], update) -> dict:
+        host = urlparse(url).netloc
+        identity = identity or DIRECT
+        if self.mode == "shared":
+            try:
+                return self.db.update_rate_limit(host, identity, lambda row: update(row or self._initial()))
+            except Exception as e:
+                logger.warning(f"[Rate] Общий лимит недоступен ({e}), используем лимит процесса")
+
+        with self._lock:
+            state = update(self._states.get((host, identity)) or self._initial())
+            self._states[(host, identity)] = state
+            return state
+
+    def _initial(self) -> dict:
+        return {"rate": self.initial_rate, "next_slot": 0.0, "blocked_until": 0.0, "failures": 0}
+
+    def backoff(self, failures: int) -> float:
+        """Экспоненциальная задержка с разбросом: половина фиксирована, половина случайна"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(0, failures - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    # === Перед запросом ===
+    def reserve(self, url: str, identity: Optional[str] = None) -> float:
+        """Занимает ближайший слот пары и возвращает, сколько секунд до него ждать"""
+        if self.mode == "off":
+            return 0.0
+
+        now = time.time()
+        slot = now
+
+        def take_slot(state: dict) -> dict:
+            nonlocal slot
+            slot = max(now, state["next_slot"], state["blocked_until"])
+            return dict(state, next_slot=slot + 1.0 / max(state["rate"], 1e-6))
+
+        self._update(url, identity, take_slot)
+        return slot - now
+
+    def wait(self, url: str, identity: Optional[str] = None):
+        delay = self.reserve(url, identity)
+        if delay > 0:
+            if delay >= 1:
+                logger.info(f"[Rate] Ждем {delay:.1f}с перед запросом к {urlparse(url).netloc}")
+            time.sleep(delay)
+
+    async def wait_async(self, url: str, identity: Optional[str] = None):
+        delay = await self._off_loop(self.reserve, url, identity)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _off_loop(self, fn, *args):
+        """Общее состояние меняется в потоке: ожидание блокировки БД не останавливает цикл событий"""
+        if self.mode == "shared":
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    # === После ответа ===
+    def report(self, url: str, identity: Optional[str], outcome: str, retry_after: Optional[str] = None):
+        """Исход запроса (константы utils/metrics.py); retry_after - заголовок Retry-After"""
+        if self.mode == "off" or outcome not in SUCCESS_OUTCOMES + THROTTLE_OUTCOMES:
+            return
+
+        now = time.time()
+        if outcome in SUCCESS_OUTCOMES:
+            self._update(url, identity, lambda state: dict(
+                state, rate=min(self.max_rate, state["rate"] + self.increase), failures=0))
+            return
+
+        pause = 0.0
+
+        def throttle(state: dict) -> dict:
+            nonlocal pause
+            failures = state["failures"] + 1
+            pause = max(parse_retry_after(retry_after) or 0.0, self.backoff(failures))
+            return dict(state, rate=max(self.min_rate, state["rate"] * self.decrease), failures=failures,
+                        blocked_until=max(state["blocked_until"], now + pause))
+
+        state = self._update(url, identity, throttle)
+        logger.warning(f"[Rate] {urlparse(url).netloc} ({identity or DIRECT}): {outcome}, "
+                       f"темп {state['rate']:.2f} запр/с, пауза {pause:.0f}с")
+
+    async def report_async(self, url: str, identity: Optional[str], outcome: str,
+                           retry_after: Optional[str] = None):
+        """report() для цикла событий"""
+        await self._off_loop(self.report, url, identity, outcome, retry_after)
+
+    def stats(self) -> list:
+        if self.mode == "shared":
+            return self.db.get_rate_limits()
+        with self._lock:
+            return [dict(state, host=host, identity=identity) for (host, identity), state in self._states.items()]
+
+
+# Глобальный экземпляр
+rate_controller = RateController()
@@ -0,0 +1,243 @@
+"""
+Повторное извлечение объявлений из архива страниц, без сети.
+
+Страницы читаются из utils/page_archive.py в порядке загрузки (или из
+папки с сохраненными *.html, как у save_html и LOCAL_HTML_PATH) и проходят
+через AvitoProcessor, так что изменения извлечения можно проверить на
+месяцах накопленных страниц. С --workers N извлечение идет в пуле процессов
+пачками по --chunk страниц; запись в БД остается одна, в главном процессе,
+пакетами по --batch объявлений. С --write результат пишется через upsert в
+хронологическом порядке, поэтому история цен складывается так же, как при
+живых запусках.
+
+    python -m services.replay --since 2026-01-01 --engine lxml
+    python -m services.replay --url-prefix https://www.avito.ru/moskva --write --workers 4
+    python -m services.replay --dir trash --workers 8 --write
+    python -m services.replay --stats
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from database.models import Listing
+from services.avito_processor import AvitoProcessor
+from utils.page_archive import ArchivedPage, PageArchive, page_archive
+from config.settings import settings, logger
+
+# Страница для извлечения: запись архива или путь к сохраненному HTML
+PageSource = Union[ArchivedPage, str]
+
+PROGRESS_EVERY_SEC = 5.0
+
+
+@dataclass
+class ReplayStats:
+    pages: int = 0
+    listings: int = 0
+    empty_pages: int = 0
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        return round(self.pages / self.elapsed, 1) if self.elapsed else 0.0
+
+    @property
+    def listings_per_sec(self) -> float:
+        return round(self.listings / self.elapsed, 1) if self.elapsed else 0.0
+
+
+class BatchWriter:
+    """
+    Единственный писатель в БД: копит объявления и пишет их пакетами.
+    Пакет сбрасывается раньше, если в него попадает второй раз тот же URL
+    (более новая версия страницы), иначе upsert учел бы только первую.
+    """
+
+    def __init__(self, db, stats: ReplayStats, batch_size: int = 500):
+        self.db = db
+        self.stats = stats
+        self.batch_size = max(1, batch_size)
+        self._batch: List[Listing] = []
+        self._urls = set()
+
+    def add(self, listings: Iterable[Listing]):
+        for listing in listings:
+            if listing.url in self._urls:
+                self.flush()
+            self._batch.append(listing)
+            self._urls.add(listing.url)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        added, updated, unchanged = self.db.upsert_listings(self._batch)
+        self.stats.added += len(added)
+        self.stats.updated += len(updated)
+        self.stats.unchanged += len(unchanged)
+        self._batch = []
+        self._urls = set()
+
+
+def replay_pages(archive: PageArchive = None, engine: Optional[str] = None,
+                 **filters) -> Iterator[Tuple[ArchivedPage, List[Listing]]]:
+    """Страницы архива (фильтры как у PageArchive.find) с заново извлеченными объявлениями"""
+    archive = archive or page_archive
+    for page, html in archive.iter_pages(**filters):
+        yield page, AvitoProcessor(base_url=page.url, engine=engine).process_html(html)
+
+
+def replay_archive(archive: PageArchive = None, engine: Optional[str] = None, write: bool = False,
+                   db=None, **filters) -> ReplayStats:
+    """Прогон архива через извлечение в текущем процессе; write=True - запись объявлений в БД"""
+    stats = ReplayStats()
+    writer = BatchWriter(db or _default_db(), stats) if write else None
+    started = time.perf_counter()
+    for page, listings in replay_pages(archive, engine, **filters):
+        _count_page(stats, page_label(page), listings)
+        if writer:
+            writer.add(listings)
+    if writer:
+        writer.flush()
+    stats.elapsed = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def replay_parallel(sources: List[PageSource], engine: Optional[str] = None, write: bool = False, db=None,
+                    workers: Optional[int] = None, chunk_size: int = 8, batch_size: int = 500,
+                    archive_root: Optional[str] = None, base_url: Optional[str] = None) -> ReplayStats:
+    """
+    Извлечение в пуле процессов. Пачки страниц раздаются воркерам, результаты
+    принимаются в исходном порядке и пишутся в БД одним писателем.
+    """
+    stats = ReplayStats()
+    writer = BatchWriter(db or _default_db(), stats, batch_size) if write else None
+    archive_root = archive_root or page_archive.root
+    base_url = base_url or settings.target_url or "https://www.avito.ru"
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), max(1, chunk_size))]
+    tasks = [(engine, archive_root, base_url, chunk) for chunk in chunks]
+
+    started = last_report = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for results in pool.map(_extract_chunk, tasks):
+            for label, listings in results:
+                _count_page(stats, label, listings)
+                if writer:
+                    writer.add(listings)
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_EVERY_SEC:
+                last_report = now
+                stats.elapsed = now - started
+                logger.info(f"[Replay] {stats.pages}/{len(sources)} страниц, "
+                            f"{stats.pages_per_sec} стр/с, {stats.listings_per_sec} объявл/с")
+    if writer:
+        writer.flush()
+    stats.elapsed = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def _extract_chunk(task) -> List[Tuple[str, List[Listing]]]:
+    """Выполняется в процессе пула: читает и разбирает пачку страниц"""
+    engine, archive_root, base_url, chunk = task
+    archive = PageArchive(archive_root)
+    results = []
+    for source in chunk:
+        try:
+            if isinstance(source, ArchivedPage):
+                html, url = archive.read(source), source.url
+            else:
+                with open(source, 'r', encoding='utf-8') as f:
+                    html, url = f.read(), base_url
+            results.append((page_label(source), AvitoProcessor(base_url=url, engine=engine).process_html(html)))
+        except Exception as e:
+            logger.error(f"[Replay] {page_label(source)}: {e}")
+            results.append((page_label(source), []))
+    return results
+
+
+def html_files(paths: Iterable[str]) -> List[str]:
+    """Файлы *.html из указанных папок и отдельные файлы, в порядке имен (у save_html это время)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, "**", "*.html"), recursive=True))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            logger.warning(f"[Replay] Не найдено: {path}")
+    return files
+
+
+def page_label(source: PageSource) -> str:
+    if isinstance(source, ArchivedPage):
+        return f"{source.url} от {source.fetched_at} (запись {source.id})"
+    return source
+
+
+def _count_page(stats: ReplayStats, label: str, listings: List[Listing]):
+    stats.pages += 1
+    stats.listings += len(listings)
+    if not listings:
+        stats.empty_pages += 1
+        logger.warning(f"[Replay] Нет объявлений: {label}")
+
+
+def _default_db():
+    from database.database_manager import db_manager
+    return db_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторное извлечение объявлений из архива страниц")
+    parser.add_argument("--url", help="только этот URL")
+    parser.add_argument("--url-prefix", help="URL, начинающиеся с префикса")
+    parser.add_argument("--since", help="загружены не раньше (ISO, например 2026-01-01)")
+    parser.add_argument("--until", help="загружены раньше (ISO)")
+    parser.add_argument("--limit", type=int, help="не больше N страниц")
+    parser.add_argument("--dir", nargs="+", metavar="PATH",
+                        help="папки или файлы с сохраненными *.html вместо архива")
+    parser.add_argument("--base-url", help="адрес выдачи для ссылок из --dir (по умолчанию TARGET_URL)")
+    parser.add_argument("--engine", choices=AvitoProcessor.ENGINES, help="движок извлечения (по умолчанию EXTRACT_ENGINE)")
+    parser.add_argument("--workers", type=int, default=1, help="процессов извлечения (0 - по числу ядер)")
+    parser.add_argument("--chunk", type=int, default=8, help="страниц в одной задаче воркера")
+    parser.add_argument("--batch", type=int, default=500, help="объявлений в одной записи в БД")
+    parser.add_argument("--write", action="store_true", help="записать объявления в БД")
+    parser.add_argument("--stats", action="store_true", help="только показать состав архива")
+    parser.add_argument("--rebuild-index", action="store_true", help="пересоздать индекс по сегментам")
+    args = parser.parse_args()
+
+    if args.rebuild_index:
+        page_archive.rebuild_index()
+    if args.stats or args.rebuild_index:
+        info = page_archive.stats()
+        logger.info(f"[Replay] Архив: страниц {info['pages']}, URL {info['urls']}, "
+                    f"{info['raw']:,} -> {info['stored']:,} байт, с {info['first']} по {info['last']}")
+        return
+
+    filters = dict(url=args.url, url_prefix=args.url_prefix, since=args.since, until=args.until, limit=args.limit)
+    if args.dir or args.workers != 1:
+        sources = html_files(args.dir)[:args.limit] if args.dir else page_archive.find(**filters)
+        logger.info(f"[Replay] Страниц к разбору: {len(sources)}, процессов: {args.workers or os.cpu_count()}")
+        stats = replay_parallel(sources, engine=args.engine, write=args.write, workers=args.workers or None,
+                                chunk_size=args.chunk, batch_size=args.batch, base_url=args.base_url)
+    else:
+        stats = replay_archive(engine=args.engine, write=args.write, **filters)
+
+    logger.success(f"[Replay] Страниц: {stats.pages} (без объявлений: {stats.empty_pages}), "
+                   f"объявлений: {stats.listings}, время: {stats.elapsed} с "
+                   f"({stats.pages_per_sec} стр/с, {stats.listings_per_sec} объявл/с)")
+    if args.write:
+        logger.success(f"[Replay] В БД: новых {stats.added}, обновлено {stats.updated}, без изменений {stats.unchanged}")
+
+
+if __name__ == "__main__":
+    main()
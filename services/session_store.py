@@ -0,0 +1,252 @@
+"""
+Общее хранилище cookies для curl и Playwright.
+
+Cookies живут в памяти и привязаны к связке профиль браузера + прокси:
+что получил браузер профиля, то видит и curl того же профиля, и наоборот.
+Внутри хранится формат Playwright (name, value, domain, path, expires,
+httpOnly, secure, sameSite); для curl-cffi есть преобразование в обе
+стороны. Каждой cookie дается срок SESSION_TTL_HOURS с момента получения
+(и не дольше ее собственного expires), просроченные не выдаются и не
+сохраняются.
+
+На диск хранилище пишется целиком и атомарно (временный файл + os.replace)
+пачками: после SESSION_FLUSH_EVERY изменений или SESSION_FLUSH_SEC секунд,
+а также при остановке процесса. Файл общий для бота, main.py и пулов
+процессов: запись идет под блокировкой файла <path>.lock, перед ней
+хранилище сливается с файлом (из двух версий cookie побеждает более
+свежая). Изменения файла другими процессами подхватываются при чтении, а
+version() связки растет при каждом ее изменении - долгоживущие сессии
+(AsyncCurlEngine) по нему понимают, что пора обновить cookies.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from config.settings import settings, logger
+
+DIRECT = "direct"
+
+# (name, domain, path)
+CookieKey = Tuple[str, str, str]
+
+
+def jar_key(profile: str, proxy: Optional[str] = None) -> str:
+    return f"{profile}|{proxy or DIRECT}"
+
+
+def from_playwright(cookies: Iterable[dict]) -> List[dict]:
+    """Cookies из context.cookies()"""
+    return [{
+        "name": cookie["name"],
+        "value": cookie["value"],
+        "domain": cookie.get("domain", ""),
+        "path": cookie.get("path", "/"),
+        "expires": cookie.get("expires", -1),
+        "httpOnly": cookie.get("httpOnly", False),
+        "secure": cookie.get("secure", False),
+        "sameSite": cookie.get("sameSite", "Lax"),
+    } for cookie in cookies]
+
+
+def from_curl(jar) -> List[dict]:
+    """Cookies из session.cookies.jar (http.cookiejar) сессии curl-cffi"""
+    return [{
+        "name": cookie.name,
+        "value": cookie.value,
+        "domain": cookie.domain,
+        "path": cookie.path or "/",
+        "expires": cookie.expires if cookie.expires is not None else -1,
+        "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+        "secure": bool(cookie.secure),
+        "sameSite": "Lax",
+    } for cookie in jar]
+
+
+def to_curl(session, cookies: Iterable[dict]):
+    """Кладет cookies в сессию curl-cffi (синхронную или AsyncSession)"""
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+
+
+@contextmanager
+def file_lock(path: str):
+    """Межпроцессная блокировка на файле path (создается при необходимости)"""
+    with open(path, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SessionStore:
+    """Cookies по связкам профиль/прокси в памяти с пакетной атомарной записью"""
+
+    def __init__(self, path: str = None, ttl_hours: float = None,
+                 flush_every: int = None, flush_sec: float = None):
+        self.path = path or settings.session_store_path
+        self.ttl = (settings.session_ttl_hours if ttl_hours is None else ttl_hours) * 3600
+        self.flush_every = settings.session_flush_every if flush_every is None else flush_every
+        self.flush_sec = settings.session_flush_sec if flush_sec is None else flush_sec
+
+        # jar_key -> {(name, domain, path): cookie + "stored_at"}
+        self._jars: Dict[str, Dict[CookieKey, dict]] = {}
+        self._versions: Dict[str, int] = {}
+        self._changes = 0
+        self._last_flush = time.monotonic()
+        self._file_state = None  # (mtime_ns, size) последней прочитанной или записанной версии файла
+        self._lock = threading.RLock()
+
+    def _load(self):
+        """Сливает в память файл хранилища, если его изменил другой процесс"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        file_state = (stat.st_mtime_ns, stat.st_size)
+        if file_state == self._file_state:
+            return
+        self._file_state = file_state
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"[Sessions] Ошибка загрузки {self.path}: {e}")
+            return
+
+        now = time.time()
+        merged = 0
+        for key, cookies in data.get("jars", {}).items():
+            jar = self._jars.setdefault(key, {})
+            changed = False
+            for cookie in cookies:
+                cookie_key = self._cookie_key(cookie)
+                old = jar.get(cookie_key)
+                if self._expired(cookie, now) or (old and old.get("stored_at", 0) >= cookie.get("stored_at", 0)):
+                    continue
+                jar[cookie_key] = cookie
+                changed = True
+            if changed:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                merged += 1
+        logger.debug(f"[Sessions] Из файла обновлено связок: {merged}")
+
+    @staticmethod
+    def _cookie_key(cookie: dict) -> CookieKey:
+        return cookie["name"], cookie["domain"], cookie["path"]
+
+    def _expired(self, cookie: dict, now: float) -> bool:
+        expires = cookie.get("expires", -1)
+        if expires is not None and expires > 0 and expires <= now:
+            return True
+        return bool(self.ttl) and cookie.get("stored_at", now) + self.ttl <= now
+
+    # === Чтение и запись ===
+    def get(self, profile: str, proxy: Optional[str] = None) -> List[dict]:
+        """Действующие cookies связки в формате Playwright"""
+        now = time.time()
+        with self._lock:
+            self._load()
+            jar = self._jars.get(jar_key(profile, proxy), {})
+            return [{k: v for k, v in cookie.items() if k != "stored_at"}
+                    for cookie in jar.values() if not self._expired(cookie, now)]
+
+    def update(self, profile: str, cookies: Iterable[dict], proxy: Optional[str] = None):
+        """
+        Сливает cookies, полученные сессией связки. Срок TTL отсчитывается
+        заново только для cookies с новым значением.
+        """
+        now = time.time()
+        key = jar_key(profile, proxy)
+        with self._lock:
+            self._load()
+            jar = self._jars.setdefault(key, {})
+            changed = 0
+            for cookie in cookies:
+                cookie_key = self._cookie_key(cookie)
+                old = jar.get(cookie_key)
+                if old and old["value"] == cookie["value"] and old.get("expires") == cookie.get("expires"):
+                    continue
+                jar[cookie_key] = dict(cookie, stored_at=now)
+                changed += 1
+            if not changed:
+                return
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._changes += changed
+            if self._changes >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_sec:
+                self.flush()
+
+    def version(self, profile: str, proxy: Optional[str] = None) -> int:
+        """Номер версии cookies связки: меняется при каждом их обновлении (в т.ч. другим процессом)"""
+        with self._lock:
+            self._load()
+            return self._versions.get(jar_key(profile, proxy), 0)
+
+    def update_from_curl(self, profile: str, session, proxy: Optional[str] = None):
+        self.update(profile, from_curl(session.cookies.jar), proxy)
+
+    def apply_to_curl(self, profile: str, session, proxy: Optional[str] = None):
+        """Заменяет cookies сессии curl на cookies связки"""
+        session.cookies.clear()
+        to_curl(session, self.get(profile, proxy))
+
+    # === Сохранение ===
+    def flush(self):
+        """
+        Атомарно записывает хранилище, если были изменения. Под блокировкой файла
+        сначала подтягиваются cookies, сохраненные другими процессами, чтобы не
+        затереть их своей версией.
+        """
+        with self._lock:
+            if not self._changes:
+                return
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                with file_lock(self.path + ".lock"):
+                    self._load()
+                    now = time.time()
+                    for key, jar in list(self._jars.items()):
+                        self._jars[key] = {name: cookie for name, cookie in jar.items()
+                                           if not self._expired(cookie, now)}
+                    data = {"jars": {key: list(jar.values()) for key, jar in self._jars.items() if jar}}
+
+                    fd, tmp_path = tempfile.mkstemp(prefix=".sessions-", dir=directory)
+                    try:
+                        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                            json.dump(data, f, ensure_ascii=False)
+                        os.replace(tmp_path, self.path)
+                    except BaseException:
+                        os.unlink(tmp_path)
+                        raise
+                    stat = os.stat(self.path)
+                    self._file_state = (stat.st_mtime_ns, stat.st_size)
+                self._changes = 0
+                self._last_flush = time.monotonic()
+                logger.debug(f"[Sessions] Cookies сохранены: {self.path}")
+            except Exception as e:
+                logger.warning(f"[Sessions] Ошибка сохранения {self.path}: {e}")
+
+
+# Глобальный экземпляр
+session_store = SessionStore()
+atexit.register(session_store.flush)
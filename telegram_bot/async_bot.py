@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Асинхронный рантайм бота: AsyncTeleBot, long polling или webhook (aiohttp)
+
+    python telegram_bot/async_bot.py                  # BOT_MODE=polling
+    BOT_MODE=webhook WEBHOOK_URL=https://bot.example.com python telegram_bot/async_bot.py
+
+Очередь заданий, автозапуск и рассылка те же, что у telegram_bot/bot.py.
+"""
+import asyncio
+import sys
+from pathlib import Path
+from aiohttp import web
+from loguru import logger
+import telebot
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import Update
+
+# Добавляем корень проекта в путь
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import settings
+from telegram_bot.bot import load_token, start_services, stop_services
+from telegram_bot.async_handlers import register_async_handlers
+
+
+async def run_webhook(bot: AsyncTeleBot):
+    """HTTP-сервер aiohttp принимает апдейты; обработка не задерживает ответ Telegram"""
+    tasks = set()
+
+    async def handle(request: web.Request) -> web.Response:
+        if settings.webhook_secret and \
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token") != settings.webhook_secret:
+            return web.Response(status=403)
+
+        update = Update.de_json(await request.text())
+        task = asyncio.create_task(bot.process_new_updates([update]))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(settings.webhook_path, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.webhook_host, settings.webhook_port).start()
+
+    url = settings.webhook_url.rstrip("/") + settings.webhook_path
+    await bot.set_webhook(url=url, secret_token=settings.webhook_secret or None, drop_pending_updates=True)
+    logger.info(f"Webhook: {url} (слушаем {settings.webhook_host}:{settings.webhook_port})")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await bot.remove_webhook()
+        await runner.cleanup()
+
+
+async def run(token: str):
+    bot = AsyncTeleBot(token, parse_mode='HTML')
+    register_async_handlers(bot)
+
+    # Поток рассылки отправляет сообщения синхронным клиентом, цикл событий им не занят
+    start_services(telebot.TeleBot(token, parse_mode='HTML', threaded=False))
+
+    logger.success(f"✅ Avito Parser Bot (async, {settings.bot_mode}) запущен!")
+    try:
+        if settings.bot_mode == "webhook":
+            if not settings.webhook_url:
+                raise ValueError("Для BOT_MODE=webhook нужен WEBHOOK_URL")
+            await run_webhook(bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await bot.infinity_polling(timeout=60, request_timeout=90)
+    finally:
+        await bot.close_session()
+
+
+def main():
+    """Точка входа асинхронного бота"""
+    token = load_token()
+    try:
+        asyncio.run(run(token))
+    except KeyboardInterrupt:
+        logger.info("Бот остановлен пользователем")
+    except Exception as e:
+        logger.error(f"Критическая ошибка: {e}")
+        sys.exit(1)
+    finally:
+        stop_services()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Асинхронные обработчики для AsyncTeleBot
+
+Экраны и действия те же, что в handlers.py. Работа с SQLite и очередью
+заданий уходит в пул потоков (asyncio.to_thread), поэтому цикл событий не
+блокируется, а вызовы Telegram идут без отдельного потока на каждый апдейт.
+"""
+import asyncio
+from loguru import logger
+from telebot.async_telebot import AsyncTeleBot
+
+from .keyboards import main_menu, settings_menu, job_cancel
+from .parser_runner import parser_runner
+from .handlers import (
+    parse_journal_position, status_view, start_runs, runs_summary, set_autorun, autorun_view,
+    searches_view, add_search, delete_search, journal_view, listing_view, SEARCH_PROMPT
+)
+
+WELCOME_TEXT = (
+    "👋 <b>Добро пожаловать в Avito Parser Bot!</b>\n\n"
+    "Я помогу вам отслеживать объявления на Avito.\n\n"
+    "Выберите действие:"
+)
+
+
+async def safe(coro):
+    """Вызов Telegram, ошибка которого не важна (сообщение уже изменено/удалено и т.п.)"""
+    try:
+        return await coro
+    except Exception:
+        return None
+
+
+def register_async_handlers(bot: AsyncTeleBot):
+    """Регистрирует все обработчики"""
+    # Чаты, от которых ждем ссылку на новый поиск
+    awaiting_search = set()
+
+    @bot.message_handler(commands=['start'])
+    async def cmd_start(message):
+        await bot.send_message(message.chat.id, WELCOME_TEXT, reply_markup=main_menu(), parse_mode='HTML')
+
+    @bot.message_handler(func=lambda message: message.chat.id in awaiting_search)
+    async def on_search_text(message):
+        awaiting_search.discard(message.chat.id)
+        try:
+            reply = await asyncio.to_thread(add_search, message.chat.id, message.text)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения поиска: {e}")
+            reply = "❌ Не удалось сохранить поиск"
+        await bot.send_message(message.chat.id, reply)
+        await send_searches(bot, message.chat.id)
+
+    @bot.callback_query_handler(func=lambda call: True)
+    async def handle_callback(call):
+        chat_id = call.message.chat.id
+        message_id = call.message.message_id
+        data = call.data
+
+        async def edit(view, **kwargs):
+            text, markup = view
+            await bot.edit_message_text(text, chat_id, message_id, reply_markup=markup, parse_mode='HTML', **kwargs)
+
+        try:
+            if data == "menu":
+                await edit(("📋 <b>Главное меню</b>\n\nВыберите действие:", main_menu()))
+
+            elif data == "status":
+                await edit(await asyncio.to_thread(status_view))
+
+            elif data.startswith("journal:"):
+                page, cursor = parse_journal_position(data)
+                await edit(await asyncio.to_thread(journal_view, page, cursor))
+
+            elif data.startswith("view:"):
+                parts = data.split(":")
+                page, cursor = parse_journal_position(":".join(parts[1:]))
+                view = await asyncio.to_thread(listing_view, int(parts[1]), page, cursor)
+                if not view:
+                    await bot.answer_callback_query(call.id, "Объект не найден", show_alert=True)
+                    return
+                text, markup = view
+                await bot.send_message(chat_id, text, reply_markup=markup, parse_mode='HTML',
+                                       disable_web_page_preview=True)
+
+            elif data.startswith("back_journal:"):
+                page, cursor = parse_journal_position(data)
+                await safe(bot.delete_message(chat_id, message_id))
+                text, markup = await asyncio.to_thread(journal_view, page, cursor)
+                await bot.send_message(chat_id, text, reply_markup=markup, parse_mode='HTML')
+
+            elif data == "run_parser":
+                loop = asyncio.get_running_loop()
+
+                def make_callback(run):
+                    # Вызывается из потока очереди: передаем отправку в цикл событий бота
+                    def callback(status, message):
+                        if status in ("started", "processing", "progress"):
+                            coro = safe(bot.edit_message_text(message, chat_id, message_id, parse_mode='HTML',
+                                                              reply_markup=job_cancel(run.get('job_id'))))
+                        else:
+                            coro = report(bot, chat_id, message_id, message)
+                        asyncio.run_coroutine_threadsafe(coro, loop)
+                    return callback
+
+                runs = await asyncio.to_thread(start_runs, chat_id, make_callback)
+                answer, show_alert, queued = runs_summary(runs)
+                await safe(bot.answer_callback_query(call.id, answer, show_alert=show_alert))
+                if queued:
+                    await safe(bot.edit_message_text(
+                        f"⏳ Задание <code>{queued.id}</code> в очереди...", chat_id, message_id,
+                        parse_mode='HTML', reply_markup=job_cancel(queued.id)
+                    ))
+
+            elif data.startswith("cancel_job:"):
+                if await asyncio.to_thread(parser_runner.cancel, data.split(":")[1]):
+                    await bot.answer_callback_query(call.id, "⏹ Задание отменяется...")
+                else:
+                    await bot.answer_callback_query(call.id, "Задание уже завершено", show_alert=True)
+
+            elif data == "settings":
+                await edit(("⚙️ <b>Настройки</b>", settings_menu()))
+
+            elif data == "autorun_menu":
+                await edit(await asyncio.to_thread(autorun_view, chat_id))
+
+            elif data.startswith("autorun:"):
+                answer = await asyncio.to_thread(set_autorun, chat_id, data.split(":")[1])
+                await bot.answer_callback_query(call.id, answer)
+                await edit(await asyncio.to_thread(autorun_view, chat_id))
+
+            elif data == "change_url":
+                await edit(await asyncio.to_thread(searches_view, chat_id), disable_web_page_preview=True)
+
+            elif data == "search_add":
+                awaiting_search.add(chat_id)
+                await bot.answer_callback_query(call.id)
+                await bot.send_message(chat_id, SEARCH_PROMPT, parse_mode='HTML', disable_web_page_preview=True)
+
+            elif data.startswith("search_del:"):
+                if await asyncio.to_thread(delete_search, chat_id, int(data.split(":")[1])):
+                    await bot.answer_callback_query(call.id, "🗑 Поиск удален")
+                await edit(await asyncio.to_thread(searches_view, chat_id), disable_web_page_preview=True)
+
+            elif data in ["search", "stats"]:
+                await bot.answer_callback_query(
+                    call.id,
+                    "🚧 Эта функция будет доступна в следующей версии",
+                    show_alert=True
+                )
+
+            elif data == "noop":
+                await bot.answer_callback_query(call.id)
+
+        except Exception as e:
+            logger.error(f"Ошибка обработки callback: {e}")
+            await safe(bot.answer_callback_query(call.id, "Произошла ошибка", show_alert=True))
+
+
+async def report(bot: AsyncTeleBot, chat_id, message_id, message):
+    """Итог прогона: сообщение о прогрессе заменяется результатом с кнопкой "В меню" """
+    await safe(bot.delete_message(chat_id, message_id))
+    await safe(bot.send_message(chat_id, message, parse_mode='HTML', reply_markup=main_menu()))
+
+
+async def send_searches(bot: AsyncTeleBot, chat_id):
+    text, markup = await asyncio.to_thread(searches_view, chat_id)
+    await bot.send_message(chat_id, text, reply_markup=markup, parse_mode='HTML', disable_web_page_preview=True)
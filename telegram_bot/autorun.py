@@ -0,0 +1,133 @@
+"""
+Автозапуск парсера по расписанию (APScheduler)
+
+Задания хранятся в той же SQLite-базе (таблица apscheduler_jobs) и переживают
+перезапуск бота. Одно задание на уникальный URL сохраненных поисков, интервал -
+минимальный среди подписчиков, плюс разброс (jitter), чтобы запросы к Avito не
+шли пачкой. Пропущенные за время простоя запуски схлопываются в один
+(coalesce), а число одновременных прогонов ограничено пулом потоков
+планировщика.
+"""
+import hashlib
+from loguru import logger
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from config.settings import settings
+from database.database_manager import db_manager
+
+JOB_PREFIX = "autorun"
+
+
+def job_id(url: str) -> str:
+    """ID задания: один уникальный URL поиска"""
+    url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+    return f"{JOB_PREFIX}:{url_hash}"
+
+
+def run_url(url: str):
+    """
+    Запуск по расписанию. Функция модульного уровня: в хранилище заданий
+    сохраняется ссылка на нее, а не на объект планировщика.
+    """
+    from .searches import search_fanout
+
+    logger.info(f"[Autorun] Запуск по расписанию: {url}")
+    # Через общую очередь: если этот URL уже парсится, ждем текущее задание, а не запускаем второе.
+    # Поток планировщика занят до конца прогона, так лимит AUTORUN_MAX_CONCURRENT сохраняется.
+    # Новые объявления раздаются подписчикам при завершении задания.
+    result = search_fanout.run_cycle([url])[url]
+    if not result.get("success"):
+        logger.warning(f"[Autorun] Ошибка прогона {url}: {result.get('error')}")
+
+
+def run_search(chat_id: int, url: str):
+    """Задания старого формата (чат + URL) до переноса в сохраненные поиски"""
+    run_url(url)
+
+
+class AutorunScheduler:
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or db_manager.db_path
+        self.scheduler = BackgroundScheduler(
+            jobstores={
+                "default": SQLAlchemyJobStore(
+                    url=f"sqlite:///{self.db_path}",
+                    engine_options={"connect_args": {"timeout": settings.sqlite_busy_timeout_ms / 1000}},
+                ),
+            },
+            # Глобальный лимит одновременных прогонов
+            executors={"default": ThreadPoolExecutor(settings.autorun_max_concurrent)},
+            job_defaults={
+                "coalesce": True,
+                "max_instances": 1,
+                "misfire_grace_time": settings.autorun_misfire_grace_sec,
+            },
+        )
+
+    def start(self):
+        """Запускает планировщик и переносит задания старого формата в сохраненные поиски"""
+        if not self.scheduler.running:
+            self.scheduler.start()
+            self._migrate_chat_jobs()
+            logger.info(f"[Autorun] Планировщик запущен, заданий: {len(self.scheduler.get_jobs())}")
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+            logger.info("[Autorun] Планировщик остановлен")
+
+    def sync_url(self, url: str, jitter_sec: int = None):
+        """
+        Приводит задание URL в соответствие с сохраненными поисками:
+        интервал - минимальный среди подписчиков, без подписчиков с автозапуском задание удаляется.
+        """
+        searches = db_manager.get_search_subscribers(url).get(url, [])
+        intervals = [search["interval_min"] for search in searches if search["interval_min"]]
+        if not intervals:
+            job = self.scheduler.get_job(job_id(url))
+            if job:
+                job.remove()
+                logger.info(f"[Autorun] Автозапуск выключен: {url}")
+            return None
+
+        interval_min = min(intervals)
+        if jitter_sec is None:
+            # Разброс не больше четверти интервала
+            jitter_sec = min(settings.autorun_jitter_sec, interval_min * 15)
+
+        job = self.scheduler.get_job(job_id(url))
+        if job and job.trigger.interval.total_seconds() == interval_min * 60:
+            return job
+
+        job = self.scheduler.add_job(
+            run_url,
+            trigger=IntervalTrigger(minutes=interval_min, jitter=jitter_sec),
+            id=job_id(url),
+            name=url,
+            kwargs={"url": url},
+            replace_existing=True,
+        )
+        logger.info(f"[Autorun] Каждые {interval_min} мин (±{jitter_sec} с), подписчиков {len(searches)}: {url}")
+        return job
+
+    def get_job(self, url: str):
+        return self.scheduler.get_job(job_id(url))
+
+    def _migrate_chat_jobs(self):
+        """Задания "autorun:<чат>:<хэш>" превращаются в поиски чатов с тем же интервалом"""
+        for job in self.scheduler.get_jobs():
+            if job.id.count(":") != 2:
+                continue
+            chat_id, url = job.kwargs["chat_id"], job.kwargs["url"]
+            interval_min = int(job.trigger.interval.total_seconds() // 60)
+            db_manager.add_search(chat_id, url, interval_min=interval_min)
+            job.remove()
+            self.sync_url(url)
+            logger.info(f"[Autorun] Задание чата {chat_id} перенесено в сохраненные поиски: {url}")
+
+
+# Глобальный экземпляр
+autorun_scheduler = AutorunScheduler()
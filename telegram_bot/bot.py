@@ -14,6 +14,14 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from config.settings import settings
 from telegram_bot.handlers import register_handlers
+from telegram_bot.autorun import autorun_scheduler
+from telegram_bot.parser_runner import parser_runner
+from telegram_bot.searches import search_fanout
+from telegram_bot.notifier import notifier
+from core.browser_pool import shutdown_browser_pool
+from core.async_curl_parser import shutdown_curl_engine
+from services.session_store import session_store
+from utils.metrics import start_metrics_server
 
 
 # Настройка логирования
@@ -25,14 +33,42 @@ logger.add(
 )
 
 
-def main():
-    """Точка входа бота"""
+def load_token() -> str:
+    """Токен бота из .env (завершает процесс, если его нет)"""
     token = os.getenv("TELEGRAM_BOT_TOKEN") or os.getenv("telegram_bot_token")
 
     if not token:
         logger.error("❌ Не найден TELEGRAM_BOT_TOKEN в .env файле!")
         logger.info("Добавьте в .env: TELEGRAM_BOT_TOKEN=ваш_токен_от_BotFather")
         sys.exit(1)
+    return token
+
+
+def start_services(sync_bot):
+    """
+    Очередь и автозапуск: задания восстанавливаются из БД, отчеты и новые объявления
+    уходят в чаты через рассылку с лимитами Telegram (поток парсера не ждет отправки).
+    sync_bot - синхронный клиент telebot, им пользуется поток рассылки.
+    При METRICS_PORT поднимается эндпоинт метрик Prometheus.
+    """
+    start_metrics_server()
+    notifier.start(sync_bot)
+    search_fanout.start(send=notifier.enqueue)
+    parser_runner.jobs.start(notify=notifier.send_text)
+    autorun_scheduler.start()
+
+
+def stop_services():
+    autorun_scheduler.shutdown()
+    notifier.stop()
+    shutdown_browser_pool()
+    shutdown_curl_engine()
+    session_store.flush()
+
+
+def main():
+    """Точка входа бота"""
+    token = load_token()
 
     # Увеличиваем таймауты Telegram API (исправляет Read timed out / query is too old)
     apihelper.CONNECT_TIMEOUT = 30
@@ -41,6 +77,7 @@ def main():
     bot = telebot.TeleBot(token, parse_mode='HTML', threaded=True)
 
     register_handlers(bot)
+    start_services(bot)
 
     logger.success("✅ Avito Parser Bot запущен!")
     logger.info("Нажмите Ctrl+C для остановки")
@@ -53,9 +90,9 @@ def main():
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
         sys.exit(1)
+    finally:
+        stop_services()
 
 
 if __name__ == "__main__":
     main()
-
-
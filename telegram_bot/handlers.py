@@ -3,9 +3,14 @@
 """
 from loguru import logger
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-from database.database_manager import DatabaseManager
-from .keyboards import main_menu, journal_navigation, listing_details, settings_menu
+from database.database_manager import db_manager
+from config.settings import settings
+from .keyboards import (
+    main_menu, journal_navigation, listing_details, settings_menu, autorun_menu, job_cancel, searches_menu
+)
 from .parser_runner import parser_runner
+from .autorun import autorun_scheduler
+from .searches import parse_search_text, describe_filters
 
 
 ITEMS_PER_PAGE = 5
@@ -44,19 +49,7 @@ def register_handlers(bot):
                 )
 
             elif data == "status":
-                status = parser_runner.get_status()
-                text = (
-                    f"📊 <b>Статус парсера</b>\n\n"
-                    f"Состояние: {status['status']}\n"
-                    f"Объектов в базе: {status['total']}\n"
-                    f"Последний запуск: {status['last_run']}"
-                )
-
-                markup = InlineKeyboardMarkup()
-                if not status['is_running']:
-                    markup.add(InlineKeyboardButton("🚀 Запустить", callback_data="run_parser"))
-                markup.add(InlineKeyboardButton("🔙 Назад", callback_data="menu"))
-
+                text, markup = status_view()
                 bot.edit_message_text(
                     text, chat_id, message_id,
                     reply_markup=markup,
@@ -64,48 +57,61 @@ def register_handlers(bot):
                 )
 
             elif data.startswith("journal:"):
-                page = int(data.split(":")[1])
-                show_journal(bot, chat_id, message_id, page)
+                page, cursor = parse_journal_position(data)
+                show_journal(bot, chat_id, message_id, page, cursor)
 
             elif data.startswith("view:"):
                 parts = data.split(":")
                 listing_id = int(parts[1])
-                page = int(parts[2])
-                show_listing_details(bot, chat_id, listing_id, page)
+                page, cursor = parse_journal_position(":".join(parts[1:]))
+                show_listing_details(bot, chat_id, listing_id, page, cursor)
 
             elif data.startswith("back_journal:"):
-                page = int(data.split(":")[1])
+                page, cursor = parse_journal_position(data)
                 bot.delete_message(chat_id, message_id)
                 msg = bot.send_message(chat_id, "Загружаю журнал...")
-                show_journal(bot, chat_id, msg.message_id, page)
+                show_journal(bot, chat_id, msg.message_id, page, cursor)
 
             elif data == "run_parser":
-                if parser_runner.is_running:
-                    try:
-                        bot.answer_callback_query(call.id, "⚠️ Парсер уже работает!", show_alert=True)
-                    except Exception:
-                        pass
-                else:
-                    try:
-                        bot.answer_callback_query(call.id, "🚀 Запускаю парсер...")
-                    except Exception:
-                        pass
-
+                def make_callback(run):
                     def callback(status, message):
-                        if status == "started":
-                            bot.edit_message_text(message, chat_id, message_id, parse_mode='HTML')
+                        if status in ("started", "processing", "progress"):
+                            try:
+                                bot.edit_message_text(message, chat_id, message_id, parse_mode='HTML',
+                                                      reply_markup=job_cancel(run.get('job_id')))
+                            except Exception:
+                                pass
                         else:
                             try:
                                 bot.delete_message(chat_id, message_id)
                             except Exception:
                                 pass
                             # Добавляем кнопку "В меню" к результату парсинга
-                            from .keyboards import main_menu
                             bot.send_message(chat_id, message, parse_mode='HTML', reply_markup=main_menu())
+                    return callback
 
-                    result = parser_runner.run_parser(callback)
-                    if not result['success']:
-                        bot.answer_callback_query(call.id, result['error'], show_alert=True)
+                runs = start_runs(chat_id, make_callback)
+
+                answer, show_alert, queued = runs_summary(runs)
+                try:
+                    bot.answer_callback_query(call.id, answer, show_alert=show_alert)
+                except Exception:
+                    pass
+                if queued:
+                    try:
+                        bot.edit_message_text(
+                            f"⏳ Задание <code>{queued.id}</code> в очереди...", chat_id, message_id,
+                            parse_mode='HTML', reply_markup=job_cancel(queued.id)
+                        )
+                    except Exception:
+                        pass
+
+            elif data.startswith("cancel_job:"):
+                job_id = data.split(":")[1]
+                if parser_runner.cancel(job_id):
+                    bot.answer_callback_query(call.id, "⏹ Задание отменяется...")
+                else:
+                    bot.answer_callback_query(call.id, "Задание уже завершено", show_alert=True)
 
             elif data == "settings":
                 bot.edit_message_text(
@@ -115,7 +121,27 @@ def register_handlers(bot):
                     parse_mode='HTML'
                 )
 
-            elif data in ["search", "stats", "autorun_menu", "change_url"]:
+            elif data == "autorun_menu":
+                show_autorun(bot, chat_id, message_id)
+
+            elif data.startswith("autorun:"):
+                bot.answer_callback_query(call.id, set_autorun(chat_id, data.split(":")[1]))
+                show_autorun(bot, chat_id, message_id)
+
+            elif data == "change_url":
+                show_searches(bot, chat_id, message_id)
+
+            elif data == "search_add":
+                bot.answer_callback_query(call.id)
+                prompt = bot.send_message(chat_id, SEARCH_PROMPT, parse_mode='HTML', disable_web_page_preview=True)
+                bot.register_next_step_handler(prompt, lambda message: save_search(bot, message))
+
+            elif data.startswith("search_del:"):
+                if delete_search(chat_id, int(data.split(":")[1])):
+                    bot.answer_callback_query(call.id, "🗑 Поиск удален")
+                show_searches(bot, chat_id, message_id)
+
+            elif data in ["search", "stats"]:
                 bot.answer_callback_query(
                     call.id,
                     "🚧 Эта функция будет доступна в следующей версии",
@@ -133,44 +159,171 @@ def register_handlers(bot):
                 pass
 
 
-def show_journal(bot, chat_id, message_id, page: int = 1):
-    """Отображает журнал объектов"""
-    db = DatabaseManager()
+def parse_journal_position(data: str):
+    """Разбирает "<префикс>:<страница>[:<курсор>]" в (страница, курсор)"""
+    parts = data.split(":")
+    page = int(parts[1])
+    cursor = parts[2] if len(parts) > 2 and parts[2] else None
+    return page, cursor
+
+
+# === Экраны и действия без привязки к рантайму бота ===
+# Функции ниже работают с БД и очередью, но не с Telegram: их вызывают и синхронные
+# обработчики (этот модуль), и асинхронные (async_handlers.py, через asyncio.to_thread).
+
+SEARCH_PROMPT = (
+    "🔗 Отправьте ссылку на выдачу Avito.\n"
+    "Можно добавить фильтр по цене: <code>https://www.avito.ru/... от 20000 до 40000</code>"
+)
+
+
+def status_view():
+    """Экран статуса: состояние, активные задания с кнопками отмены"""
+    status = parser_runner.get_status()
+    text = (
+        f"📊 <b>Статус парсера</b>\n\n"
+        f"Состояние: {status['status']}\n"
+        f"Объектов в базе: {status['total']}\n"
+        f"Последний запуск: {status['last_run']}"
+    )
+
+    for job in status['jobs']:
+        text += f"\n\n<code>{job.id}</code> {job.progress}\n{job.url[:60]}"
+
+    markup = InlineKeyboardMarkup()
+    for job in status['jobs']:
+        markup.add(InlineKeyboardButton(f"⏹ Отменить {job.id}", callback_data=f"cancel_job:{job.id}"))
+    if not status['is_running']:
+        markup.add(InlineKeyboardButton("🚀 Запустить", callback_data="run_parser"))
+    markup.add(InlineKeyboardButton("🔙 Назад", callback_data="menu"))
+    return text, markup
+
+
+def start_runs(chat_id, make_callback):
+    """Ставит в очередь все поиски чата (без сохраненных поисков - TARGET_URL из .env)"""
+    urls = [search['url'] for search in db_manager.get_searches(chat_id)] or [settings.target_url]
+    runs = []
+    for url in urls:
+        run = {}
+        run.update(parser_runner.run_parser(make_callback(run), url=url, chat_id=chat_id))
+        runs.append(run)
+    return runs
+
+
+def runs_summary(runs):
+    """Ответ на запуск: (текст, показать ли alert, задание в очереди для кнопки отмены)"""
+    failed = [run for run in runs if not run['success']]
+    if failed:
+        return failed[0]['error'], True, None
+    if all(run['duplicate'] for run in runs):
+        return "⚠️ Этот поиск уже выполняется, результат придет сюда", True, None
+
+    job = parser_runner.jobs.get(runs[0]['job_id'])
+    return f"🚀 Заданий в очереди: {len(runs)}", False, job if job and job.status == "queued" else None
+
+
+def set_autorun(chat_id, choice: str) -> str:
+    """Интервал автозапуска для всех поисков чата ("off" - выключить)"""
+    interval_min = None if choice == "off" else int(choice)
+    for url in db_manager.set_searches_interval(chat_id, interval_min):
+        autorun_scheduler.sync_url(url)
+    return f"🔄 Автозапуск каждые {interval_min} мин" if interval_min else "⏹ Автозапуск выключен"
+
+
+def autorun_view(chat_id):
+    """Меню автозапуска: интервал для всех поисков чата и время следующего запуска"""
+    searches = db_manager.get_searches(chat_id)
+    if not searches and settings.target_url:
+        # Чат без своих поисков работает с TARGET_URL из .env
+        db_manager.add_search(chat_id, settings.target_url)
+        searches = db_manager.get_searches(chat_id)
+
+    text = "🔄 <b>Автозапуск</b>\n\n"
+    if not searches:
+        text += "Нет сохраненных поисков. Добавьте их в «📝 Мои поиски»."
+        return text, settings_menu()
+
+    current_interval = searches[0]['interval_min']
+    if current_interval:
+        text += f"Интервал: {current_interval} мин, поисков: {len(searches)}\n"
+        next_runs = [job.next_run_time for job in (autorun_scheduler.get_job(s['url']) for s in searches)
+                     if job and job.next_run_time]
+        if next_runs:
+            text += f"Следующий запуск: {min(next_runs):%H:%M}\n"
+    else:
+        text += "Выключен\n"
+    text += "\nВыберите интервал:"
+    return text, autorun_menu(current_interval)
+
+
+def searches_view(chat_id):
+    """Список сохраненных поисков чата"""
+    searches = db_manager.get_searches(chat_id)
+
+    text = "📝 <b>Мои поиски</b>\n\n"
+    if not searches:
+        text += "Поисков пока нет. Новые объявления по сохраненным поискам приходят сюда."
+    for number, search in enumerate(searches, 1):
+        filters = describe_filters(search['filters'])
+        interval = f"каждые {search['interval_min']} мин" if search['interval_min'] else "вручную"
+        text += f"{number}. {search['url'][:80]}\n    {filters + ', ' if filters else ''}{interval}\n"
+    return text, searches_menu(searches)
+
+
+def add_search(chat_id, message_text: str) -> str:
+    """Сохраняет поиск из ответа на "➕ Добавить поиск", возвращает текст ответа"""
+    try:
+        parsed = parse_search_text(message_text)
+    except ValueError as e:
+        return f"❌ {e}"
+    if not parsed:
+        return "❌ Не нашел ссылку на Avito в сообщении"
+
+    url, filters = parsed
+    # Новый поиск получает интервал автозапуска остальных поисков чата
+    intervals = [search['interval_min'] for search in db_manager.get_searches(chat_id) if search['interval_min']]
+    if db_manager.add_search(chat_id, url, filters, intervals[0] if intervals else None) is None:
+        return "❌ Не удалось сохранить поиск"
+
+    autorun_scheduler.sync_url(url)
+    return "✅ Поиск сохранен"
+
+
+def delete_search(chat_id, search_id: int) -> bool:
+    url = db_manager.delete_search(chat_id, search_id)
+    if url:
+        autorun_scheduler.sync_url(url)
+    return bool(url)
+
+
+def journal_view(page: int = 1, cursor: str = None):
+    """Экран журнала объектов"""
+    db = db_manager
     total = db.get_listings_count() if hasattr(db, 'get_listings_count') else 0
 
     if total == 0:
-        bot.edit_message_text(
+        return (
             "📖 <b>Журнал пуст</b>\n\nЗапустите парсер для получения данных.",
-            chat_id, message_id,
-            reply_markup=InlineKeyboardMarkup().add(
+            InlineKeyboardMarkup().add(
                 InlineKeyboardButton("🚀 Запустить парсер", callback_data="run_parser"),
                 InlineKeyboardButton("🔙 В меню", callback_data="menu")
-            ),
-            parse_mode='HTML'
+            )
         )
-        return
 
-    listings = db.get_listings_page(page, ITEMS_PER_PAGE) if hasattr(db, 'get_listings_page') else []
+    listings = db.get_listings_page(ITEMS_PER_PAGE, cursor) if hasattr(db, 'get_listings_page') else []
     total_pages = (total + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE if total else 1
 
     text = f"📖 <b>Журнал объектов</b>\nСтраница {page}/{total_pages}\n\n"
-
-    bot.edit_message_text(
-        text + "Выберите объект для просмотра:",
-        chat_id, message_id,
-        reply_markup=journal_navigation(page, total_pages, listings),
-        parse_mode='HTML'
-    )
+    return text + "Выберите объект для просмотра:", journal_navigation(page, total_pages, listings, cursor or "")
 
 
-def show_listing_details(bot, chat_id, listing_id: int, page: int):
-    """Показывает детали объекта в новом сообщении"""
-    db = DatabaseManager()
+def listing_view(listing_id: int, page: int, cursor: str = None):
+    """Карточка объекта, None - если объект не найден"""
+    db = db_manager
     listing = db.get_listing_by_id(listing_id) if hasattr(db, 'get_listing_by_id') else None
 
     if not listing:
-        bot.answer_callback_query(chat_id, "Объект не найден", show_alert=True)
-        return
+        return None
 
     text = f"🏠 <b>{listing['title']}</b>\n\n"
     if listing.get('price'):
@@ -183,12 +336,49 @@ def show_listing_details(bot, chat_id, listing_id: int, page: int):
             desc += "..."
         text += f"\n📝 Описание:\n{desc}\n"
 
-    bot.send_message(
-        chat_id,
-        text,
-        reply_markup=listing_details(listing_id, page, listing['url']),
-        parse_mode='HTML',
-        disable_web_page_preview=True
-    )
+    return text, listing_details(listing_id, page, listing['url'], cursor or "")
 
 
+# === Отрисовка для синхронного бота ===
+
+def show_autorun(bot, chat_id, message_id):
+    text, markup = autorun_view(chat_id)
+    bot.edit_message_text(text, chat_id, message_id, reply_markup=markup, parse_mode='HTML')
+
+
+def show_searches(bot, chat_id, message_id=None):
+    text, markup = searches_view(chat_id)
+    if message_id:
+        bot.edit_message_text(text, chat_id, message_id, reply_markup=markup,
+                              parse_mode='HTML', disable_web_page_preview=True)
+    else:
+        bot.send_message(chat_id, text, reply_markup=markup, parse_mode='HTML', disable_web_page_preview=True)
+
+
+def save_search(bot, message):
+    """Ответ на "➕ Добавить поиск": ссылка и необязательный фильтр по цене"""
+    # Обработчик следующего шага вызывается вне try/except обработчика кнопок
+    try:
+        reply = add_search(message.chat.id, message.text)
+    except Exception as e:
+        logger.error(f"Ошибка сохранения поиска: {e}")
+        reply = "❌ Не удалось сохранить поиск"
+    bot.send_message(message.chat.id, reply)
+    show_searches(bot, message.chat.id)
+
+
+def show_journal(bot, chat_id, message_id, page: int = 1, cursor: str = None):
+    """Отображает журнал объектов"""
+    text, markup = journal_view(page, cursor)
+    bot.edit_message_text(text, chat_id, message_id, reply_markup=markup, parse_mode='HTML')
+
+
+def show_listing_details(bot, chat_id, listing_id: int, page: int, cursor: str = None):
+    """Показывает детали объекта в новом сообщении"""
+    view = listing_view(listing_id, page, cursor)
+    if not view:
+        bot.send_message(chat_id, "Объект не найден")
+        return
+
+    text, markup = view
+    bot.send_message(chat_id, text, reply_markup=markup, parse_mode='HTML', disable_web_page_preview=True)
@@ -0,0 +1,210 @@
+"""
+Очередь заданий парсинга с пулом потоков
+
+Каждый запуск парсера - задание с ID. Задания на один и тот же URL не
+дублируются: повторный запрос подписывается на уже queued/running задание.
+Число одновременных прогонов ограничено пулом потоков, задание можно
+отменить, а очередь сохраняется в БД (parse_jobs) и восстанавливается после
+перезапуска бота.
+"""
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from config.settings import settings
+from database.database_manager import db_manager
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Сколько завершенных заданий держать в памяти для статуса
+FINISHED_HISTORY = 50
+
+Callback = Callable[[str, str], None]
+
+
+class JobCancelled(Exception):
+    """Задание отменено во время выполнения"""
+
+
+@dataclass
+class Job:
+    id: str
+    url: str
+    chat_id: Optional[int] = None
+    status: str = QUEUED
+    progress: str = "⏳ В очереди"
+    result: Optional[dict] = None
+    created_at: float = field(default_factory=time.time)
+    restored: bool = False  # восстановлено из БД после перезапуска: подписчиков нет
+    callbacks: List[Callback] = field(default_factory=list, repr=False)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    done_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def check_cancelled(self):
+        """Точка отмены внутри прогона"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done_event.wait(timeout)
+
+
+class JobQueue:
+    def __init__(self, runner: Callable[[Job, Callback], dict], workers: int = None, db=None):
+        """runner(job, callback) выполняет задание и возвращает словарь с результатом"""
+        self.runner = runner
+        self.workers = max(1, workers or settings.job_workers)
+        self.db = db or db_manager
+        self.notify: Optional[Callable[[int, str], None]] = None
+
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._jobs: Dict[str, Job] = {}
+        self._active_by_url: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._listeners: List[Callable[[Job], None]] = []
+
+    def add_listener(self, listener: Callable[[Job], None]):
+        """listener(job) вызывается после завершения каждого задания (в потоке пула)"""
+        self._listeners.append(listener)
+
+    def start(self, notify: Callable[[int, str], None] = None):
+        """
+        Запускает потоки и возвращает в очередь задания, прерванные перезапуском.
+        notify(chat_id, text) - отчет в чат для заданий без подписчиков (восстановленных).
+        """
+        self.notify = notify
+        self._ensure_workers()
+        restored = 0
+        for row in self.db.get_unfinished_jobs():
+            job, created = self.submit(row["url"], row["chat_id"], job_id=row["id"], restored=True)
+            restored += created
+        if restored:
+            logger.info(f"[Jobs] Восстановлено заданий из БД: {restored}")
+
+    def submit(self, url: str, chat_id: int = None, callback: Callback = None,
+               job_id: str = None, restored: bool = False) -> Tuple[Job, bool]:
+        """
+        Ставит задание в очередь. Если по этому URL уже есть активное задание,
+        подписывает callback на него. Возвращает (задание, создано ли новое).
+        """
+        with self._lock:
+            job = self._active_by_url.get(url)
+            if job:
+                if callback:
+                    job.callbacks.append(callback)
+                return job, False
+
+            job = Job(id=job_id or uuid.uuid4().hex[:8], url=url, chat_id=chat_id, restored=restored)
+            if callback:
+                job.callbacks.append(callback)
+            self._jobs[job.id] = job
+            self._active_by_url[url] = job
+
+        self._persist(job)
+        self._ensure_workers()
+        self._queue.put(job)
+        logger.info(f"[Jobs] Задание {job.id} в очереди (позиция {self._queue.qsize()}): {url}")
+        return job, True
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет задание: из очереди - сразу, выполняемое - на ближайшей точке отмены"""
+        job = self._jobs.get(job_id)
+        if not job or not job.is_active:
+            return False
+
+        job.cancel_event.set()
+        with self._lock:
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED, "⏹ Отменено")
+                job.done_event.set()
+        logger.info(f"[Jobs] Задание {job_id} отменено")
+        return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def active_jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._active_by_url.values())
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                # Отмененное в очереди задание уже завершено
+                if job.status != QUEUED:
+                    continue
+                job.status = RUNNING
+            self._persist(job)
+
+            try:
+                result = self.runner(job, lambda status, message: self._emit(job, status, message))
+            except Exception as e:
+                logger.error(f"[Jobs] Задание {job.id} упало: {e}")
+                result = {"success": False, "error": str(e)}
+
+            with self._lock:
+                job.result = result
+                if result.get("cancelled"):
+                    self._finish(job, CANCELLED, "⏹ Отменено")
+                else:
+                    self._finish(job, DONE if result.get("success") else FAILED, job.progress)
+
+            for listener in self._listeners:
+                try:
+                    listener(job)
+                except Exception as e:
+                    logger.error(f"[Jobs] Ошибка обработчика завершения задания {job.id}: {e}")
+            # Ожидающие задание видят результат уже разосланным
+            job.done_event.set()
+
+    def _emit(self, job: Job, status: str, message: str):
+        """Прогресс задания: сохраняется и рассылается подписчикам"""
+        job.progress = message
+        self._persist(job)
+
+        callbacks = list(job.callbacks)
+        if job.restored and status in ("completed", "error") and self.notify and job.chat_id:
+            callbacks.append(lambda _, text: self.notify(job.chat_id, text))
+
+        for callback in callbacks:
+            try:
+                callback(status, message)
+            except Exception as e:
+                logger.error(f"[Jobs] Ошибка отправки прогресса задания {job.id}: {e}")
+
+    def _finish(self, job: Job, status: str, progress: str):
+        """Вызывается под self._lock"""
+        job.status = status
+        job.progress = progress
+        if self._active_by_url.get(job.url) is job:
+            del self._active_by_url[job.url]
+        self._persist(job)
+
+        finished = [j for j in self._jobs.values() if not j.is_active]
+        for old in finished[:-FINISHED_HISTORY]:
+            del self._jobs[old.id]
+
+    def _persist(self, job: Job):
+        self.db.save_job(job.id, job.url, job.chat_id, job.status, job.progress, job.result)
@@ -22,28 +22,33 @@ def main_menu() -> InlineKeyboardMarkup:
     return markup
 
 
-def journal_navigation(current_page: int, total_pages: int, listings: list) -> InlineKeyboardMarkup:
-    """Навигация по журналу с кнопками объектов"""
+def journal_navigation(current_page: int, total_pages: int, listings: list, cursor: str = "") -> InlineKeyboardMarkup:
+    """
+    Навигация по журналу с кнопками объектов.
+    Колбэки несут курсор keyset-пагинации: journal:<страница>:<a|b><id>
+    """
     markup = InlineKeyboardMarkup(row_width=1)
 
     for listing in listings:
         btn_text = f"🏠 {listing['title'][:40]}... - {listing['price']}"
         markup.add(InlineKeyboardButton(
             btn_text,
-            callback_data=f"view:{listing['id']}:{current_page}"
+            callback_data=f"view:{listing['id']}:{current_page}:{cursor}"
         ))
 
     nav_buttons = []
     if current_page > 1:
-        nav_buttons.append(InlineKeyboardButton("⬅️", callback_data=f"journal:{current_page-1}"))
+        # На первую страницу возвращаемся без курсора, чтобы увидеть новые объекты
+        prev_cursor = f"b{listings[0]['id']}" if current_page > 2 and listings else ""
+        nav_buttons.append(InlineKeyboardButton("⬅️", callback_data=f"journal:{current_page-1}:{prev_cursor}"))
 
     nav_buttons.append(InlineKeyboardButton(
         f"{current_page}/{total_pages}",
         callback_data="noop"
     ))
 
-    if current_page < total_pages:
-        nav_buttons.append(InlineKeyboardButton("➡️", callback_data=f"journal:{current_page+1}"))
+    if current_page < total_pages and listings:
+        nav_buttons.append(InlineKeyboardButton("➡️", callback_data=f"journal:{current_page+1}:a{listings[-1]['id']}"))
 
     if nav_buttons:
         markup.add(*nav_buttons)
@@ -52,24 +57,63 @@ def journal_navigation(current_page: int, total_pages: int, listings: list) -> I
     return markup
 
 
-def listing_details(listing_id: int, page: int, url: str) -> InlineKeyboardMarkup:
+def listing_details(listing_id: int, page: int, url: str, cursor: str = "") -> InlineKeyboardMarkup:
     """Кнопки для детальной карточки"""
     markup = InlineKeyboardMarkup(row_width=1)
     markup.add(
         InlineKeyboardButton("🔗 Открыть на Avito", url=url),
-        InlineKeyboardButton("🔙 Назад к списку", callback_data=f"back_journal:{page}")
+        InlineKeyboardButton("🔙 Назад к списку", callback_data=f"back_journal:{page}:{cursor}")
     )
     return markup
 
 
+def job_cancel(job_id: str) -> InlineKeyboardMarkup:
+    """Кнопка отмены задания парсинга"""
+    markup = InlineKeyboardMarkup()
+    if job_id:
+        markup.add(InlineKeyboardButton("⏹ Отменить", callback_data=f"cancel_job:{job_id}"))
+    return markup
+
+
 def settings_menu() -> InlineKeyboardMarkup:
     """Меню настроек"""
     markup = InlineKeyboardMarkup(row_width=1)
     markup.add(
         InlineKeyboardButton("🔄 Автозапуск", callback_data="autorun_menu"),
-        InlineKeyboardButton("📝 Изменить URL", callback_data="change_url"),
+        InlineKeyboardButton("📝 Мои поиски", callback_data="change_url"),
         InlineKeyboardButton("🔙 Назад", callback_data="menu")
     )
     return markup
 
 
+
+
+AUTORUN_INTERVALS = (15, 30, 60, 180)
+
+
+def autorun_menu(current_interval: int = None) -> InlineKeyboardMarkup:
+    """Выбор интервала автозапуска (в минутах), текущий отмечен галочкой"""
+    markup = InlineKeyboardMarkup(row_width=2)
+    markup.add(*[
+        InlineKeyboardButton(
+            f"{'✅ ' if minutes == current_interval else ''}{minutes} мин",
+            callback_data=f"autorun:{minutes}"
+        )
+        for minutes in AUTORUN_INTERVALS
+    ])
+    if current_interval:
+        markup.add(InlineKeyboardButton("⏹ Выключить", callback_data="autorun:off"))
+    markup.add(InlineKeyboardButton("🔙 Назад", callback_data="settings"))
+    return markup
+
+
+def searches_menu(searches: list) -> InlineKeyboardMarkup:
+    """Сохраненные поиски чата: удаление и добавление"""
+    markup = InlineKeyboardMarkup(row_width=1)
+    for number, search in enumerate(searches, 1):
+        markup.add(InlineKeyboardButton(f"🗑 Удалить поиск {number}", callback_data=f"search_del:{search['id']}"))
+    markup.add(
+        InlineKeyboardButton("➕ Добавить поиск", callback_data="search_add"),
+        InlineKeyboardButton("🔙 Назад", callback_data="settings")
+    )
+    return markup
@@ -0,0 +1,240 @@
+"""
+Рассылка новых объявлений в Telegram
+
+Парсер только кладет объявления в очередь (enqueue не блокирует), отправкой
+занимается отдельный поток. Объявления одного чата копятся NOTIFY_BATCH_SEC
+секунд и уходят одним сообщением или альбомом (media group) до
+NOTIFY_BATCH_SIZE штук. Лимиты Telegram соблюдаются корзинами токенов:
+общей на бота и отдельной на каждый чат. На 429 чат откладывается на
+retry_after секунд, и сообщение отправляется повторно.
+"""
+import html
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+from loguru import logger
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InputMediaPhoto
+
+from config.settings import settings
+from utils.rate_limit import TokenBucket
+
+# Ограничения Telegram на длину текста и подписи к альбому
+MESSAGE_LIMIT = 4096
+CAPTION_LIMIT = 1024
+MAX_ATTEMPTS = 5
+
+
+@dataclass
+class Outgoing:
+    chat_id: int
+    text: str
+    photos: List[str] = field(default_factory=list)
+    attempts: int = 0
+
+
+def format_listing_line(listing: dict) -> str:
+    title = html.escape(listing.get("title") or "Без названия")
+    price = f" — {html.escape(listing['price'])}" if listing.get("price") else ""
+    return f"• <a href=\"{html.escape(listing['url'])}\">{title}</a>{price}"
+
+
+def build_messages(chat_id: int, listings: List[dict], batch_size: int, media: bool) -> List[Outgoing]:
+    """Разбивает объявления на сообщения: альбом с подписью-списком или текст"""
+    messages = []
+    for start in range(0, len(listings), batch_size):
+        batch = listings[start:start + batch_size]
+        header = f"🆕 <b>Новые объявления: {len(batch)}</b>\n\n"
+        lines = [format_listing_line(listing) for listing in batch]
+        photos = [listing["images"][0] for listing in batch if listing.get("images")] if media else []
+
+        limit = CAPTION_LIMIT if photos else MESSAGE_LIMIT
+        text = header
+        for number, line in enumerate(lines):
+            if len(text) + len(line) + 1 > limit:
+                text += f"\n…и еще {len(lines) - number}"
+                break
+            text += line + "\n"
+        messages.append(Outgoing(chat_id, text.rstrip(), photos))
+    return messages
+
+
+class Notifier:
+    def __init__(self, batch_sec: float = None, batch_size: int = None,
+                 global_rate: float = None, chat_rate: float = None, media: bool = None):
+        self.batch_sec = settings.notify_batch_sec if batch_sec is None else batch_sec
+        self.batch_size = max(1, min(10, batch_size or settings.notify_batch_size))
+        self.media = settings.notify_media if media is None else media
+        self.global_bucket = TokenBucket(global_rate or settings.notify_global_rate)
+        self.chat_rate = chat_rate or settings.notify_chat_rate
+
+        self.bot = None
+        self._incoming: "queue.Queue" = queue.Queue()
+        self._pending: Dict[int, List[dict]] = {}       # чат -> объявления в окне батча
+        self._pending_since: Dict[int, float] = {}
+        self._outbox: Deque[Outgoing] = deque()
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._chat_blocked_until: Dict[int, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.stats = {"sent": 0, "listings": 0, "retries": 0, "dropped": 0}
+
+    def start(self, bot):
+        self.bot = bot
+        if not self._thread or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Останавливает поток, стараясь отправить накопленное"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def enqueue(self, chat_id: int, listings: List[dict]):
+        """Новые объявления для чата. Не блокирует вызывающий поток."""
+        if listings:
+            self._incoming.put(("listings", chat_id, list(listings)))
+
+    def send_text(self, chat_id: int, text: str):
+        """Произвольное сообщение через те же лимиты (отчеты заданий и т.п.)"""
+        self._incoming.put(("text", chat_id, text))
+
+    def _run(self):
+        while not (self._stopped.is_set() and self._incoming.empty() and not self._pending and not self._outbox):
+            self._drain_incoming(timeout=self._next_wakeup())
+            self._flush_batches(force=self._stopped.is_set())
+            self._send_ready()
+
+    def _next_wakeup(self) -> float:
+        """
+        Сколько ждать новых объявлений до следующего круга: до ближайшего окна батча
+        или до момента, когда первое сообщение какого-то чата пропустят лимиты
+        (конец паузы после 429, токен чата и общей корзины). Новые объявления будят раньше.
+        """
+        if not self._outbox and not self._pending_since:
+            return 0.5
+
+        now = time.monotonic()
+        wakeups = []
+        if self._pending_since:
+            wakeups.append(min(self._pending_since.values()) + self.batch_sec - now)
+
+        chats = set()
+        for message in self._outbox:
+            if message.chat_id in chats:
+                continue
+            chats.add(message.chat_id)
+            bucket = self._chat_buckets.get(message.chat_id)
+            cost = min(self.global_bucket.capacity, max(1, len(message.photos)))
+            wakeups.append(max(self._chat_blocked_until.get(message.chat_id, 0) - now,
+                               bucket.delay() if bucket else 0.0,
+                               self.global_bucket.delay(cost)))
+        # Не чаще раза в 50 мс: сообщение, которое не ушло без паузы, повторяется следующим кругом
+        return max(0.05 if self._outbox else 0.0, min(wakeups))
+
+    def _drain_incoming(self, timeout: float):
+        try:
+            item = self._incoming.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while item:
+            kind, chat_id, payload = item
+            if kind == "text":
+                self._outbox.append(Outgoing(chat_id, payload))
+            else:
+                self._pending.setdefault(chat_id, []).extend(payload)
+                self._pending_since.setdefault(chat_id, time.monotonic())
+            try:
+                item = self._incoming.get_nowait()
+            except queue.Empty:
+                item = None
+
+    def _flush_batches(self, force: bool = False):
+        now = time.monotonic()
+        for chat_id in list(self._pending):
+            listings = self._pending[chat_id]
+            if force or len(listings) >= self.batch_size or now - self._pending_since[chat_id] >= self.batch_sec:
+                del self._pending[chat_id]
+                del self._pending_since[chat_id]
+                self._outbox.extend(build_messages(chat_id, listings, self.batch_size, self.media))
+                self.stats["listings"] += len(listings)
+
+    def _send_ready(self):
+        """Отправляет все сообщения, которые пропускают лимиты; остальные ждут следующего круга"""
+        now = time.monotonic()
+        waiting: Deque[Outgoing] = deque()
+        busy_chats = set()
+        while self._outbox:
+            message = self._outbox.popleft()
+            chat_id = message.chat_id
+            # Порядок сообщений внутри чата сохраняется
+            if chat_id in busy_chats or self._chat_blocked_until.get(chat_id, 0) > now:
+                busy_chats.add(chat_id)
+                waiting.append(message)
+                continue
+
+            bucket = self._chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate, capacity=1))
+            # Токен чата проверяется без списания, чтобы не терять его, если занята общая корзина
+            cost = min(self.global_bucket.capacity, max(1, len(message.photos)))
+            if bucket.delay() or self.global_bucket.try_acquire(cost):
+                busy_chats.add(chat_id)
+                waiting.append(message)
+                continue
+
+            bucket.try_acquire()
+            if not self._deliver(message):
+                busy_chats.add(chat_id)
+                waiting.append(message)
+        self._outbox = waiting
+
+    def _deliver(self, message: Outgoing) -> bool:
+        """True - сообщение обработано (отправлено или отброшено), False - повторить позже"""
+        if not self.bot:
+            return False
+        try:
+            if len(message.photos) > 1:
+                media = [InputMediaPhoto(url) for url in message.photos[:10]]
+                media[0] = InputMediaPhoto(message.photos[0], caption=message.text, parse_mode='HTML')
+                self.bot.send_media_group(message.chat_id, media)
+            elif message.photos:
+                self.bot.send_photo(message.chat_id, message.photos[0], caption=message.text, parse_mode='HTML')
+            else:
+                self.bot.send_message(message.chat_id, message.text, parse_mode='HTML',
+                                      disable_web_page_preview=True)
+            self.stats["sent"] += 1
+            return True
+        except ApiTelegramException as e:
+            message.attempts += 1
+            if e.error_code == 429:
+                retry_after = (e.result_json or {}).get("parameters", {}).get("retry_after", 5)
+                self._chat_blocked_until[message.chat_id] = time.monotonic() + retry_after
+                self.stats["retries"] += 1
+                logger.warning(f"[Notifier] 429 для чата {message.chat_id}, повтор через {retry_after} с")
+                return message.attempts >= MAX_ATTEMPTS and self._drop(message, e)
+            if message.photos:
+                # Telegram не смог загрузить фото - отправляем тем же текстом без альбома
+                logger.warning(f"[Notifier] Альбом для чата {message.chat_id} не отправлен ({e}), шлем текстом")
+                message.photos = []
+                return False
+            return self._drop(message, e)
+        except Exception as e:
+            message.attempts += 1
+            if message.attempts >= MAX_ATTEMPTS:
+                return self._drop(message, e)
+            self._chat_blocked_until[message.chat_id] = time.monotonic() + 2 ** message.attempts
+            logger.warning(f"[Notifier] Ошибка отправки в чат {message.chat_id}: {e}, повтор")
+            return False
+
+    def _drop(self, message: Outgoing, error: Exception) -> bool:
+        self.stats["dropped"] += 1
+        logger.error(f"[Notifier] Сообщение для чата {message.chat_id} отброшено: {error}")
+        return True
+
+
+# Глобальный экземпляр
+notifier = Notifier()
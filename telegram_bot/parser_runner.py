@@ -1,7 +1,6 @@
 """
-Интеграция с парсером - безопасный запуск в потоке
+Интеграция с парсером - запуск через очередь заданий
 """
-import threading
 import time
 from pathlib import Path
 import sys
@@ -10,107 +9,184 @@ from loguru import logger
 # Добавляем корневую директорию в путь для импортов
 sys.path.append(str(Path(__file__).parent.parent))
 
-from database.database_manager import DatabaseManager
+from database.database_manager import db_manager
 from core.playwright_parser import PlaywrightParser
 from services.avito_processor import AvitoProcessor
+from services.catalog_crawler import CatalogCrawler
+from services.page_cache import PageCache
 from config.settings import settings
+from utils import metrics
+from .job_queue import JobQueue, JobCancelled
 
 
 class ParserRunner:
     def __init__(self):
-        self.is_running = False
         self.last_run = None
         self.last_result = None
+        # Один парсер на процесс бота: браузеры берутся из общего пула и остаются прогретыми
+        self.parser = PlaywrightParser()
+        self.jobs = JobQueue(self._execute)
 
-    def run_parser(self, callback=None):
+    @property
+    def is_running(self) -> bool:
+        return bool(self.jobs.active_jobs())
+
+    def run_parser(self, callback=None, url=None, chat_id=None):
         """
-        Запускает парсер в отдельном потоке
+        Ставит прогон парсера в очередь заданий
         callback(status, message) - функция для отправки статуса в бот
         """
-        if self.is_running:
-            return {"success": False, "error": "Парсер уже работает"}
-
-        def _run():
-            self.is_running = True
-            start_time = time.time()
-
-            try:
-                if callback:
-                    callback("started", "🚀 Парсер запущен, загружаю страницу...")
+        url = url or settings.target_url
+        if not url:
+            return {"success": False, "error": "Не задан URL для парсинга"}
 
-                db = DatabaseManager()
-                count_before = db.get_listings_count() if hasattr(db, 'get_listings_count') else 0
+        job, created = self.jobs.submit(url, chat_id, callback)
+        return {
+            "success": True,
+            "job_id": job.id,
+            "duplicate": not created,
+            "message": "Парсер запущен" if created else "Этот поиск уже выполняется"
+        }
 
-                parser = PlaywrightParser()
-                url = settings.target_url
-                html = parser.parse(url)
+    def cancel(self, job_id):
+        return self.jobs.cancel(job_id)
 
-                if not html:
-                    raise Exception("Не удалось загрузить страницу (возможна блокировка)")
+    def _execute(self, job, callback):
+        return self.scrape(job.url, callback, job)
 
-                if callback:
-                    callback("processing", "📝 Обрабатываю данные...")
+    def scrape(self, url, callback=None, job=None):
+        """
+        Один проход парсера по URL в текущем потоке (ручной запуск и автозапуск).
+        job - задание очереди, между этапами проверяется его отмена.
+        Возвращает словарь с результатом и временем этапов (timings),
+        он же сохраняется в last_result.
+        """
+        with metrics.run_timer("bot") as timings:
+            result = self._scrape(url, callback, job)
+        result["timings"] = timings.as_dict()
 
-                processor = AvitoProcessor(settings.target_url)
-                listings = processor.process_html(html)
+        # Одновременные прогоны (автозапуск) не смешивают результаты: каждый возвращает свой
+        self.last_result = result
+        return result
 
-                added = 0
-                for listing in listings:
-                    if db.add_listing(listing):
-                        added += 1
+    def _scrape(self, url, callback=None, job=None):
+        start_time = time.time()
 
-                count_after = db.get_listings_count() if hasattr(db, 'get_listings_count') else 0
-                elapsed = round(time.time() - start_time, 1)
+        try:
+            if callback:
+                callback("started", "🚀 Парсер запущен, загружаю страницу...")
 
-                self.last_run = time.time()
-                self.last_result = {
-                    "success": True,
-                    "found": len(listings),
-                    "added": added,
-                    "total": count_after,
-                    "elapsed": elapsed
-                }
+            db = db_manager
+            processor = AvitoProcessor(url)
+            page_cache = PageCache(db)
 
-                if callback:
+            if settings.crawl_enabled:
+                pages, found, added_urls = self._crawl(url, processor, db, job, callback, page_cache)
+                if not pages and not page_cache.hits:
+                    raise Exception("Не удалось загрузить страницу (возможна блокировка)")
+            else:
+                cached = page_cache.fetch(self.parser, url)
+                if job:
+                    job.check_cancelled()
+
+                if cached.unchanged:
+                    pages, found, added_urls = 0, 0, []
+                else:
+                    if not cached.html:
+                        raise Exception("Не удалось загрузить страницу (возможна блокировка)")
+
+                    if callback:
+                        callback("processing", "📝 Обрабатываю данные...")
+
+                    listings = processor.process_html(cached.html)
+                    pages, found = 1, len(listings)
+
+                    added_urls = db.add_listings(listings)[0]
+                    page_cache.commit(cached)
+
+            count_after = db.get_listings_count() if hasattr(db, 'get_listings_count') else 0
+            elapsed = round(time.time() - start_time, 1)
+
+            result = {
+                "success": True,
+                "pages": pages,
+                "found": found,
+                "added": len(added_urls),
+                "added_urls": added_urls,
+                "total": count_after,
+                "elapsed": elapsed,
+                "cache_hits": page_cache.hits,
+                "cache_misses": page_cache.misses
+            }
+            self.last_run = time.time()
+            metrics.count_listings(found=found, added=len(added_urls))
+
+            if callback:
+                message = (
+                    f"✅ <b>Парсинг завершен</b>\n\n"
+                    f"📄 Страниц: {pages}\n"
+                    f"📦 Найдено: {found}\n"
+                    f"➕ Добавлено новых: {len(added_urls)}\n"
+                    f"📊 Всего в базе: {count_after}\n"
+                    f"♻️ Без изменений (кэш): {page_cache.hits}, загружено заново: {page_cache.misses}\n"
+                    f"⏱ Время: {elapsed} сек"
+                )
+                callback("completed", message)
+
+        except JobCancelled:
+            logger.info(f"Парсинг отменен: {url}")
+            result = {
+                "success": False,
+                "cancelled": True,
+                "error": "Отменено"
+            }
+            if callback:
+                callback("cancelled", "⏹ Парсинг отменен")
+
+        except Exception as e:
+            logger.error(f"Ошибка парсинга: {e}")
+            result = {
+                "success": False,
+                "error": str(e)
+            }
+            if callback:
+                error_msg = str(e)
+                if "429" in error_msg or "rate" in error_msg.lower():
                     message = (
-                        f"✅ <b>Парсинг завершен</b>\n\n"
-                        f"📦 Найдено: {len(listings)}\n"
-                        f"➕ Добавлено новых: {added}\n"
-                        f"📊 Всего в базе: {count_after}\n"
-                        f"⏱ Время: {elapsed} сек"
+                        "⚠️ <b>Avito временно заблокировал доступ</b>\n\n"
+                        "Это происходит при частых запросах.\n"
+                        "Попробуйте через 10-15 минут или используйте VPN."
                     )
-                    callback("completed", message)
-
-            except Exception as e:
-                logger.error(f"Ошибка парсинга: {e}")
-                self.last_result = {
-                    "success": False,
-                    "error": str(e)
-                }
-                if callback:
-                    error_msg = str(e)
-                    if "429" in error_msg or "rate" in error_msg.lower():
-                        message = (
-                            "⚠️ <b>Avito временно заблокировал доступ</b>\n\n"
-                            "Это происходит при частых запросах.\n"
-                            "Попробуйте через 10-15 минут или используйте VPN."
-                        )
-                    else:
-                        message = f"❌ Ошибка парсинга:\n<code>{error_msg[:200]}</code>"
-                    callback("error", message)
-            finally:
-                self.is_running = False
-
-        thread = threading.Thread(target=_run, daemon=True)
-        thread.start()
-        return {"success": True, "message": "Парсер запущен"}
+                else:
+                    message = f"❌ Ошибка парсинга:\n<code>{error_msg[:200]}</code>"
+                callback("error", message)
+
+        return result
+
+    def _crawl(self, url, processor, db, job=None, callback=None, page_cache=None):
+        """Обход нескольких страниц выдачи, каждая страница пишется в БД по мере загрузки"""
+        crawler = CatalogCrawler(lambda: self.parser, processor, page_cache=page_cache)
+        pages = found = 0
+        added_urls = []
+        for page in crawler.crawl(url):
+            if job:
+                job.check_cancelled()
+            if not page.html:
+                continue
+            pages += 1
+            found += len(page.listings)
+            added_urls += db.add_listings(page.listings)[0]
+            if callback:
+                callback("progress", f"📄 Обработано страниц: {pages}, найдено: {found}")
+        return pages, found, added_urls
 
     def get_status(self):
         """Возвращает статус парсера"""
-        db = DatabaseManager()
+        db = db_manager
         total = db.get_listings_count() if hasattr(db, 'get_listings_count') else 0
 
-        status = "🟢 Работает" if self.is_running else "⏸ Ожидает"
+        jobs = self.jobs.active_jobs()
+        status = f"🟢 Работает (заданий: {len(jobs)})" if jobs else "⏸ Ожидает"
 
         last_run_text = "Никогда"
         if self.last_run:
@@ -127,7 +203,8 @@ class ParserRunner:
             "status": status,
             "total": total,
             "last_run": last_run_text,
-            "is_running": self.is_running
+            "is_running": bool(jobs),
+            "jobs": jobs
         }
 
 
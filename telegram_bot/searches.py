@@ -0,0 +1,122 @@
+"""
+Сохраненные поиски чатов и рассылка результатов (fan-out)
+
+Поиск - это URL выдачи Avito, фильтры по цене и интервал автозапуска,
+привязанные к чату. Одинаковые URL разных чатов парсятся одним заданием
+очереди, а новые объявления раздаются всем подписчикам этого URL с учетом
+их фильтров. Стоимость цикла растет с числом уникальных поисков, а не
+с числом пользователей.
+"""
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+from database.database_manager import db_manager
+from .parser_runner import parser_runner
+
+SEARCH_URL_RE = re.compile(r'https?://(?:www\.|m\.)?avito\.ru/\S+')
+PRICE_BOUND_RE = re.compile(r'\b(от|до)\b', re.IGNORECASE)
+# Цена в рублях: цифры с пробелами между разрядами, необязательно "₽" или "руб"
+PRICE_VALUE_RE = re.compile(r'(\d[\d\s]*?)\s*(?:₽|руб\.?)?', re.IGNORECASE)
+
+
+def parse_search_text(text: str) -> Optional[Tuple[str, dict]]:
+    """
+    Разбирает сообщение "<ссылка> [от N] [до M]" в (url, фильтры).
+    None - если в тексте нет ссылки на Avito; ValueError (с текстом для
+    пользователя) - если цена после "от"/"до" не указана или не число.
+    """
+    match = SEARCH_URL_RE.search(text or "")
+    if not match:
+        return None
+
+    filters = {}
+    rest = (text[:match.start()] + " " + text[match.end():]).strip()
+    bounds = list(PRICE_BOUND_RE.finditer(rest))
+    for index, bound in enumerate(bounds):
+        end = bounds[index + 1].start() if index + 1 < len(bounds) else len(rest)
+        value = rest[bound.end():end].strip()
+        price = PRICE_VALUE_RE.fullmatch(value)
+        if not value:
+            raise ValueError(f"После «{bound.group(0)}» не указана цена, например «до 40000»")
+        if not price:
+            raise ValueError(f"Не понял цену «{bound.group(0)} {value}»: укажите число рублей, "
+                             f"например «до 40000»")
+        key = "min_price" if bound.group(1).lower() == "от" else "max_price"
+        filters[key] = int(re.sub(r'\s', '', price.group(1)))
+
+    if filters.get("min_price", 0) > filters.get("max_price", float("inf")):
+        raise ValueError("Цена «от» больше цены «до»")
+    return match.group(0), filters
+
+
+def matches_filters(listing: dict, filters: dict) -> bool:
+    """Проверка объекта по фильтрам поиска (цены в рублях, price_value - в копейках)"""
+    price_value = listing.get("price_value")
+    if filters.get("min_price") is not None and (price_value is None or price_value < filters["min_price"] * 100):
+        return False
+    if filters.get("max_price") is not None and (price_value is None or price_value > filters["max_price"] * 100):
+        return False
+    return True
+
+
+def describe_filters(filters: dict) -> str:
+    parts = []
+    if filters.get("min_price") is not None:
+        parts.append(f"от {filters['min_price']:,} ₽".replace(',', ' '))
+    if filters.get("max_price") is not None:
+        parts.append(f"до {filters['max_price']:,} ₽".replace(',', ' '))
+    return ", ".join(parts)
+
+
+class SearchFanout:
+    def __init__(self, jobs, db=None):
+        """jobs - очередь заданий (JobQueue), по завершении задания результаты раздаются подписчикам"""
+        self.jobs = jobs
+        self.db = db or db_manager
+        self.send: Optional[Callable[[int, List[dict]], None]] = None
+        jobs.add_listener(self.deliver)
+
+    def start(self, send: Callable[[int, List[dict]], None]):
+        """send(chat_id, listings) - постановка новых объявлений в рассылку (не должна блокировать)"""
+        self.send = send
+
+    def run_cycle(self, urls: Iterable[str] = None) -> Dict[str, dict]:
+        """
+        Один цикл: каждый уникальный URL из сохраненных поисков (или из urls) парсится
+        одним заданием. Блокирует до завершения, возвращает url -> результат.
+        """
+        urls = set(urls) if urls is not None else set(self.db.get_search_subscribers())
+        logger.info(f"[Searches] Цикл: уникальных URL {len(urls)}")
+
+        submitted = {url: self.jobs.submit(url)[0] for url in urls}
+        results = {}
+        for url, job in submitted.items():
+            job.wait()
+            results[url] = job.result or {"success": False, "error": job.progress}
+        return results
+
+    def deliver(self, job):
+        """Раздает новые объявления завершенного задания всем чатам, следящим за его URL"""
+        result = job.result or {}
+        added_urls = result.get("added_urls")
+        if not result.get("success") or not added_urls or not self.send:
+            return
+
+        searches = self.db.get_search_subscribers(job.url).get(job.url, [])
+        if not searches:
+            return
+
+        new_listings = self.db.get_listings_by_urls(added_urls)
+        delivered = 0
+        for search in searches:
+            matched = [listing for listing in new_listings if matches_filters(listing, search["filters"])]
+            if matched:
+                self.send(search["chat_id"], matched)
+                delivered += 1
+
+        logger.info(f"[Searches] {job.url}: новых {len(new_listings)}, уведомлено чатов {delivered}/{len(searches)}")
+
+
+# Глобальный экземпляр поверх очереди заданий бота
+search_fanout = SearchFanout(parser_runner.jobs)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Проверка асинхронного curl на локальном стенде: пачка страниц, 304 и переиспользование сессий"""
+
+import threading
+
+from benchmarks.corpus import synthetic_pages
+from benchmarks.stand_in import serve_pages
+from core.async_curl_parser import AsyncCurlEngine, AsyncCurlParser
+from services.browser_profiles_2025 import get_profile_by_name
+from services.rate_controller import RateController
+
+PATH = "/moskva/tovary_dlya_kompyutera"
+
+
+def test_parse_many_and_conditional_fetch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # cookies/ создается в рабочем каталоге
+    corpus = synthetic_pages(count=4, items=10)
+    engine = AsyncCurlEngine(concurrency=4, controller=RateController(mode="off"))
+    parser = AsyncCurlParser(engine)
+    try:
+        with serve_pages(corpus) as base_url:
+            urls = [f"{base_url}{PATH}?p={number}" for number in range(1, 6)]
+            pages = parser.parse_many(urls)
+
+            assert [url for url, html in pages.items() if html] == urls[:4]
+            assert pages[urls[4]] is None  # за последней страницей стенд отвечает 404
+            assert all(pages[url] == html for url, (_, html) in zip(urls, corpus))
+
+            # Одна страница из нескольких потоков через общий цикл движка
+            profile = get_profile_by_name("Chrome Windows")
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(parser.parse(urls[0], profile=profile)))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == [corpus[0][1]] * 4
+
+            first = parser.fetch(urls[0], profile=profile)
+            assert first.etag
+            again = parser.fetch(urls[0], etag=first.etag, profile=profile)
+            assert again.not_modified and again.html is None
+
+        # Сессии живут по одной на связку профиль/прокси
+        assert "Chrome Windows|direct" in engine._sessions
+        assert len(engine._sessions) <= 5
+    finally:
+        engine.shutdown()
+    assert not engine._thread.is_alive()
+
+
+def test_session_picks_up_store_updates(tmp_path):
+    from services.session_store import session_store
+
+    corpus = synthetic_pages(count=1, items=10)
+    engine = AsyncCurlEngine(concurrency=2, controller=RateController(mode="off"))
+    parser = AsyncCurlParser(engine)
+    profile = get_profile_by_name("Chrome Windows")
+    try:
+        with serve_pages(corpus) as base_url:
+            url = f"{base_url}{PATH}"
+            assert parser.parse(url, profile=profile)
+
+            # Браузер того же профиля получил новую cookie - долгоживущая сессия движка ее видит
+            session_store.update(profile["name"], [{
+                "name": "sessid", "value": "from-browser", "domain": "127.0.0.1", "path": "/",
+                "expires": -1, "httpOnly": True, "secure": False, "sameSite": "Lax"}])
+            assert parser.parse(url, profile=profile)
+            session = engine._sessions["Chrome Windows|direct"]
+            assert session.cookies.get("sessid", domain="127.0.0.1") == "from-browser"
+    finally:
+        engine.shutdown()
+
+
+def test_missing_page_is_reported():
+    controller = RateController(mode="local", initial_rate=100, max_rate=1000, increase=1)
+    engine = AsyncCurlEngine(concurrency=1, controller=controller)
+    try:
+        with serve_pages(synthetic_pages(count=1, items=10)) as base_url:
+            result = AsyncCurlParser(engine).fetch(f"{base_url}{PATH}?p=2")
+        # 404 - ответ сервера, а не сбой: темп связки растет, как после обычного ответа
+        assert result.html is None and result.status == 404
+        assert [state["rate"] for state in controller.stats()] == [101]
+    finally:
+        engine.shutdown()
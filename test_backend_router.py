@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Проверка выбора бэкенда HybridParser по статистике загрузок"""
+
+import core.hybrid_parser
+from benchmarks.corpus import make_items, render_catalog_page
+from config.settings import settings
+from core.hybrid_parser import HybridParser
+from database.database_manager import DatabaseManager
+from services.backend_router import BackendRouter, url_class
+
+URL = "https://www.avito.ru/moskva/tovary_dlya_kompyutera/komplektuyuschie/videokarty?p=2"
+BLOCKED = "<html>Доступ с Вашего IP временно ограничен</html>"
+
+
+class Clock:
+    """Часы HybridParser, которые двигают фейковые бэкенды"""
+    now = 0.0
+
+    def time(self):
+        return self.now
+
+
+class FakeBackend:
+    """Отдает заданную страницу за заданное время и считает вызовы"""
+
+    def __init__(self, clock, html, latency):
+        self.clock = clock
+        self.html = html
+        self.latency = latency
+        self.calls = 0
+
+    def parse(self, url, profile=None):
+        self.calls += 1
+        self.clock.now += self.latency
+        return self.html
+
+
+def make_parser(router, monkeypatch, curl, playwright):
+    """curl и playwright - пары (страница, время загрузки)"""
+    clock = Clock()
+    monkeypatch.setattr(core.hybrid_parser, "time", clock)
+    parser = HybridParser(router=router)
+    parser.curl_parser = FakeBackend(clock, *curl)
+    parser._playwright_parser = FakeBackend(clock, *playwright)
+    return parser
+
+
+def test_url_class():
+    assert url_class(URL) == "www.avito.ru/tovary_dlya_kompyutera"
+    assert url_class("https://www.avito.ru/moskva") == "www.avito.ru/moskva"
+
+
+def test_routes_to_working_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "hybrid_routing", "adaptive")
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    html = render_catalog_page(make_items(50, seed=1))
+
+    # curl работает: браузер не нужен
+    router = BackendRouter(db, window=10, max_age_hours=24)
+    parser = make_parser(router, monkeypatch, (html, 0.5), (html, 10))
+    for _ in range(10):
+        assert parser.parse(URL) == html
+    assert parser._playwright_parser.calls <= 2
+    assert parser.stats["curl_success"] >= 8
+
+    # curl заблокирован (повторы с паузами): после нескольких неудач первым идет Playwright
+    parser = make_parser(router, monkeypatch, (BLOCKED, 8), (html, 10))
+    for _ in range(30):
+        assert parser.parse(URL) == html
+    assert [backend for backend, _ in router.plan(URL)][0] == "playwright"
+    assert parser.curl_parser.calls < 20
+
+    # Окна переживают перезапуск
+    restored = BackendRouter(db, window=10, max_age_hours=24)
+    stats = {(row["backend"], row["profile"]): row for row in restored.snapshot()}
+    assert stats == {(row["backend"], row["profile"]): row for row in router.snapshot()}
+    assert all(row["attempts"] <= 10 for row in stats.values())
+    db.close()
+
+
+def test_returns_last_content_when_all_fail(monkeypatch):
+    monkeypatch.setattr(settings, "hybrid_routing", "adaptive")
+    router = BackendRouter(persist=False)
+    parser = make_parser(router, monkeypatch, (BLOCKED, 8), (None, 10))
+
+    assert parser.parse(URL) == BLOCKED
+    assert parser.stats["curl_fail"] == parser.stats["playwright_fail"] == 1
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Проверка пула браузеров: зависшая задача не держит пул, браузер заменяется новым"""
+
+import threading
+
+import pytest
+
+from core.browser_pool import BrowserPool, _BrowserWorker
+
+PROFILE = {"name": "Chrome Windows"}
+
+
+def test_hung_task_replaces_worker(monkeypatch):
+    # Без запуска Chromium: задача получает вместо контекста заглушку
+    monkeypatch.setattr(_BrowserWorker, "_get_context", lambda self, profile, proxy=None: "context")
+    monkeypatch.setattr(_BrowserWorker, "_close_browser", lambda self: None)
+
+    pool = BrowserPool(size=1)
+    hung = pool._workers[0]
+    release = threading.Event()
+    try:
+        with pytest.raises(TimeoutError):
+            pool.run(PROFILE, lambda context: release.wait(), task_timeout=0.2)
+
+        # Пул сразу обслуживает следующую задачу уже новым браузером
+        assert pool._workers[0] is not hung and hung.abandoned
+        assert pool.run(PROFILE, lambda context: context, task_timeout=5) == "context"
+    finally:
+        release.set()
+        hung.join(timeout=5)
+        pool.shutdown()
+    assert not hung.is_alive()
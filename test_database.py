@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Проверка upsert объявлений и истории изменений цены"""
+
+from database.database_manager import DatabaseManager
+from database.models import Listing
+
+URL = "https://www.avito.ru/moskva/tovary_dlya_kompyutera/rtx_4090_1"
+
+
+def make_listing(price: int, title: str = "RTX 4090", description: str = "Отличное состояние") -> Listing:
+    return Listing(url=URL, title=title, price=str(price), price_value=price * 100, currency="RUB",
+                   address="Москва", description=description)
+
+
+def test_upsert_tracks_changes(tmp_path):
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+
+    assert db.upsert_listings([make_listing(100000)]) == ([URL], [], [])
+    assert db.upsert_listings([make_listing(100000)]) == ([], [], [URL])
+
+    # Описание меняется без записи в историю, цена - с записью
+    assert db.upsert_listings([make_listing(100000, description="Торг")]) == ([], [URL], [])
+    assert db.upsert_listings([make_listing(95000, description="Торг")]) == ([], [URL], [])
+
+    listing_id = db.get_listings_page()[0]["id"]
+    history = db.get_listing_history(listing_id)
+    assert [(h["old_price_value"], h["new_price_value"]) for h in history] == [(10000000, 9500000)]
+    assert db.get_listing_by_id(listing_id)["description"] == "Торг"
+    assert db.get_listings_count() == 1
+
+    changes = db.get_price_changes()
+    assert [(c["id"], c["old_price"], c["new_price"]) for c in changes] == [(listing_id, "100000", "95000")]
+    db.close()
+
+
+def test_add_listing_keeps_new_only_semantics(tmp_path):
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    assert db.add_listing(make_listing(100000)) is True
+    assert db.add_listing(make_listing(90000, title="RTX 4090 Palit")) is False
+    assert db.add_listings([make_listing(90000, title="RTX 4090 Palit")]) == ([], [URL])
+
+    history = db.get_listing_history(db.get_listings_page()[0]["id"])
+    assert [(h["old_title"], h["new_title"]) for h in history] == [("RTX 4090", "RTX 4090 Palit")]
+    db.close()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Паритет движков извлечения AvitoProcessor на корпусе страниц"""
+
+from services.avito_processor import AvitoProcessor
+from benchmarks.corpus import synthetic_pages
+
+BASE_URL = "https://www.avito.ru"
+
+
+def test_lxml_matches_bs4():
+    bs4_processor = AvitoProcessor(BASE_URL, engine="bs4")
+    lxml_processor = AvitoProcessor(BASE_URL, engine="lxml")
+
+    for name, html in synthetic_pages(count=5, items=60, seed=1):
+        expected = bs4_processor.process_html(html)
+        assert expected, name
+        assert lxml_processor.process_html(html) == expected, name
+
+
+def test_missing_catalog():
+    html = "<html><body><div>Доступ ограничен</div></body></html>"
+    assert AvitoProcessor(BASE_URL, engine="lxml").process_html(html) == []
+
+
+def _keys(listings):
+    return [(listing.url.split('?')[0], listing.title, listing.price, listing.price_value, listing.currency,
+             listing.address, listing.description)
+            for listing in listings]
+
+
+def test_json_state_matches_dom():
+    dom_processor = AvitoProcessor(BASE_URL, engine="lxml")
+    json_processor = AvitoProcessor(BASE_URL, engine="json")
+
+    for name, html in synthetic_pages(count=3, items=40, seed=2):
+        assert json_processor._find_state_items(html) is not None, name
+        assert _keys(json_processor.process_html(html)) == _keys(dom_processor.process_html(html)), name
+
+
+def test_json_initial_data_and_fallback():
+    from urllib.parse import quote
+    from benchmarks.corpus import make_items, render_catalog_page, state_item
+    import json
+
+    items = [item for item in make_items(10, seed=3) if not item["promo"]]
+    page = render_catalog_page(items, state=False)
+    json_processor = AvitoProcessor(BASE_URL, engine="json")
+
+    # Без состояния - откат на DOM
+    assert json_processor._find_state_items(page) is None
+    assert _keys(json_processor.process_html(page)) == _keys(AvitoProcessor(BASE_URL, engine="lxml").process_html(page))
+
+    # Старая разметка: window.__initialData__ = "<urlencoded json>"
+    state = quote(json.dumps({"catalog": {"items": [state_item(item) for item in items]}}))
+    page = page.replace('</body>', f'<script>window.__initialData__ = "{state}" || {{}};</script></body>')
+    assert len(json_processor._find_state_items(page)) == len(items)
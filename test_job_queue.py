@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Проверка очереди заданий: дедупликация по URL, отмена и восстановление после перезапуска"""
+
+import threading
+
+from database.database_manager import DatabaseManager
+from telegram_bot.job_queue import JobQueue
+
+
+def make_runner(release: threading.Event):
+    def runner(job, callback):
+        callback("started", "go")
+        release.wait(5)
+        job.check_cancelled()
+        callback("completed", "ok")
+        return {"success": True, "added": 1}
+    return runner
+
+
+def test_dedup_and_cancel(tmp_path):
+    db = DatabaseManager(str(tmp_path / "jobs.db"))
+    release = threading.Event()
+    jobs = JobQueue(make_runner(release), workers=1, db=db)
+
+    events = []
+    first, created = jobs.submit("https://avito.ru/a", 1, lambda status, _: events.append(("first", status)))
+    same, duplicate_created = jobs.submit("https://avito.ru/a", 2, lambda status, _: events.append(("second", status)))
+    queued, _ = jobs.submit("https://avito.ru/b", 1)
+
+    assert created and not duplicate_created and same is first
+    assert jobs.cancel(queued.id)
+    release.set()
+    assert first.wait(5) and queued.wait(5)
+
+    assert (first.status, queued.status) == ("done", "cancelled")
+    assert ("first", "completed") in events and ("second", "completed") in events
+    assert db.get_unfinished_jobs() == []
+    db.close()
+
+
+def test_restore_unfinished(tmp_path):
+    db = DatabaseManager(str(tmp_path / "jobs.db"))
+    db.save_job("restored1", "https://avito.ru/c", 5, "running")
+
+    release = threading.Event()
+    release.set()
+    notified = []
+    jobs = JobQueue(make_runner(release), workers=1, db=db)
+    jobs.start(notify=lambda chat_id, text: notified.append((chat_id, text)))
+
+    job = jobs.get("restored1")
+    assert job.wait(5) and job.status == "done"
+    assert notified == [(5, "ok")]
+    db.close()
+
+
+def test_fanout_fetches_each_url_once(tmp_path):
+    from database.models import Listing
+    from telegram_bot.searches import SearchFanout, parse_search_text
+
+    db = DatabaseManager(str(tmp_path / "jobs.db"))
+    url = "https://www.avito.ru/moskva/tovary_dlya_kompyutera?q=rtx"
+    fetched = []
+
+    def runner(job, callback):
+        fetched.append(job.url)
+        listings = [Listing(url=f"https://www.avito.ru/moskva/rtx_{price}", title=f"RTX {price}",
+                            price=str(price), price_value=price * 100, currency="RUB")
+                    for price in (30000, 90000)]
+        return {"success": True, "added_urls": db.add_listings(listings)[0]}
+
+    fanout = SearchFanout(JobQueue(runner, workers=2, db=db), db=db)
+    notified = []
+    fanout.start(send=lambda chat_id, listings: notified.append((chat_id, [l["title"] for l in listings])))
+
+    assert parse_search_text(f"{url} до 40 000") == (url, {"max_price": 40000})
+    db.add_search(1, url)
+    db.add_search(2, url, {"max_price": 40000})
+
+    results = fanout.run_cycle()
+    assert fetched == [url] and results[url]["success"]
+
+    by_chat = dict(notified)
+    assert "RTX 30000" in by_chat[1] and "RTX 90000" in by_chat[1]
+    assert "RTX 30000" in by_chat[2] and "RTX 90000" not in by_chat[2]
+    db.close()
+
+
+def test_search_text_validation():
+    from telegram_bot.handlers import add_search
+    from telegram_bot.searches import parse_search_text
+
+    url = "https://www.avito.ru/moskva/tovary_dlya_kompyutera"
+    assert parse_search_text(f"{url} от 20 000 ₽ до 40000 руб") == (url, {"min_price": 20000, "max_price": 40000})
+    assert parse_search_text("просто текст") is None
+
+    # Пустая или нечисловая цена - понятный ответ вместо исключения в обработчике
+    for text in (f"{url} от до 5000", f"{url} до 40к", f"{url} до", f"{url} от 50000 до 10000"):
+        reply = add_search(1, text)
+        assert reply.startswith("❌") and "цен" in reply.lower(), reply
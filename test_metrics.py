@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Проверка замеров этапов: разбивка прогона по этапам из потоков обхода и метрики Prometheus"""
+
+from prometheus_client import REGISTRY, generate_latest
+
+from benchmarks.corpus import synthetic_pages
+from benchmarks.stand_in import serve_pages
+import core.curl_parser
+from core.curl_parser import CurlParser
+from database.database_manager import DatabaseManager
+from services.avito_processor import AvitoProcessor
+from services.catalog_crawler import CatalogCrawler
+from services.page_cache import PageCache
+from services.rate_controller import RateController
+from utils import metrics
+
+
+def test_run_timings_cover_crawler_threads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # CurlParser сохраняет cookies в текущую папку
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    # Общий регулятор писал бы в рабочую БД и сдерживал темп стенда
+    monkeypatch.setattr(core.curl_parser, "rate_controller", RateController(mode="off"))
+
+    with serve_pages(synthetic_pages(count=3, items=20)) as base_url:
+        url = base_url + "/moskva/videokarty"
+        crawler = CatalogCrawler(CurlParser, AvitoProcessor(url, engine="lxml"), max_pages=3, workers=2, rate=0,
+                                 page_cache=PageCache(db, enabled=False, archive=False))
+        with metrics.run_timer("test") as timings:
+            pages = [page for page in crawler.crawl(url)]
+            for page in pages:
+                db.upsert_listings(page.listings)
+
+    assert len(pages) == 3
+    stages = timings.as_dict()
+    for stage in ("navigation", "html_parse", "card_extract", "db_write", "run"):
+        assert stage in stages
+    # Страницы 2-3 загружались в потоках обхода, их замеры тоже попали в прогон
+    assert timings.counts["navigation"] == 3
+    assert timings.counts["db_write"] == 3
+
+    exposition = generate_latest(REGISTRY).decode()
+    assert 'avito_stage_seconds_bucket{backend="curl",le="0.1",stage="navigation"}' in exposition
+    assert 'avito_fetch_total{backend="curl",outcome="ok"' in exposition
+    db.close()
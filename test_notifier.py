@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Проверка рассылки: пачки объявлений в одно сообщение и повтор после 429"""
+
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from telegram_bot.notifier import Notifier
+
+
+class FakeBot:
+    def __init__(self, fail_first_with_429: bool = False):
+        self.sent = []
+        self.fail = fail_first_with_429
+
+    def send_message(self, chat_id, text, **kwargs):
+        if self.fail:
+            self.fail = False
+            raise ApiTelegramException("sendMessage", None, {
+                "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 0.2}
+            })
+        self.sent.append((chat_id, text))
+
+
+def listings(count: int, offset: int = 0):
+    return [{"url": f"https://www.avito.ru/moskva/rtx_{i}", "title": f"RTX {i}", "price": "100 000 ₽", "images": []}
+            for i in range(offset, offset + count)]
+
+
+def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+
+def test_batches_per_chat():
+    bot = FakeBot()
+    notifier = Notifier(batch_sec=0.2, batch_size=10, global_rate=100, chat_rate=100, media=False)
+    notifier.start(bot)
+
+    notifier.enqueue(1, listings(3))
+    notifier.enqueue(1, listings(9, offset=3))
+    notifier.enqueue(2, listings(1))
+    wait_for(lambda: len(bot.sent) >= 3)
+    notifier.stop()
+
+    by_chat = {}
+    for chat_id, text in bot.sent:
+        by_chat.setdefault(chat_id, []).append(text)
+    # 12 объявлений первого чата - два сообщения (10 + 2), второго - одно
+    assert [text.count("•") for text in by_chat[1]] == [10, 2]
+    assert [text.count("•") for text in by_chat[2]] == [1]
+
+
+def test_retry_after_429():
+    bot = FakeBot(fail_first_with_429=True)
+    notifier = Notifier(batch_sec=0, batch_size=10, global_rate=100, chat_rate=100, media=False)
+    notifier.start(bot)
+
+    started = time.monotonic()
+    notifier.send_text(1, "hello")
+    wait_for(lambda: bot.sent)
+    notifier.stop()
+
+    assert bot.sent == [(1, "hello")]
+    assert time.monotonic() - started >= 0.2
+    assert notifier.stats["retries"] == 1
+
+
+def test_wakeup_waits_for_blocked_chats():
+    from telegram_bot.notifier import Outgoing
+
+    notifier = Notifier(batch_sec=10, batch_size=10, global_rate=100, chat_rate=100, media=False)
+    assert notifier._next_wakeup() == 0.5
+
+    # Единственный чат в очереди ждет retry_after - поток спит до конца паузы, а не крутится
+    notifier._outbox.append(Outgoing(1, "hello"))
+    notifier._chat_blocked_until[1] = time.monotonic() + 30
+    assert 29 < notifier._next_wakeup() <= 30
+
+    notifier._outbox.append(Outgoing(2, "ready"))
+    assert notifier._next_wakeup() == 0.05
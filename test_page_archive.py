@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Проверка архива страниц: сжатие, сегменты, индекс и повторное извлечение"""
+
+from datetime import datetime, timedelta
+
+from benchmarks.corpus import make_items, render_catalog_page
+from database.database_manager import DatabaseManager
+from services.replay import html_files, replay_archive, replay_parallel
+from utils.page_archive import PageArchive
+
+URL = "https://www.avito.ru/moskva/tovary_dlya_kompyutera"
+
+
+def test_append_read_and_rebuild(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"), segment_mb=0.01, codec="gzip")
+    started = datetime(2026, 1, 1)
+    pages = [render_catalog_page(make_items(30, seed=seed)) for seed in range(4)]
+
+    ids = [archive.append(URL, html, started + timedelta(days=n)) for n, html in enumerate(pages)]
+    assert all(ids)
+    # Та же версия страницы не дублируется
+    assert archive.append(URL, pages[-1]) is None
+
+    records = archive.find(url=URL)
+    assert [archive.read(record) for record in records] == pages
+    assert len({record.segment for record in records}) > 1
+    assert archive.read(archive.latest(URL, before="2026-01-03")) == pages[1]
+    assert [r.id for r in archive.find(since="2026-01-02", until="2026-01-04")] == ids[1:3]
+
+    assert archive.rebuild_index() == 4
+    assert [archive.read(record) for record in archive.find(url=URL)] == pages
+    archive.close()
+
+
+def test_replay_writes_in_fetch_order(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"))
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    items = make_items(20, seed=5)
+    archive.append(URL, render_catalog_page(items), datetime(2026, 1, 1))
+    changed = next(item for item in items if not item["promo"] and not item["title"].startswith("Скупка"))
+    changed["price"] = 99900
+    archive.append(URL, render_catalog_page(items), datetime(2026, 1, 2))
+
+    stats = replay_archive(archive, engine="lxml", write=True, db=db)
+    assert stats.pages == 2
+    assert stats.added == stats.listings // 2
+    assert stats.updated == 1
+    db.close()
+    archive.close()
+
+
+def test_parallel_matches_sequential(tmp_path):
+    archive = PageArchive(str(tmp_path / "archive"))
+    for seed in range(6):
+        archive.append(f"{URL}?p={seed}", render_catalog_page(make_items(25, seed=seed)), datetime(2026, 1, 1 + seed))
+        (tmp_path / f"page_{seed}.html").write_text(render_catalog_page(make_items(25, seed=seed)), encoding="utf-8")
+
+    sequential = replay_archive(archive, engine="lxml")
+    parallel = replay_parallel(archive.find(), engine="lxml", workers=2, chunk_size=2,
+                               archive_root=archive.root)
+    assert (parallel.pages, parallel.listings) == (sequential.pages, sequential.listings)
+
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    from_files = replay_parallel(html_files([str(tmp_path)]), engine="lxml", write=True, db=db,
+                                 workers=2, chunk_size=4, batch_size=30)
+    assert from_files.pages == 6
+    assert from_files.added == db.get_listings_count() == from_files.listings
+    db.close()
+    archive.close()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Проверка пропуска неизменившихся страниц: 304 и совпадение набора объявлений"""
+
+import sqlite3
+
+import pytest
+
+from benchmarks.corpus import make_items, render_catalog_page
+from core.base_parser import BaseParser, FetchResult
+from database.database_manager import DatabaseManager
+from services.page_cache import PageCache, page_signature
+
+URL = "https://www.avito.ru/moskva/tovary_dlya_kompyutera"
+
+
+class FakeParser(BaseParser):
+    """Отдает заданную страницу; с etag отвечает 304, если так настроен"""
+
+    def __init__(self, html: str, etag: str = None, honor_etag: bool = False):
+        self.html = html
+        self.etag = etag
+        self.honor_etag = honor_etag
+
+    def parse(self, url):
+        return self.html
+
+    def fetch(self, url, etag=None, last_modified=None):
+        if self.honor_etag and etag and etag == self.etag:
+            return FetchResult(None, 304, etag)
+        return FetchResult(self.html, 200, self.etag)
+
+
+def test_signature_ignores_order_but_not_price():
+    items = make_items(20, seed=3)
+    signature = page_signature(render_catalog_page(items))
+
+    assert signature == page_signature(render_catalog_page(list(reversed(items))))
+    items[0]["price"] = (items[0]["price"] or 0) + 100
+    assert signature != page_signature(render_catalog_page(items))
+    assert page_signature("<html>Доступ ограничен</html>") is None
+
+
+def test_unchanged_page_is_skipped(tmp_path):
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    html = render_catalog_page(make_items(20, seed=3))
+
+    cache = PageCache(db, enabled=True, archive=False)
+    first = cache.fetch(FakeParser(html, etag='"v1"'), URL)
+    assert first.html and not first.unchanged
+    cache.commit(first)
+
+    # Сервер с ETag: 304 без тела
+    second = cache.fetch(FakeParser(html, etag='"v1"', honor_etag=True), URL)
+    assert second.unchanged and second.result.not_modified
+
+    # Сервер без поддержки ETag: страница загружена, но набор объявлений тот же
+    third = cache.fetch(FakeParser(html), URL)
+    assert third.unchanged and third.html is None
+
+    changed = cache.fetch(FakeParser(render_catalog_page(make_items(21, seed=3))), URL)
+    assert not changed.unchanged
+    assert cache.stats == {"not_modified": 1, "unchanged": 1, "misses": 2}
+    db.close()
+
+
+def test_failed_write_keeps_page_uncached(tmp_path, monkeypatch):
+    import main
+
+    db = DatabaseManager(str(tmp_path / "listings.db"))
+    monkeypatch.setattr(main, "db_manager", db)
+    cache = PageCache(db, enabled=True, archive=False)
+    parser = FakeParser(render_catalog_page(make_items(20, seed=3)))
+
+    # Запись объявлений падает - состояние страницы не сохраняется
+    connection = db._get_connection()
+    connection.execute("ALTER TABLE listings RENAME TO listings_broken")
+    with pytest.raises(sqlite3.Error):
+        main.run_single(parser, URL, cache)
+    assert db.get_page_state(URL) is None
+
+    # После восстановления страница обрабатывается заново
+    connection.execute("ALTER TABLE listings_broken RENAME TO listings")
+    assert main.run_single(parser, URL, cache)[2] > 0
+    assert cache.fetch(parser, URL).unchanged
+    db.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Проверка общего регулятора частоты: AIMD, Retry-After и общее состояние процессов через БД"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from email.utils import formatdate
+
+from database.database_manager import DatabaseManager
+from services.rate_controller import RateController, parse_retry_after
+from utils import metrics
+
+URL = "https://www.avito.ru/moskva/videokarty"
+PROXY = "http://10.0.0.1:3128"
+
+
+def controller(**kwargs):
+    options = dict(mode="local", initial_rate=2, min_rate=0.5, max_rate=3, increase=0.5, decrease=0.5,
+                   backoff_base=10, backoff_max=40)
+    options.update(kwargs)
+    return RateController(**options)
+
+
+def test_aimd_and_backoff():
+    rc = controller()
+
+    # Слоты идут с шагом 1/rate; другой IP - своя очередь
+    assert rc.reserve(URL) == 0
+    assert abs(rc.reserve(URL) - 0.5) < 0.05
+    assert rc.reserve(URL, PROXY) == 0
+
+    for _ in range(4):
+        rc.report(URL, None, metrics.OK)
+    assert rc.stats()[0]["rate"] == 3  # рост ограничен max_rate
+
+    # Мультипликативное снижение и пауза с разбросом, удваивающаяся с неудачами подряд
+    rc.report(URL, None, metrics.RATE_LIMITED)
+    state = rc._states[("www.avito.ru", "direct")]
+    assert state["rate"] == 1.5 and state["failures"] == 1
+    assert 5 <= state["blocked_until"] - time.time() <= 10
+    assert 5 <= rc.reserve(URL) <= 10
+
+    rc.report(URL, None, metrics.CAPTCHA)
+    rc.report(URL, None, metrics.BLOCKED)
+    state = rc._states[("www.avito.ru", "direct")]
+    assert state["rate"] == 0.5 and state["failures"] == 3
+    assert 20 <= state["blocked_until"] - time.time() <= 40
+
+    # Сетевая ошибка темп не трогает, успех сбрасывает счетчик неудач
+    rc.report(URL, None, metrics.ERROR)
+    assert rc._states[("www.avito.ru", "direct")]["rate"] == 0.5
+    rc.report(URL, None, metrics.OK)
+    assert rc._states[("www.avito.ru", "direct")]["failures"] == 0
+
+    assert controller(mode="off").reserve(URL) == 0
+
+
+def test_retry_after():
+    assert parse_retry_after("120") == 120
+    assert 50 <= parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after("soon") is None and parse_retry_after(None) is None
+
+    rc = controller(backoff_base=1, backoff_max=1)
+    rc.report(URL, PROXY, metrics.RATE_LIMITED, retry_after="300")
+    assert 295 <= rc.reserve(URL, PROXY) <= 300
+
+
+def test_shared_between_processes(tmp_path):
+    # Два DatabaseManager на один файл - как бот и main.py в разных процессах
+    path = str(tmp_path / "shared.db")
+    first = controller(db=DatabaseManager(path), mode="shared")
+    second = controller(db=DatabaseManager(path), mode="shared")
+
+    assert first.reserve(URL) == 0
+    assert abs(second.reserve(URL) - 0.5) < 0.05  # слот уже занят первым
+
+    second.report(URL, None, metrics.RATE_LIMITED, retry_after="60")
+    assert 55 <= first.reserve(URL) <= 60
+    assert first.reserve(URL, PROXY) == 0
+
+    rows = {row["identity"]: row for row in first.stats()}
+    assert rows["direct"]["rate"] == 1 and rows["direct"]["failures"] == 1
+    assert set(rows) == {"direct", PROXY}
+
+
+def test_async_waits_off_loop(tmp_path):
+    path = str(tmp_path / "shared.db")
+    rc = controller(db=DatabaseManager(path), mode="shared")
+
+    # Другой процесс держит блокировку записи - цикл событий при этом продолжает работать
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, other.commit).start()
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await rc.wait_async(URL)
+        await rc.report_async(URL, None, metrics.OK)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+    other.close()
+    assert rc.stats()[0]["rate"] == 2.5
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Проверка общего хранилища cookies: TTL, пакетная запись и обмен между curl и Playwright"""
+
+import json
+import threading
+import time
+
+from curl_cffi.requests import Session
+
+from services.session_store import SessionStore, from_playwright
+
+PROFILE = "Chrome Windows"
+
+
+def browser_cookie(name, value, expires=-1):
+    return {"name": name, "value": value, "domain": ".avito.ru", "path": "/", "expires": expires,
+            "httpOnly": True, "secure": True, "sameSite": "Lax"}
+
+
+def test_cookies_shared_between_backends(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.json"), ttl_hours=1, flush_every=100, flush_sec=3600)
+
+    # Браузер получил cookies - curl того же профиля их видит
+    store.update(PROFILE, from_playwright([browser_cookie("u", "1"), browser_cookie("sessid", "abc")]))
+    session = Session()
+    store.apply_to_curl(PROFILE, session)
+    assert session.cookies.get("sessid", domain=".avito.ru") == "abc"
+
+    # Ответ curl обновил cookie - браузер получит новое значение
+    session.cookies.set("sessid", "xyz", domain=".avito.ru", path="/")
+    store.update_from_curl(PROFILE, session)
+    assert {c["name"]: c["value"] for c in store.get(PROFILE)} == {"u": "1", "sessid": "xyz"}
+
+    # Другой профиль и прокси - отдельные связки
+    assert store.get("Firefox Windows") == []
+    assert store.get(PROFILE, proxy="http://10.0.0.1:8080") == []
+
+
+def test_ttl_and_batched_atomic_flush(tmp_path):
+    path = tmp_path / "sessions.json"
+    store = SessionStore(str(path), ttl_hours=1, flush_every=3, flush_sec=3600)
+
+    store.update(PROFILE, [browser_cookie("old", "1", expires=time.time() - 10), browser_cookie("a", "1")])
+    assert not path.exists()  # две смены - меньше порога
+    assert [c["name"] for c in store.get(PROFILE)] == ["a"]  # истекший expires не выдается
+
+    store.update(PROFILE, [browser_cookie("b", "2")])
+    saved = json.loads(path.read_text())
+    assert sorted(c["name"] for c in saved["jars"][f"{PROFILE}|direct"]) == ["a", "b"]
+
+    # TTL считается от момента получения
+    store.update(PROFILE, [browser_cookie("c", "3")])
+    store._jars[f"{PROFILE}|direct"][("c", ".avito.ru", "/")]["stored_at"] -= 7200
+    assert sorted(c["name"] for c in store.get(PROFILE)) == ["a", "b"]
+
+    # Параллельные обновления из потоков не портят файл
+    threads = [threading.Thread(target=lambda n=n: [store.update(PROFILE, [browser_cookie(f"t{n}", str(i))])
+                                                    for i in range(50)]) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.flush()
+
+    restored = SessionStore(str(path), ttl_hours=1)
+    assert {c["name"]: c["value"] for c in restored.get(PROFILE) if c["name"].startswith("t")} == \
+        {f"t{n}": "49" for n in range(4)}
+    # Временные файлы не остаются, только сам файл и файл блокировки
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sessions.json", "sessions.json.lock"]
+
+
+def test_flush_merges_other_processes(tmp_path):
+    # Два хранилища на один файл - как бот и main.py в разных процессах
+    path = str(tmp_path / "sessions.json")
+    bot = SessionStore(path, ttl_hours=1, flush_every=1)
+    main = SessionStore(path, ttl_hours=1, flush_every=1)
+
+    bot.update(PROFILE, [browser_cookie("sessid", "from-bot")])
+    main.update("Firefox Windows", [browser_cookie("u", "from-main")])  # запись не затирает cookies бота
+    saved = json.loads((tmp_path / "sessions.json").read_text())["jars"]
+    assert set(saved) == {f"{PROFILE}|direct", "Firefox Windows|direct"}
+
+    # Чтение подхватывает файл, измененный другим процессом; версия связки растет
+    version = main.version(PROFILE)
+    assert [c["value"] for c in main.get(PROFILE)] == ["from-bot"]
+    bot.update(PROFILE, [browser_cookie("sessid", "newer")])
+    assert main.version(PROFILE) > version
+    assert [c["value"] for c in main.get(PROFILE)] == ["newer"]
@@ -0,0 +1,150 @@
+"""
+Метрики парсера: время этапов, исходы загрузок и кэш страниц.
+
+Каждый этап (запуск браузера, навигация, имитация пользователя,
+page.content(), разбор HTML, извлечение карточки, запись в БД) пишется в
+гистограмму Prometheus avito_stage_seconds{stage, backend}. Внутри
+run_timer() те же замеры суммируются в RunTimings - разбивку одного прогона
+по этапам. Текущий прогон передается через contextvars, поэтому потоки
+обхода и пула браузеров должны запускать задачи в скопированном контексте
+(contextvars.copy_context().run).
+
+Без пакета prometheus_client метрики не экспортируются, а RunTimings
+продолжает работать.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from config.settings import settings, logger
+
+try:
+    from prometheus_client import Counter, Histogram, start_http_server
+except ImportError:
+    Counter = Histogram = start_http_server = None
+
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Исходы загрузки страницы для avito_fetch_total
+OK = "ok"
+NOT_MODIFIED = "not_modified"
+BLOCKED = "blocked"
+CAPTCHA = "captcha"
+RATE_LIMITED = "rate_limited"
+ERROR = "error"
+
+
+class _NoMetric:
+    """Заглушка метрики, когда prometheus_client не установлен"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if Histogram:
+    STAGE_SECONDS = Histogram("avito_stage_seconds", "Время этапа парсинга", ["stage", "backend"],
+                              buckets=STAGE_BUCKETS)
+    FETCH_TOTAL = Counter("avito_fetch_total", "Загрузки страниц по исходу", ["backend", "profile", "outcome"])
+    PAGE_CACHE_TOTAL = Counter("avito_page_cache_total", "Проверки кэша страниц", ["result"])
+    LISTINGS_TOTAL = Counter("avito_listings_total", "Объявления по результату записи", ["result"])
+else:
+    STAGE_SECONDS = FETCH_TOTAL = PAGE_CACHE_TOTAL = LISTINGS_TOTAL = _NoMetric()
+
+
+class RunTimings:
+    """Суммарное время этапов одного прогона (этапы из потоков складываются)"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(seconds, 3) for stage, seconds in self.seconds.items()}
+
+    def summary(self) -> str:
+        return ", ".join(f"{stage} {seconds:.2f}с" for stage, seconds in
+                         sorted(self.as_dict().items(), key=lambda item: -item[1]))
+
+
+_current_run: ContextVar[Optional[RunTimings]] = ContextVar("current_run", default=None)
+
+
+def observe(stage: str, seconds: float, backend: str = "-"):
+    STAGE_SECONDS.labels(stage, backend).observe(seconds)
+    run = _current_run.get()
+    if run is not None:
+        run.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str, backend: str = "-") -> Iterator[None]:
+    """Замер этапа: with stage("navigation", "playwright"): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, backend)
+
+
+@contextmanager
+def run_timer(kind: str) -> Iterator[RunTimings]:
+    """Прогон целиком (этап run) с разбивкой по вложенным этапам"""
+    timings = RunTimings()
+    token = _current_run.set(timings)
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        _current_run.reset(token)
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels("run", kind).observe(elapsed)
+        timings.add("run", elapsed)
+
+
+def count_fetch(backend: str, profile: str, outcome: str):
+    FETCH_TOTAL.labels(backend, profile or "-", outcome).inc()
+
+
+def count_page_cache(result: str):
+    PAGE_CACHE_TOTAL.labels(result).inc()
+
+
+def count_listings(found: int = 0, added: int = 0, updated: int = 0):
+    for result, value in (("found", found), ("added", added), ("updated", updated)):
+        if value:
+            LISTINGS_TOTAL.labels(result).inc(value)
+
+
+_server_started = False
+
+
+def start_metrics_server(port: int = None, host: str = None) -> bool:
+    """HTTP-эндпоинт /metrics в фоновом потоке (METRICS_PORT=0 - выключен)"""
+    global _server_started
+    port = settings.metrics_port if port is None else port
+    if not port or _server_started:
+        return _server_started
+    if start_http_server is None:
+        logger.warning("[Metrics] prometheus_client не установлен, эндпоинт метрик не запущен")
+        return False
+
+    start_http_server(port, addr=host or settings.metrics_host)
+    _server_started = True
+    logger.info(f"[Metrics] Метрики Prometheus: http://{host or settings.metrics_host}:{port}/metrics")
+    return True
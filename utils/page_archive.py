@@ -0,0 +1,266 @@
+"""
+Архив сырых страниц выдачи.
+
+Страницы сжимаются (zstd, если установлен пакет zstandard, иначе gzip) и
+дописываются в конец файла-сегмента archive/segment-000001.bin; при
+превышении ARCHIVE_SEGMENT_MB начинается следующий сегмент. Файлы только
+дописываются, уже записанные байты не меняются. Индекс по URL и времени
+загрузки лежит рядом в archive/index.db (SQLite).
+
+Запись в сегменте: 4 байта длины заголовка (big-endian), JSON-заголовок
+{url, fetched_at, codec, size, compressed} и сжатое тело. Заголовки позволяют
+восстановить индекс по одним сегментам (rebuild_index).
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from config.settings import settings, logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+HEADER_SIZE = struct.Struct(">I")
+SEGMENT_NAME = "segment-{:06d}.bin"
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,   -- ISO-время загрузки (локальное)
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,    -- начало записи (заголовка) в сегменте
+    length INTEGER NOT NULL,    -- длина записи целиком
+    codec TEXT NOT NULL,
+    size INTEGER NOT NULL,      -- размер несжатого HTML в байтах
+    sha1 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_url ON pages(url, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages(fetched_at);
+"""
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Страница сжата zstd, установите пакет zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+@dataclass
+class ArchivedPage:
+    """Запись индекса архива"""
+    id: int
+    url: str
+    fetched_at: str
+    segment: int
+    offset: int
+    length: int
+    codec: str
+    size: int
+
+
+class PageArchive:
+    """Архив страниц: append-only сегменты со сжатыми страницами и SQLite-индекс"""
+
+    def __init__(self, root: str = None, segment_mb: float = None, codec: str = None):
+        self.root = root or settings.archive_dir
+        self.segment_bytes = int((segment_mb or settings.archive_segment_mb) * 1024 * 1024)
+        codec = codec or settings.archive_codec
+        if codec == "zstd" and zstandard is None:
+            logger.warning("[Archive] Пакет zstandard не установлен, сжимаем gzip")
+            codec = "gzip"
+        self.codec = codec
+
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    # Файлы создаются при первом обращении, а не при импорте модуля
+    def _index(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(self.root, exist_ok=True)
+            connection = sqlite3.connect(os.path.join(self.root, "index.db"), check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(INDEX_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, SEGMENT_NAME.format(segment))
+
+    def _current_segment(self, incoming: int) -> int:
+        row = self._index().execute("SELECT MAX(segment) FROM pages").fetchone()
+        segment = row[0] or 1
+        path = self._segment_path(segment)
+        if os.path.exists(path) and os.path.getsize(path) and os.path.getsize(path) + incoming > self.segment_bytes:
+            segment += 1
+        return segment
+
+    def append(self, url: str, html: str, fetched_at: Optional[datetime] = None) -> Optional[int]:
+        """
+        Дописывает страницу в архив, возвращает ID записи.
+        Страница, совпадающая с последней версией того же URL, не дублируется (None).
+        """
+        if not html:
+            return None
+
+        raw = html.encode("utf-8")
+        sha1 = hashlib.sha1(raw).hexdigest()
+        fetched_at = (fetched_at or datetime.now()).isoformat(timespec="seconds")
+
+        with self._lock:
+            index = self._index()
+            last = index.execute(
+                "SELECT sha1 FROM pages WHERE url = ? ORDER BY fetched_at DESC, id DESC LIMIT 1", (url,)
+            ).fetchone()
+            if last and last["sha1"] == sha1:
+                return None
+
+            body = compress(raw, self.codec)
+            header = json.dumps({"url": url, "fetched_at": fetched_at, "codec": self.codec,
+                                 "size": len(raw), "compressed": len(body)}, ensure_ascii=False).encode("utf-8")
+            record = HEADER_SIZE.pack(len(header)) + header + body
+            segment = self._current_segment(len(record))
+
+            with open(self._segment_path(segment), "ab") as f:
+                offset = f.tell()
+                f.write(record)
+
+            cursor = index.execute(
+                """
+                INSERT INTO pages (url, fetched_at, segment, offset, length, codec, size, sha1)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (url, fetched_at, segment, offset, len(record), self.codec, len(raw), sha1),
+            )
+            index.commit()
+
+        logger.debug(f"[Archive] {url}: {len(raw):,} -> {len(record):,} байт (сегмент {segment})")
+        return cursor.lastrowid
+
+    def find(self, url: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+             url_prefix: Optional[str] = None, limit: Optional[int] = None) -> List[ArchivedPage]:
+        """Записи индекса по URL (или префиксу URL) и интервалу времени, от старых к новым"""
+        where, params = [], []
+        if url:
+            where.append("url = ?")
+            params.append(url)
+        if url_prefix:
+            where.append("url >= ? AND url < ?")
+            params += [url_prefix, url_prefix + "\uffff"]
+        if since:
+            where.append("fetched_at >= ?")
+            params.append(since)
+        if until:
+            where.append("fetched_at < ?")
+            params.append(until)
+
+        query = "SELECT id, url, fetched_at, segment, offset, length, codec, size FROM pages"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY fetched_at, id"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows = self._index().execute(query, params).fetchall()
+        return [ArchivedPage(**dict(row)) for row in rows]
+
+    def latest(self, url: str, before: Optional[str] = None) -> Optional[ArchivedPage]:
+        """Последняя версия страницы (до момента before, если задан)"""
+        query = "SELECT id, url, fetched_at, segment, offset, length, codec, size FROM pages WHERE url = ?"
+        params = [url]
+        if before:
+            query += " AND fetched_at < ?"
+            params.append(before)
+        with self._lock:
+            row = self._index().execute(query + " ORDER BY fetched_at DESC, id DESC LIMIT 1", params).fetchone()
+        return ArchivedPage(**dict(row)) if row else None
+
+    def read(self, page: ArchivedPage) -> str:
+        """HTML записи архива"""
+        with open(self._segment_path(page.segment), "rb") as f:
+            f.seek(page.offset)
+            record = f.read(page.length)
+        header_len = HEADER_SIZE.unpack_from(record)[0]
+        body = record[HEADER_SIZE.size + header_len:]
+        return decompress(body, page.codec).decode("utf-8")
+
+    def iter_pages(self, **filters) -> Iterator[Tuple[ArchivedPage, str]]:
+        """Страницы архива с HTML; сегмент каждой записи читается с диска по мере обхода"""
+        for page in self.find(**filters):
+            try:
+                yield page, self.read(page)
+            except Exception as e:
+                logger.error(f"[Archive] Запись {page.id} ({page.url}) не читается: {e}")
+
+    def rebuild_index(self) -> int:
+        """Пересоздает индекс по заголовкам записей в сегментах, возвращает число записей"""
+        with self._lock:
+            index = self._index()
+            index.execute("DELETE FROM pages")
+            count = 0
+            segments = sorted(name for name in os.listdir(self.root) if name.startswith("segment-"))
+            for name in segments:
+                segment = int(name[len("segment-"):-len(".bin")])
+                with open(os.path.join(self.root, name), "rb") as f:
+                    data = f.read()
+                offset = 0
+                while offset + HEADER_SIZE.size <= len(data):
+                    header_len = HEADER_SIZE.unpack_from(data, offset)[0]
+                    header = json.loads(data[offset + HEADER_SIZE.size:offset + HEADER_SIZE.size + header_len])
+                    body_start = offset + HEADER_SIZE.size + header_len
+                    body_end = body_start + header["compressed"]
+                    if body_end > len(data):
+                        logger.warning(f"[Archive] {name}: оборванная запись в конце сегмента, пропущена")
+                        break
+                    raw = decompress(data[body_start:body_end], header["codec"])
+                    index.execute(
+                        """
+                        INSERT INTO pages (url, fetched_at, segment, offset, length, codec, size, sha1)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (header["url"], header["fetched_at"], segment, offset, body_end - offset,
+                         header["codec"], header["size"], hashlib.sha1(raw).hexdigest()),
+                    )
+                    count += 1
+                    offset = body_end
+            index.commit()
+        logger.info(f"[Archive] Индекс пересоздан: {count} записей")
+        return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            row = self._index().execute(
+                "SELECT COUNT(*) AS pages, COUNT(DISTINCT url) AS urls, COALESCE(SUM(size), 0) AS raw, "
+                "COALESCE(SUM(length), 0) AS stored, MIN(fetched_at) AS first, MAX(fetched_at) AS last FROM pages"
+            ).fetchone()
+        return dict(row)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Глобальный экземпляр
+page_archive = PageArchive()
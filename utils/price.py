@@ -0,0 +1,45 @@
+import re
+from typing import Optional
+
+# Символы и сокращения валют в тексте цены
+CURRENCY_MARKERS = {
+    '₽': 'RUB', 'руб': 'RUB', 'rub': 'RUB',
+    '$': 'USD', 'usd': 'USD',
+    '€': 'EUR', 'eur': 'EUR',
+}
+
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d{1,2})?')
+
+
+def parse_price_kopecks(value) -> Optional[int]:
+    """
+    Переводит цену в копейки: "110000", "110 000 ₽", "99 990,50" -> int.
+    Возвращает None, если цены нет ("Цена не указана", "Бесплатно" и т.п.).
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(round(value * 100))
+
+    # Убираем пробелы-разделители разрядов (включая неразрывные)
+    text = re.sub(r'\s', '', str(value))
+    match = NUMBER_RE.search(text)
+    if not match:
+        return None
+
+    return int(round(float(match.group(0).replace(',', '.')) * 100))
+
+
+def detect_currency(value) -> Optional[str]:
+    """Определяет валюту по тексту цены или коду валюты (RUB, USD, ...)"""
+    if not value:
+        return None
+
+    text = str(value).strip().lower()
+    if re.fullmatch(r'[a-z]{3}', text):
+        return text.upper()
+
+    for marker, currency in CURRENCY_MARKERS.items():
+        if marker in text:
+            return currency
+    return None
@@ -0,0 +1,44 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Корзина токенов: в среднем rate операций в секунду, всплеском до capacity.
+    Потокобезопасна; try_acquire не блокирует, acquire ждет свободный токен.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, tokens: float = 1) -> float:
+        """Сколько секунд ждать до появления токенов (без их списания)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                return 0.0
+            return (tokens - self._tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Берет токены, если они есть, и возвращает 0. Иначе - сколько секунд ждать."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def acquire(self, tokens: float = 1):
+        while True:
+            delay = self.try_acquire(tokens)
+            if not delay:
+                return
+            time.sleep(delay)